@@ -2,6 +2,7 @@ from dotenv import load_dotenv
 load_dotenv()
 from pathlib import Path
 from datetime import timedelta
+from importlib.util import find_spec
 import os
 import dj_database_url
 import cloudinary
@@ -71,6 +72,12 @@ else:
 if DEBUG:
     MIDDLEWARE.insert(3, 'debug_toolbar.middleware.DebugToolbarMiddleware')
 
+# ✅ Prometheus metrics على /metrics (store/metrics.py) — بعد WhiteNoise عشان الملفات الثابتة ما تتحسبش
+if find_spec('prometheus_client'):
+    MIDDLEWARE.insert(1, 'store.metrics.MetricsMiddleware')
+# الـ scraper يبعت Authorization: Bearer <METRICS_TOKEN>؛ من غيره /metrics متاح في الـ DEBUG بس
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
 ROOT_URLCONF = 'dwarmarket.urls'
 
 TEMPLATES = [
@@ -140,6 +147,18 @@ CORS_ALLOWED_ORIGINS = os.getenv("CORS_ALLOWED_ORIGINS", "https://web-production
 # ✅ إعدادات REST Framework و JWT
 REST_FRAMEWORK = {
     'COERCE_DECIMAL_TO_STRING': False,
+    # ✅ orjson + MessagePack (Accept: application/msgpack) — store/renderers.py
+    'DEFAULT_RENDERER_CLASSES': [
+        'store.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+        *(['store.renderers.MessagePackRenderer'] if find_spec('msgpack') else []),
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'store.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+        *(['store.renderers.MessagePackParser'] if find_spec('msgpack') else []),
+    ],
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework_simplejwt.authentication.JWTAuthentication',
     ),
@@ -223,6 +242,44 @@ CACHES = {
     }
 }
 
+# ✅ مدة كاش الكتالوج — الإبطال يتم بالـ versioned keys عند أي تعديل (store/cache.py)
+CATALOG_CACHE_TIMEOUT = int(os.getenv("CATALOG_CACHE_TIMEOUT", 60 * 60 * 6))
+# كاش الطلبات لكل مستخدم — يتبطل مع أي تغيير في طلباته
+ORDERS_CACHE_TIMEOUT = int(os.getenv("ORDERS_CACHE_TIMEOUT", 60 * 60 * 24))
+# الـ hard TTL = الـ soft TTL + CACHE_STALE_TIMEOUT: في الفرق ده المدخل يتقدم stale و worker واحد يعيد حسابه (python manage.py cache_stats)
+CACHE_STALE_TIMEOUT = int(os.getenv("CACHE_STALE_TIMEOUT", 60 * 10))
+CACHE_REFRESH_IN_BACKGROUND = os.getenv("CACHE_REFRESH_IN_BACKGROUND", "True").lower() in ["true", "1"]
+# near-cache داخل كل worker قدام Redis (store/nearcache.py) — الإبطال بالـ versions، و NEAR_CACHE_TTL أقصى عمر للنسخة المحلية
+NEAR_CACHE_ENABLED = os.getenv("NEAR_CACHE_ENABLED", "True").lower() in ["true", "1"]
+NEAR_CACHE_MAX_ENTRIES = int(os.getenv("NEAR_CACHE_MAX_ENTRIES", 500))
+NEAR_CACHE_MAX_BYTES = int(os.getenv("NEAR_CACHE_MAX_BYTES", 16 * 1024 * 1024))
+NEAR_CACHE_TTL = int(os.getenv("NEAR_CACHE_TTL", 30))
+NEAR_CACHE_STATS_INTERVAL = int(os.getenv("NEAR_CACHE_STATS_INTERVAL", 30))
+
+# ✅ تخزين السلة (store/carts.py): store.carts.DatabaseCartStore / RedisCartStore / LocalMemoryCartStore
+# عند التحويل من الـ database: python manage.py migrate_carts
+STORE_CART_BACKEND = os.getenv("STORE_CART_BACKEND", "store.carts.DatabaseCartStore")
+CART_TTL = int(os.getenv("CART_TTL", 60 * 60 * 24 * 7))
+
+# ✅ أحداث الطلبات للـ admin (SSE — store/events.py): store.events.RedisBroker / LocalBroker
+# الـ stream المفتوح يحتاج تشغيل dwarmarket.asgi (تحت WSGI الـ admin يعيد الاتصال كل ORDER_EVENTS_WSGI_RETRY ms)
+ORDER_EVENTS_BROKER = os.getenv("ORDER_EVENTS_BROKER", "store.events.RedisBroker")
+
+# ✅ Background jobs (store/jobs.py) — الـ worker: python manage.py run_jobs
+# JOBS_SYNC=True: تنفيذ مباشر بعد الـ commit بدون worker (تطوير / اختبارات)
+JOBS_SYNC = os.getenv("JOBS_SYNC", "False").lower() in ["true", "1"]
+
+# ✅ Hot/cold للطلبات (store/archive.py): قوائم الطلبات تعرض آخر ORDERS_RECENT_DAYS يوم
+# إلا مع placed_after/placed_before؛ python manage.py archive_orders ينقل المقفول الأقدم من N شهر
+ORDERS_RECENT_DAYS = int(os.getenv("ORDERS_RECENT_DAYS", 90))
+ORDERS_ARCHIVE_AFTER_MONTHS = int(os.getenv("ORDERS_ARCHIVE_AFTER_MONTHS", 6))
+
+# ✅ list endpoints عبر store/compiled_serializers.py (نفس الـ JSON بالظبط)
+STORE_COMPILED_SERIALIZERS = os.getenv("STORE_COMPILED_SERIALIZERS", "True").lower() in ["true", "1"]
+
+# ✅ Idempotency-Key (store/idempotency.py): مدة حفظ الـ response بالثواني
+IDEMPOTENCY_KEY_TTL = int(os.getenv("IDEMPOTENCY_KEY_TTL", 60 * 60 * 24))
+
 
 import logging
 
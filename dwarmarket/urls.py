@@ -18,12 +18,15 @@ from django.contrib import admin
 from django.urls import path,include
 import debug_toolbar
 
+from store.metrics import metrics_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('store/', include('store.urls')),
     path('auth/', include('djoser.urls')),
     path('auth/', include('djoser.urls.jwt')),
     path('__debug__/', include(debug_toolbar.urls)),
+    path('metrics', metrics_view, name='metrics'),
 ]
 
 
@@ -0,0 +1,22 @@
+# gunicorn بيقرا ./gunicorn.conf.py تلقائيًا (Procfile: gunicorn dwarmarket.wsgi)
+import os
+import shutil
+import tempfile
+
+# ✅ Prometheus multiprocess (store/metrics.py): كل worker يكتب قيمه في ملفات هنا و /metrics يجمعهم
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "dawar-metrics"))
+
+
+def on_starting(server):
+    # ملفات workers من تشغيل سابق
+    path = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path, exist_ok=True)
+
+
+def child_exit(server, worker):
+    try:
+        from prometheus_client import multiprocess
+    except ImportError:
+        return
+    multiprocess.mark_process_dead(worker.pid)
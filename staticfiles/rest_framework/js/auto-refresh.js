@@ -1,14 +1,23 @@
 document.addEventListener("DOMContentLoaded", function () {
-    function checkNewOrders() {
-        fetch("/admin/store/order/check-new-orders/")
-            .then(response => response.json())
-            .then(data => {
-                if (data.new_orders > 0) {
-                    showNotification(data.new_orders);
-                }
-            })
-            .catch(error => console.error("Error checking new orders:", error));
-    }
+    // السكريبت متحمّل مرتين (base_site.html + OrderAdmin.Media)
+    if (window.orderEventsSource || !window.EventSource) return;
+
+    // أحداث الطلبات من السيرفر (SSE) بدل الـ polling — store/events.py
+    // EventSource يعيد الاتصال تلقائيًا (retry من السيرفر)
+    const source = new EventSource("/admin/store/order/events/");
+    window.orderEventsSource = source;
+
+    source.addEventListener("pending", function (event) {
+        const data = JSON.parse(event.data);
+        if (data.pending > 0) {
+            showNotification(data.pending);
+        }
+    });
+
+    source.addEventListener("order_created", function (event) {
+        const data = JSON.parse(event.data);
+        showNotification(data.pending);
+    });
 
     function showNotification(orderCount) {
         let existing = document.getElementById("order-notification");
@@ -37,6 +46,4 @@ document.addEventListener("DOMContentLoaded", function () {
             setTimeout(() => notification.remove(), 6000);
         }
     }
-
-    setInterval(checkNewOrders, 15000); // كل 15 ثانية
 });
@@ -1,16 +1,27 @@
+from datetime import timedelta
+
+from django.conf import settings
 from django.contrib import admin, messages
+from django.contrib.admin.views.main import SEARCH_VAR
 from django.db.models.aggregates import Count
 from django.utils.html import format_html, urlencode
 from django.urls import reverse, path
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from django.http import JsonResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils import timezone
 from django.utils.timezone import localtime
 from django.utils.formats import date_format
+from django import forms
 from django.forms import BaseInlineFormSet
 from django.template.response import TemplateResponse
 from django.shortcuts import redirect
 
 from . import models
+from .archive import recent_orders_start
+from .events import order_events_snapshot, order_events_stream, pending_orders_count
+from .images import variant_url
+from .transitions import TransitionConflict, transition_order
 
 # ✅ ProductSize Inline
 class ProductSizeInline(admin.TabularInline):
@@ -31,9 +42,9 @@ class ProductAdmin(admin.ModelAdmin):
     inlines = [ProductSizeInline]
 
     def image_preview(self, obj):
-        if obj.image:
-            return format_html('<img src="{}" width="50px" style="border-radius: 5px;" />',
-                               obj.image.url.replace('/upload/', '/upload/w_100,q_auto,f_auto/'))
+        url = variant_url(obj.image, 'admin_100')
+        if url:
+            return format_html('<img src="{}" width="50px" style="border-radius: 5px;" />', url)
         return "No Image"
     image_preview.short_description = "Image"
 
@@ -49,9 +60,9 @@ class StoreCategoryAdmin(admin.ModelAdmin):
     list_per_page = 20
 
     def image_preview(self, obj):
-        if obj.image:
-            return format_html('<img src="{}" width="50px" style="border-radius: 5px;" />',
-                               obj.image.url.replace('/upload/', '/upload/w_100,q_auto,f_auto/'))
+        url = variant_url(obj.image, 'admin_100')
+        if url:
+            return format_html('<img src="{}" width="50px" style="border-radius: 5px;" />', url)
         return "No Image"
     image_preview.short_description = "Image"
 
@@ -72,9 +83,9 @@ class StoreAdmin(admin.ModelAdmin):
     list_per_page = 20
 
     def image_preview(self, obj):
-        if obj.image:
-            return format_html('<img src="{}" width="50px" style="border-radius: 5px;" />',
-                               obj.image.url.replace('/upload/', '/upload/w_100,q_auto,f_auto/'))
+        url = variant_url(obj.image, 'admin_100')
+        if url:
+            return format_html('<img src="{}" width="50px" style="border-radius: 5px;" />', url)
         return "No Image"
     image_preview.short_description = "Image"
 
@@ -94,9 +105,9 @@ class CategoryAdmin(admin.ModelAdmin):
     list_per_page = 20
 
     def image_preview(self, obj):
-        if obj.image:
-            return format_html('<img src="{}" width="50px" style="border-radius: 5px;" />',
-                               obj.image.url.replace('/upload/', '/upload/w_100,q_auto,f_auto/'))
+        url = variant_url(obj.image, 'admin_100')
+        if url:
+            return format_html('<img src="{}" width="50px" style="border-radius: 5px;" />', url)
         return "No Image"
     image_preview.short_description = "Image"
 
@@ -161,9 +172,47 @@ class OrderItemInline(admin.TabularInline):
         except:
             return "-"
 
+class PlacedWithinFilter(admin.SimpleListFilter):
+    # الافتراضي آخر ORDERS_RECENT_DAYS يوم بدل كل تاريخ الطلبات (store/archive.py)
+    title = "وقت الطلب"
+    parameter_name = 'placed_within'
+    periods = {'1': 1, '7': 7, '30': 30}
+
+    def lookups(self, request, model_admin):
+        return [('1', "اليوم"), ('7', "آخر 7 أيام"), ('30', "آخر 30 يوم"), ('all', "كل الطلبات")]
+
+    def choices(self, changelist):
+        choices = list(super().choices(changelist))
+        choices[0]['display'] = f"آخر {settings.ORDERS_RECENT_DAYS} يوم"
+        return choices
+
+    def queryset(self, request, queryset):
+        # البحث (برقم الطلب أو التليفون) على كل الطلبات
+        if self.value() == 'all' or request.GET.get(SEARCH_VAR):
+            return queryset
+        if self.value() in self.periods:
+            return queryset.filter(placed_at__gte=timezone.now() - timedelta(days=self.periods[self.value()]))
+        return queryset.filter(placed_at__gte=recent_orders_start())
+
+
 # ✅ Order Admin
+class OrderAdminForm(forms.ModelForm):
+    class Meta:
+        model = models.Order
+        fields = '__all__'
+
+    def clean_order_status(self):
+        # نفس الـ state machine بتاعة الـ API (Order.TRANSITIONS)
+        status = self.cleaned_data['order_status']
+        previous = getattr(self.instance, '_saved_status', None)
+        if previous and status != previous and status not in models.Order.TRANSITIONS[previous]:
+            raise forms.ValidationError(f"Orders cannot be moved from {previous} to {status}.")
+        return status
+
+
 @admin.register(models.Order)
 class OrderAdmin(admin.ModelAdmin):
+    form = OrderAdminForm
     autocomplete_fields = ['customer']
     inlines = [OrderItemInline]
     list_display = ['id', 'formatted_placed_at', 'customer_info', 'order_status', 'total_price_display']
@@ -171,7 +220,9 @@ class OrderAdmin(admin.ModelAdmin):
     search_fields = ['id', 'customer__phone', 'customer__full_name']
     ordering = ['-placed_at']
     list_per_page = 20
-    list_filter = ['order_status']
+    list_filter = [PlacedWithinFilter, 'order_status']
+    # بدون COUNT(*) على كل الجدول في كل صفحة
+    show_full_result_count = False
 
     def get_queryset(self, request):
         return super().get_queryset(request).prefetch_related('items__product_size')
@@ -191,22 +242,52 @@ class OrderAdmin(admin.ModelAdmin):
     def total_price_display(self, order):
         return format_html("<strong>{:.2f} EGP</strong>", float(order.total_price or 0))
 
+    def save_model(self, request, obj, form, change):
+        previous = getattr(obj, '_saved_status', None)
+        if change and previous and obj.order_status != previous:
+            # UPDATE مشروط زي الـ API: لو الحالة اتغيرت بعد ما الصفحة اتفتحت ما نكتبش فوقها
+            try:
+                obj.version = transition_order(
+                    models.Order.objects.all(), obj.pk, obj.order_status, transitions={previous: (obj.order_status,)}
+                )
+            except TransitionConflict as error:
+                messages.error(request, str(error))
+                obj.order_status, obj.version = error.current['order_status'], error.current['version']
+            obj._saved_status = obj.order_status
+        super().save_model(request, obj, form, change)
+
     def save_related(self, request, form, formsets, change):
-        super().save_related(request, form, formsets, change)
-        form.instance.calculate_total_price(save=True)
+        # كل عناصر الـ inline تتحفظ، وبعدها يتحسب الإجمالي مرة واحدة
+        with models.Order.objects.defer_totals():
+            super().save_related(request, form, formsets, change)
+        form.instance.refresh_from_db(fields=["total_price", "updated_at"])
 
     def get_urls(self):
         urls = super().get_urls()
         custom_urls = [
             path('<int:object_id>/print/', self.admin_site.admin_view(self.print_order_view), name='print-order'),
             path('check-new-orders/', self.admin_site.admin_view(self.check_new_orders), name="check-new-orders"),
+            path('events/', self.admin_site.admin_view(self.order_events), name="order-events"),
             path('update-order-total/<int:order_id>/', self.admin_site.admin_view(self.update_order_total), name="update-order-total"),
         ]
         return custom_urls + urls
 
     def check_new_orders(self, request):
-        count = models.Order.objects.filter(order_status__iexact="pending").count()
-        return JsonResponse({"new_orders": count})
+        # العداد محفوظ في الكاش ويتعدل مع كل طلب (store/events.py)
+        return JsonResponse({"new_orders": pending_orders_count()})
+
+    def order_events(self, request):
+        # SSE: stream مفتوح تحت ASGI، وتحت WSGI حدث واحد و EventSource يعيد الاتصال
+        if isinstance(request, ASGIRequest):
+            stream = order_events_stream()
+        else:
+            stream = order_events_snapshot()
+        response = StreamingHttpResponse(stream, content_type="text/event-stream")
+        response["Cache-Control"] = "no-cache"
+        response["X-Accel-Buffering"] = "no"
+        # BrotliMiddleware يتخطى الـ responses اللي ليها Content-Encoding (الضغط يأخر الأحداث)
+        response["Content-Encoding"] = "identity"
+        return response
 
     def update_order_total(self, request, order_id):
         try:
@@ -235,3 +316,49 @@ class OrderAdmin(admin.ModelAdmin):
             'admin/js/order-print-button.js',
             'admin/js/fix-tabs.js',
         )
+
+
+# ✅ Archived orders (store/archive.py — python manage.py archive_orders)
+@admin.register(models.ArchivedOrder)
+class ArchivedOrderAdmin(admin.ModelAdmin):
+    list_display = ['id', 'placed_at', 'customer', 'order_status', 'total_price', 'archived_at']
+    list_select_related = ['customer']
+    list_filter = ['order_status']
+    search_fields = ['id', 'customer__phone', 'customer__full_name']
+    date_hierarchy = 'placed_at'
+    ordering = ['-placed_at']
+    list_per_page = 20
+    show_full_result_count = False
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+# ✅ Background jobs (store/jobs.py)
+@admin.register(models.Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'name', 'status', 'attempts', 'run_after', 'updated_at']
+    list_filter = ['status', 'name']
+    search_fields = ['name', 'dedupe_key']
+    ordering = ['-id']
+    list_per_page = 50
+    readonly_fields = ['created_at', 'updated_at', 'locked_at', 'last_error']
+    actions = ['retry_jobs']
+
+    @admin.action(description="إعادة تشغيل الـ jobs المحددة")
+    def retry_jobs(self, request, queryset):
+        # job منتظر بنفس الـ dedupe_key يكفي
+        queued_keys = models.Job.objects.filter(status=models.Job.STATUS_QUEUED, dedupe_key__isnull=False)
+        queryset = queryset.exclude(status=models.Job.STATUS_RUNNING).exclude(
+            dedupe_key__in=queued_keys.values('dedupe_key')
+        )
+        updated = queryset.update(
+            status=models.Job.STATUS_QUEUED, attempts=0, run_after=timezone.now(), locked_at=None
+        )
+        self.message_user(request, f"{updated} jobs queued.")
@@ -0,0 +1,144 @@
+"""
+Hot/cold للطلبات.
+
+- store_order / store_orderitem (hot): الطلبات المفتوحة والحديثة فقط.
+- ``archive_orders`` (``manage.py archive_orders``) تنقل الطلبات المقفولة
+  (Delivered / Canceled) الأقدم من N شهر إلى ``ArchivedOrder`` — على
+  PostgreSQL جدول partitioned بالشهر على ``placed_at``، والـ partition
+  الشهري يُنشأ وقت الحاجة.
+- ``restrict_to_recent``: قوائم الطلبات (API للـ staff / الـ admin) تقرأ آخر
+  ``ORDERS_RECENT_DAYS`` يوم فقط إلا لو اتطلب مدى تاريخ صريح.
+- الـ API بيقرا الأرشيف كمصدر تاني (``OrderViewSet``): تاريخ العميل كله،
+  ومع مدى تاريخ صريح للـ staff، والطلب الواحد بالـ id.
+"""
+from datetime import timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .cache import invalidate_orders
+from .models import ArchivedOrder, Order, OrderItem, Product
+
+CLOSED_STATUSES = (Order.ORDER_STATUS_DELIVERED, Order.ORDER_STATUS_CANCELED)
+DATE_RANGE_PARAMS = ("placed_after", "placed_before")
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+# -----------------------------------------------------------------------------
+# ✅ Recent window
+# -----------------------------------------------------------------------------
+def recent_orders_start():
+    return timezone.now() - timedelta(days=_setting("ORDERS_RECENT_DAYS", 90))
+
+
+def has_date_range(params):
+    return any(params.get(name) for name in DATE_RANGE_PARAMS)
+
+
+def restrict_to_recent(queryset, params):
+    if has_date_range(params):
+        return queryset
+    return queryset.filter(placed_at__gte=recent_orders_start())
+
+
+# -----------------------------------------------------------------------------
+# ✅ Monthly partitions (UTC)
+# -----------------------------------------------------------------------------
+def month_start(value):
+    value = value.astimezone(dt_timezone.utc)
+    return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_months(value, months):
+    year, month = divmod(value.year * 12 + value.month - 1 + months, 12)
+    return value.replace(year=year, month=month + 1)
+
+
+def archive_cutoff(months):
+    """أول الشهر (UTC) قبل ``months`` شهر — الطلبات قبله تتنقل بالكامل."""
+    return add_months(month_start(timezone.now()), -months)
+
+
+def partition_name(month):
+    return f"{ArchivedOrder._meta.db_table}_p{month:%Y%m}"
+
+
+def ensure_partitions(months):
+    if connection.vendor != "postgresql":
+        return
+    table = ArchivedOrder._meta.db_table
+    with connection.cursor() as cursor:
+        for month in sorted(set(months)):
+            cursor.execute(
+                f"CREATE TABLE IF NOT EXISTS {partition_name(month)} PARTITION OF {table} "
+                f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+            )
+
+
+# -----------------------------------------------------------------------------
+# ✅ Archiving
+# -----------------------------------------------------------------------------
+def archivable_orders(before):
+    return Order.objects.filter(placed_at__lt=before, order_status__in=CLOSED_STATUSES)
+
+
+def archived_from(order):
+    return ArchivedOrder(
+        id=order.pk,
+        customer_id=order.customer_id,
+        placed_at=order.placed_at,
+        order_status=order.order_status,
+        total_price=order.total_price,
+        notes=order.notes,
+        created_at=order.created_at,
+        updated_at=order.updated_at,
+        items=[
+            {
+                "product_size": item.product_size_id,
+                "product": item.product_size.product_id,
+                "title": item.product_size.product.title,
+                "size": item.product_size.size_name,
+                "quantity": item.quantity,
+                "unit_price": item.unit_price,
+            }
+            for item in order.items.all()
+        ],
+    )
+
+
+def archive_batch(before, batch_size=500):
+    """ينقل batch واحد في transaction واحدة؛ يرجع عدد الطلبات المنقولة."""
+    with transaction.atomic():
+        orders = list(
+            archivable_orders(before)
+            .select_for_update(skip_locked=True)
+            .order_by("placed_at", "id")
+            .prefetch_related("items__product_size__product")[:batch_size]
+        )
+        if not orders:
+            return 0
+        ensure_partitions(month_start(order.placed_at) for order in orders)
+        ArchivedOrder.objects.bulk_create([archived_from(order) for order in orders])
+        order_ids = [order.pk for order in orders]
+        OrderItem.objects.filter(order_id__in=order_ids).delete()
+        Order.objects.filter(pk__in=order_ids).delete()
+        # الطلب بيتقرا من الأرشيف بعد كده (رقم الصنف مش محفوظ في الـ snapshot)
+        invalidate_orders(order.customer_id for order in orders)
+    return len(orders)
+
+
+def archived_products(orders):
+    """``{product_id: Product}`` (بالمتجر) لأصناف الطلبات المؤرشفة — الصور واسم المتجر."""
+    product_ids = {item["product"] for order in orders for item in order.items}
+    return Product.objects.select_related("store").in_bulk(product_ids) if product_ids else {}
+
+
+def archive_orders(before, batch_size=500):
+    archived = 0
+    while moved := archive_batch(before, batch_size):
+        archived += moved
+    return archived
@@ -0,0 +1,416 @@
+"""
+كاش الاستجابات بمفاتيح مُرقَّمة (versioned keys).
+
+كل متجر/منتج/تصنيف له عداد "generation" في Redis يزيد عند أي حفظ أو حذف
+(انظر store/signals.py). الاستجابة المخزنة معاها قيم العدادات اللي اتحسبت
+عليها، فأي تعديل يخليها غير صالحة فورًا ويمكن إبقاء الكاش لساعات.
+
+Stale-while-revalidate: المدخل fresh لحد الـ soft TTL (``get_cache_timeout``)
+وبعده يفضل يتقدم stale لحد الـ hard TTL (+ ``CACHE_STALE_TIMEOUT``) بينما
+worker واحد بس (lock في Redis) يعيد حسابه في الخلفية. لو مفيش نسخة صالحة
+(أول مرة أو بعد إبطال) الباقيين يستنوا الـ lock شوية بدل ما الكل يضرب قاعدة
+البيانات مع بعض. عدادات hit/stale/miss: ``manage.py cache_stats``.
+"""
+import copy
+import hashlib
+import logging
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, transaction
+from django.http import HttpResponse
+from redis.exceptions import LockError
+
+from . import metrics
+from .conditional import ConditionalGetMixin, make_etag
+from .nearcache import get_near_cache
+
+logger = logging.getLogger(__name__)
+
+ALL = "all"
+
+
+def generation_key(namespace, pk=ALL):
+    return f"gen:{namespace}:{pk}"
+
+
+def _seed():
+    # A time-based start value: if Redis evicts a counter, the new one can
+    # never collide with a generation that is still embedded in old keys.
+    return time.time_ns() // 1000
+
+
+def modified_key(key):
+    return f"{key}:at"
+
+
+def get_generations(keys):
+    values = cache.get_many(keys)
+    for key in keys:
+        if key not in values:
+            cache.add(key, _seed(), timeout=None)
+            cache.add(modified_key(key), int(time.time()), timeout=None)
+            values[key] = cache.get(key)
+    return [values[key] for key in keys]
+
+
+def get_last_modified(keys):
+    """آخر وقت (epoch seconds) زاد فيه أي عداد من ``keys``، أو None."""
+    values = cache.get_many([modified_key(key) for key in keys])
+    return max(values.values(), default=None)
+
+
+def _bump_now(keys):
+    for key in keys:
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _seed(), timeout=None)
+    now = int(time.time())
+    cache.set_many({modified_key(key): now for key in keys}, timeout=None)
+
+
+def bump(*keys):
+    """يزيد العدادات بعد الـ commit حتى لا يُخزَّن محتوى قديم تحت رقم جديد."""
+    keys = list(dict.fromkeys(keys))
+    if keys:
+        transaction.on_commit(lambda: _bump_now(keys))
+
+
+# -----------------------------------------------------------------------------
+# ✅ Invalidation helpers (تُستدعى من signals ومن مسارات الـ bulk)
+# -----------------------------------------------------------------------------
+def invalidate_products(product_ids):
+    """Returns the ids of the affected stores."""
+    product_ids = set(product_ids)
+    if not product_ids:
+        return set()
+    Product = apps.get_model("store", "Product")
+    store_ids = set(Product.objects.filter(pk__in=product_ids).values_list("store_id", flat=True))
+    bump(
+        generation_key("product"),
+        *(generation_key("product", pk) for pk in product_ids),
+        *(generation_key("store", pk) for pk in store_ids),
+    )
+    return store_ids
+
+
+def invalidate_store(store_id):
+    bump(
+        generation_key("store"),
+        generation_key("store", store_id),
+        generation_key("storecategory"),
+        generation_key("category"),
+        generation_key("product"),  # store name is searchable / filterable
+    )
+
+
+def invalidate_store_category(store_category):
+    Product = apps.get_model("store", "Product")
+    product_ids = Product.objects.filter(store_category=store_category).values_list("pk", flat=True)
+    bump(
+        generation_key("storecategory"),
+        generation_key("storecategory", store_category.pk),
+        generation_key("store"),
+        generation_key("store", store_category.store_id),
+        generation_key("product"),
+        *(generation_key("product", pk) for pk in product_ids),
+    )
+
+
+def invalidate_category(category):
+    """Returns the ids of the category's stores."""
+    Store = apps.get_model("store", "Store")
+    store_ids = set(Store.objects.filter(category=category).values_list("pk", flat=True))
+    bump(
+        generation_key("category"),
+        generation_key("store"),
+        *(generation_key("store", pk) for pk in store_ids),
+    )
+    return store_ids
+
+
+def invalidate_orders(customer_ids):
+    """طلبات العملاء دول اتغيرت: كاش كل واحد فيهم + كاش الـ staff (كل الطلبات)."""
+    bump(generation_key("orders"), *(generation_key("orders", pk) for pk in set(customer_ids)))
+
+
+def invalidate_order_ids(order_ids):
+    """زي invalidate_orders بالـ order ids — العملاء يتقروا بعد الـ commit (خارج الـ transaction)."""
+    order_ids = set(order_ids)
+    if not order_ids:
+        return
+
+    def bump_customers():
+        Order = apps.get_model("store", "Order")
+        customer_ids = set(Order.objects.filter(pk__in=order_ids).values_list("customer_id", flat=True))
+        _bump_now([generation_key("orders"), *(generation_key("orders", pk) for pk in customer_ids)])
+
+    transaction.on_commit(bump_customers)
+
+
+# -----------------------------------------------------------------------------
+# ✅ Hit / stale / miss counters
+# -----------------------------------------------------------------------------
+HIT = "hit"
+STALE = "stale"
+MISS = "miss"
+CACHE_EVENTS = (HIT, STALE, MISS)
+
+
+def stats_key(namespace, event):
+    return f"cachestats:{namespace}:{event}"
+
+
+def record(namespace, event):
+    metrics.observe_cache(namespace, event)
+    key = stats_key(namespace, event)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 1, timeout=None)
+
+
+def get_stats(namespaces):
+    """``{namespace: {"hit": n, "stale": n, "miss": n}}``"""
+    keys = {stats_key(namespace, event): (namespace, event) for namespace in namespaces for event in CACHE_EVENTS}
+    values = cache.get_many(list(keys))
+    stats = {namespace: dict.fromkeys(CACHE_EVENTS, 0) for namespace in namespaces}
+    for key, (namespace, event) in keys.items():
+        stats[namespace][event] = values.get(key, 0)
+    return stats
+
+
+def reset_stats(namespaces):
+    cache.delete_many([stats_key(namespace, event) for namespace in namespaces for event in CACHE_EVENTS])
+
+
+# -----------------------------------------------------------------------------
+# ✅ Single-flight locks
+# -----------------------------------------------------------------------------
+class LocalLock:
+    """بديل redis Lock لما الكاش مش Redis (LocMemCache): داخل الـ process بس."""
+
+    _locks = weakref.WeakValueDictionary()
+    _guard = threading.Lock()
+
+    def __init__(self, name):
+        with self._guard:
+            self.lock = self._locks.get(name)
+            if self.lock is None:
+                self.lock = self._locks[name] = threading.Lock()
+
+    def acquire(self, blocking=True, blocking_timeout=None):
+        if not blocking:
+            return self.lock.acquire(False)
+        return self.lock.acquire(True, -1 if blocking_timeout is None else blocking_timeout)
+
+    def release(self):
+        if self.lock.locked():
+            self.lock.release()
+
+
+def get_lock(name, timeout):
+    if hasattr(cache, "lock"):  # django_redis
+        # thread_local=False: الـ lock بيتاخد في الـ request وبيتفك في thread الـ refresh
+        return cache.lock(name, timeout=timeout, thread_local=False)
+    return LocalLock(name)
+
+
+def release_lock(lock):
+    try:
+        lock.release()
+    except LockError:
+        pass  # الـ lock انتهت مدته (timeout) قبل ما نخلص
+
+
+@lru_cache(maxsize=None)
+def _refresh_executor():
+    return ThreadPoolExecutor(getattr(settings, "CACHE_REFRESH_WORKERS", 2), thread_name_prefix="cache-refresh")
+
+
+# -----------------------------------------------------------------------------
+# ✅ ViewSet mixin
+# -----------------------------------------------------------------------------
+# الـ request اللي بيعيد حساب المدخل في الخلفية
+REFRESH_ATTR = "_cache_refresh"
+
+
+class VersionedCacheMixin(ConditionalGetMixin):
+    """
+    Replaces ``cache_page`` on the catalog viewsets. Subclasses declare the
+    generations a response depends on in ``get_cache_generations``; the same
+    generations drive the ETag / Last-Modified validators.
+    """
+
+    cache_namespace = None
+    cache_timeout = None
+
+    def get_cache_generations(self, request, *args, **kwargs):
+        if "pk" in kwargs:
+            return [generation_key(self.cache_namespace, kwargs["pk"])]
+        return [generation_key(self.cache_namespace)]
+
+    def get_cache_timeout(self):
+        """الـ soft TTL: المدة اللي المدخل يفضل فيها fresh."""
+        if self.cache_timeout is not None:
+            return self.cache_timeout
+        return getattr(settings, "CATALOG_CACHE_TIMEOUT", 60 * 60 * 6)
+
+    def get_stale_timeout(self):
+        """المدة بعد الـ soft TTL اللي المدخل يتقدم فيها stale (الـ hard TTL = الاتنين)."""
+        return getattr(settings, "CACHE_STALE_TIMEOUT", 60 * 10)
+
+    def is_response_cacheable(self, request):
+        # the browsable API embeds per-user forms and must not be shared
+        return request.method in ("GET", "HEAD") and getattr(request.accepted_renderer, "format", None) != "api"
+
+    def get_generation_versions(self, request, *args, **kwargs):
+        # once per request: shared by the ETag (store/conditional.py) and the cache key
+        if getattr(self, "generation_versions", None) is None:
+            generation_keys = self.get_cache_generations(request, *args, **kwargs)
+            self.generation_versions = ".".join(str(value) for value in get_generations(generation_keys))
+        return self.generation_versions
+
+    def get_request_fingerprint(self, request):
+        return hashlib.md5(
+            "|".join((request.scheme, request.get_host(), request.get_full_path(), request.accepted_media_type)).encode()
+        ).hexdigest()
+
+    def get_response_cache_key(self, request, *args, **kwargs):
+        # بدون الـ versions: المدخل القديم يفضل موجود (stale) بعد أي إبطال
+        return f"resp:{self.basename}:{self.action}:{self.get_request_fingerprint(request)}"
+
+    def get_validators(self, request, *args, **kwargs):
+        versions = self.get_generation_versions(request, *args, **kwargs)
+        etag = make_etag(self.basename, self.action, self.get_request_fingerprint(request), versions)
+        last_modified = get_last_modified(self.get_cache_generations(request, *args, **kwargs))
+        return etag, last_modified
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        if not self.is_response_cacheable(request):
+            return handler(request, *args, **kwargs)
+
+        key = self.get_response_cache_key(request, *args, **kwargs)
+        versions = self.get_generation_versions(request, *args, **kwargs)
+        if getattr(request._request, REFRESH_ATTR, False):
+            return self.store_response(key, versions, handler(request, *args, **kwargs))
+
+        entry = self.get_entry(key, versions)
+        if self.is_fresh(entry):
+            record(self.basename, HIT)
+            return self.entry_response(entry)
+
+        lock = get_lock(f"lock:{key}", getattr(settings, "CACHE_LOCK_TIMEOUT", 30))
+        if entry is not None:
+            # انتهى الـ soft TTL: نرجعه فورًا، وأول واحد ياخد الـ lock يعيد الحساب في الخلفية
+            record(self.basename, STALE)
+            if lock.acquire(blocking=False):
+                self.refresh_in_background(request, lock, *args, **kwargs)
+            return self.entry_response(entry)
+
+        record(self.basename, MISS)
+        if not lock.acquire(blocking_timeout=getattr(settings, "CACHE_LOCK_WAIT", 2)):
+            return self.store_response(key, versions, handler(request, *args, **kwargs))
+        entry = self.get_entry(key, versions)
+        if self.is_fresh(entry):  # حد تاني حسبه وإحنا مستنيين
+            release_lock(lock)
+            return self.entry_response(entry)
+        try:
+            response = handler(request, *args, **kwargs)
+        except Exception:
+            release_lock(lock)
+            raise
+        return self.store_response(key, versions, response, lock)
+
+    def get_entry(self, key, versions):
+        """
+        المدخل المبني على ``versions`` الحالية (ولو stale)، أو None لو اتبطل.
+        الـ near-cache الأول (بدون round trip ولا unpickling)، وبعده Redis.
+        """
+        near = get_near_cache()
+        if near is not None:
+            entry = near.get(key)
+            if entry is not None and entry["versions"] == versions and self.is_fresh(entry):
+                return entry
+        entry = cache.get(key)
+        if entry is None or entry["versions"] != versions:
+            return None  # اتبطل: محتوى قديم فعلًا، مش مجرد انتهاء مدة
+        if near is not None and self.is_fresh(entry):
+            near.set(key, entry, len(entry["content"]))
+        return entry
+
+    def is_fresh(self, entry):
+        return entry is not None and time.time() < entry["fresh_until"]
+
+    def entry_response(self, entry):
+        return HttpResponse(entry["content"], content_type=entry["content_type"])
+
+    def store_response(self, key, versions, response, lock=None):
+        if response.status_code != 200 or not hasattr(response, "add_post_render_callback"):
+            if lock is not None:
+                release_lock(lock)
+            return response
+
+        soft_timeout = self.get_cache_timeout()
+
+        def store(rendered):
+            try:
+                entry = {
+                    "versions": versions,
+                    "content": rendered.content,
+                    "content_type": rendered["Content-Type"],
+                    "fresh_until": time.time() + soft_timeout,
+                }
+                cache.set(key, entry, soft_timeout + self.get_stale_timeout())
+                metrics.observe_cache_size(self.basename, len(entry["content"]))
+                near = get_near_cache()
+                if near is not None:
+                    near.set(key, entry, len(entry["content"]))
+            finally:
+                if lock is not None:
+                    release_lock(lock)
+
+        response.add_post_render_callback(store)
+        return response
+
+    def refresh_in_background(self, request, lock, *args, **kwargs):
+        # نفس الـ request على viewset جديد، بدون If-None-Match (لازم body كامل)
+        refresh = copy.copy(request._request)
+        refresh.META = {
+            name: value
+            for name, value in refresh.META.items()
+            if name not in ("HTTP_IF_NONE_MATCH", "HTTP_IF_MODIFIED_SINCE")
+        }
+        setattr(refresh, REFRESH_ATTR, True)
+        view = type(self).as_view({"get": self.action}, basename=self.basename, detail=self.detail)
+        background = getattr(settings, "CACHE_REFRESH_IN_BACKGROUND", True)
+
+        def run():
+            try:
+                response = view(refresh, *args, **kwargs)
+                if hasattr(response, "render"):
+                    response.render()
+            except Exception:
+                logger.exception("Refreshing %s %s failed", self.basename, self.action)
+            finally:
+                release_lock(lock)
+                if background:
+                    connections.close_all()
+
+        if background:
+            _refresh_executor().submit(run)
+        else:
+            run()
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(super().retrieve, request, *args, **kwargs)
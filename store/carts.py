@@ -0,0 +1,571 @@
+"""
+تخزين السلة (``STORE_CART_BACKEND``).
+
+- ``DatabaseCartStore`` (الافتراضي): جداول ``Cart``/``CartItem`` كما هي.
+- ``RedisCartStore``: السلة hash واحد لكل مستخدم (``cart:<user_id>``) بـ TTL
+  يتجدد مع كل تعديل. لا يُكتب شيء في قاعدة البيانات قبل الـ checkout، وهناك
+  تتحول الأصناف مباشرة إلى ``Order``/``OrderItem`` (store/checkout.py).
+- ``LocalMemoryCartStore``: نفس سلوك Redis داخل الـ process (للاختبارات
+  والتطوير).
+
+في الـ stores غير الـ database رقم الصنف (``CartItem.id``) هو رقم المقاس.
+السلال الموجودة في قاعدة البيانات تُنقل بـ ``manage.py migrate_carts``.
+"""
+import threading
+import time
+from functools import lru_cache
+from uuid import UUID, uuid4
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Prefetch
+from django.utils.module_loading import import_string
+
+from .managers import CART_ITEM_MAX_QUANTITY
+from .models import Cart, CartItem, ProductSize
+
+
+def get_cart_store():
+    return _load_store(getattr(settings, "STORE_CART_BACKEND", "store.carts.DatabaseCartStore"))
+
+
+@lru_cache(maxsize=None)
+def _load_store(path):
+    return import_string(path)()
+
+
+def parse_cart_id(value):
+    """UUID أو None (رابط فيه cart id غير صالح = سلة غير موجودة)."""
+    try:
+        return value if isinstance(value, UUID) else UUID(str(value))
+    except ValueError:
+        return None
+
+
+def set_prefetched(instance, related_name, objects):
+    """يملأ كاش ``prefetch_related(related_name)`` بقائمة جاهزة."""
+    prefetched = getattr(instance, related_name).all()
+    prefetched._result_cache = list(objects)
+    prefetched._prefetch_done = True
+    instance._prefetched_objects_cache = {related_name: prefetched}
+    return instance
+
+
+class BaseCartStore:
+    """
+    كل الدوال تأخذ المستخدم + cart id، والسلة التي لا تخص المستخدم تُعامل
+    كغير موجودة (``Cart.DoesNotExist``). السلة والأصناف المُرجعة instances
+    جاهزة لـ ``CartSerializer``/``CartItemSerializer``.
+
+    ``changes`` في ``apply_changes``: ``{product_size_id: (op, quantity)}``
+    بعد دمج العمليات (op = add / set / remove)؛ ترجع ids المقاسات التي
+    ستتجاوز السقف ولا تكتب شيئًا في هذه الحالة.
+    """
+
+    def get_or_create(self, user):
+        """(cart, created)"""
+        raise NotImplementedError
+
+    def get(self, user, cart_id):
+        """السلة بأصنافها أو None"""
+        raise NotImplementedError
+
+    def delete(self, user, cart_id):
+        raise NotImplementedError
+
+    def etag_rows(self, user, cart_id):
+        """[(item_id, quantity, product_size_id, product_id), ...] أو None"""
+        raise NotImplementedError
+
+    def add_quantity(self, user, cart_id, product_size_id, quantity):
+        """الصنف بعد الإضافة، أو None لو الكمية ستتجاوز السقف"""
+        raise NotImplementedError
+
+    def set_quantity(self, user, cart_id, item_id, quantity):
+        """الصنف بعد التعديل، أو None لو الصنف غير موجود"""
+        raise NotImplementedError
+
+    def remove_item(self, user, cart_id, item_id):
+        raise NotImplementedError
+
+    def apply_changes(self, user, cart_id, changes):
+        raise NotImplementedError
+
+    def checkout_lines(self, user, cart_id):
+        """
+        داخل transaction الـ checkout: ``[(product_size, quantity), ...]``
+        مع قفل المقاسات، ``[]`` لسلة فارغة، أو None لو السلة غير موجودة.
+        """
+        raise NotImplementedError
+
+    def discard(self, user, cart_id):
+        """حذف السلة بعد إنشاء الطلب (داخل نفس الـ transaction)."""
+        raise NotImplementedError
+
+    def release(self, user, cart_id):
+        """
+        الـ checkout فشل بعد ``checkout_lines`` رجعت أصناف: السلة ترجع كما
+        كانت. في قاعدة البيانات الـ rollback بيعمل ده.
+        """
+
+    def get_item(self, user, cart_id, item_id):
+        cart = self.get(user, cart_id)
+        if cart is None:
+            raise Cart.DoesNotExist
+        return next((item for item in cart.items.all() if item.pk == item_id), None)
+
+
+# -----------------------------------------------------------------------------
+# ✅ Database (Cart / CartItem)
+# -----------------------------------------------------------------------------
+class DatabaseCartStore(BaseCartStore):
+    def items(self):
+        return CartItem.objects.select_related("product_size__product").order_by("id")
+
+    def _check_cart(self, user, cart_id):
+        if not Cart.objects.filter(pk=cart_id, user=user).exists():
+            raise Cart.DoesNotExist
+
+    def get_or_create(self, user):
+        cart, created = Cart.objects.get_or_create(user=user)
+        return set_prefetched(cart, "items", [] if created else self.items().filter(cart=cart)), created
+
+    def get(self, user, cart_id):
+        return self.get_queryset(user).filter(pk=cart_id).first()
+
+    def get_queryset(self, user):
+        return Cart.objects.filter(user=user).prefetch_related(Prefetch("items", queryset=self.items()))
+
+    def delete(self, user, cart_id):
+        deleted, _ = Cart.objects.filter(pk=cart_id, user=user).delete()
+        return deleted > 0
+
+    def etag_rows(self, user, cart_id):
+        rows = list(
+            CartItem.objects.filter(cart_id=cart_id, cart__user=user)
+            .order_by("id")
+            .values_list("id", "quantity", "product_size_id", "product_size__product_id")
+        )
+        if not rows and not Cart.objects.filter(pk=cart_id, user=user).exists():
+            return None
+        return rows
+
+    def get_item(self, user, cart_id, item_id):
+        item = self.items().filter(pk=item_id, cart_id=cart_id, cart__user=user).first()
+        if item is None:
+            self._check_cart(user, cart_id)
+        return item
+
+    def add_quantity(self, user, cart_id, product_size_id, quantity):
+        self._check_cart(user, cart_id)
+        return CartItem.objects.add_quantity(cart_id, product_size_id, quantity)
+
+    def set_quantity(self, user, cart_id, item_id, quantity):
+        updated = CartItem.objects.filter(pk=item_id, cart_id=cart_id, cart__user=user).update(quantity=quantity)
+        if not updated:
+            self._check_cart(user, cart_id)
+            return None
+        return self.get_item(user, cart_id, item_id)
+
+    def remove_item(self, user, cart_id, item_id):
+        deleted, _ = CartItem.objects.filter(pk=item_id, cart_id=cart_id, cart__user=user).delete()
+        if not deleted:
+            self._check_cart(user, cart_id)
+        return deleted > 0
+
+    def apply_changes(self, user, cart_id, changes):
+        self._check_cart(user, cart_id)
+        return CartItem.objects.apply_changes(cart_id, changes)
+
+    def checkout_lines(self, user, cart_id):
+        lines = list(
+            CartItem.objects.filter(cart_id=cart_id, cart__user=user)
+            .select_related("product_size__product__store")
+            .select_for_update(of=("self", "product_size"))
+            # نفس ترتيب الأقفال في كل السلال (زي الـ key-value stores) — وإلا سلتين
+            # فيهم نفس المقاسات بترتيب إضافة مختلف ممكن يعملوا deadlock
+            .order_by("product_size_id")
+        )
+        if not lines:
+            # error path only: tell a missing cart from an empty one
+            return [] if Cart.objects.filter(pk=cart_id, user=user).exists() else None
+        return [(line.product_size, line.quantity) for line in lines]
+
+    def discard(self, user, cart_id):
+        # instance delete: no SELECT of the cart, its items go in one DELETE
+        Cart(pk=cart_id, user=user).delete()
+
+
+# -----------------------------------------------------------------------------
+# ✅ Key-value stores (Redis / local memory)
+# -----------------------------------------------------------------------------
+class KeyValueCartStore(BaseCartStore):
+    """
+    الـ backend يوفر: ``load(user)`` → ``(cart_id, {size_id: quantity})`` أو
+    None، ``create(user)`` → ``(cart_id, lines, created)``، ``write(user,
+    cart_id, changes)`` → ``(over, quantities)`` أو None، ``drop(user,
+    cart_id)``، و ``import_cart(user, cart_id, lines)`` (``migrate_carts``).
+
+    الـ checkout بيسحب السلة ذريًا (``claim`` → الأصناف، ``{}`` لسلة فارغة
+    ولا تُسحب، أو None) قبل بناء الطلب، فطلبان متزامنان لنفس السلة لا
+    يُنشئان طلبين؛ ``finish`` بعد الـ commit و ``release`` لو فشل.
+
+    ``write`` تدعم كمان op = ``update``: تعديل الكمية لو المقاس موجود بس.
+    ``quantities`` فيها المقاسات اللي اتكتبت فعلًا (``remove``/``update``
+    لمقاس مش موجود مش بتظهر).
+    """
+
+    @property
+    def ttl(self):
+        return getattr(settings, "CART_TTL", 60 * 60 * 24 * 7)
+
+    def key(self, user):
+        return f"cart:{user.pk}"
+
+    def hydrate(self, user, cart_id, lines):
+        cart = Cart(id=UUID(str(cart_id)), user=user)
+        sizes = ProductSize.objects.select_related("product").in_bulk(lines) if lines else {}
+        items = [
+            CartItem(id=size_id, cart=cart, product_size=sizes[size_id], quantity=quantity)
+            for size_id, quantity in sorted(lines.items())
+            if size_id in sizes  # مقاس اتحذف بعد إضافته
+        ]
+        for item in items:
+            item._state.adding = False
+        return set_prefetched(cart, "items", items)
+
+    def _load(self, user, cart_id):
+        loaded = self.load(user)
+        if loaded is None or loaded[0] != str(cart_id):
+            return None
+        return loaded[1]
+
+    def get_or_create(self, user):
+        cart_id, lines, created = self.create(user)
+        return self.hydrate(user, cart_id, lines), created
+
+    def get(self, user, cart_id):
+        lines = self._load(user, cart_id)
+        return None if lines is None else self.hydrate(user, cart_id, lines)
+
+    def delete(self, user, cart_id):
+        return self.drop(user, cart_id)
+
+    def etag_rows(self, user, cart_id):
+        lines = self._load(user, cart_id)
+        if lines is None:
+            return None
+        products = dict(ProductSize.objects.filter(pk__in=lines).values_list("pk", "product_id")) if lines else {}
+        return [
+            (size_id, quantity, size_id, products[size_id])
+            for size_id, quantity in sorted(lines.items())
+            if size_id in products
+        ]
+
+    def _write(self, user, cart_id, changes):
+        result = self.write(user, cart_id, changes)
+        if result is None:
+            raise Cart.DoesNotExist
+        return result
+
+    def _item(self, user, cart_id, size_id, quantity):
+        """الصنف، أو None لو المقاس اتحذف من قاعدة البيانات."""
+        product_size = ProductSize.objects.select_related("product").filter(pk=size_id).first()
+        if product_size is None:
+            return None
+        item = CartItem(
+            id=size_id, cart=Cart(id=UUID(str(cart_id)), user=user), product_size=product_size, quantity=quantity
+        )
+        item._state.adding = False
+        return item
+
+    def add_quantity(self, user, cart_id, product_size_id, quantity):
+        over, quantities = self._write(user, cart_id, {product_size_id: ("add", quantity)})
+        if over:
+            return None
+        item = self._item(user, cart_id, product_size_id, quantities[product_size_id])
+        if item is None:
+            raise ProductSize.DoesNotExist
+        return item
+
+    def set_quantity(self, user, cart_id, item_id, quantity):
+        _, quantities = self._write(user, cart_id, {item_id: ("update", quantity)})
+        if item_id not in quantities:
+            return None
+        return self._item(user, cart_id, item_id, quantity)
+
+    def remove_item(self, user, cart_id, item_id):
+        _, quantities = self._write(user, cart_id, {item_id: ("remove", 0)})
+        return item_id in quantities
+
+    def apply_changes(self, user, cart_id, changes):
+        over, _ = self._write(user, cart_id, changes)
+        return over
+
+    def checkout_lines(self, user, cart_id):
+        lines = self.claim(user, cart_id)
+        if not lines:
+            return None if lines is None else []
+        try:
+            sizes = list(
+                ProductSize.objects.filter(pk__in=lines)
+                .select_related("product__store")
+                .select_for_update(of=("self",))
+                .order_by("id")
+            )
+        except BaseException:
+            self.release(user, cart_id)
+            raise
+        return [(size, lines[size.pk]) for size in sizes]
+
+    def discard(self, user, cart_id):
+        # السلة المسحوبة تُحذف فقط لو الطلب اتحفظ فعلًا
+        transaction.on_commit(lambda: self.finish(user, cart_id))
+
+    @staticmethod
+    def fold(current, changes):
+        """(over, quantities) — الكميات الجديدة، 0 = حذف."""
+        quantities = {}
+        for size_id, (op, quantity) in changes.items():
+            if op in ("remove", "update") and size_id not in current:
+                continue
+            if op == "remove":
+                quantities[size_id] = 0
+            else:
+                quantities[size_id] = quantity + (current.get(size_id, 0) if op == "add" else 0)
+        over = sorted(size_id for size_id, quantity in quantities.items() if quantity > CART_ITEM_MAX_QUANTITY)
+        return over, quantities
+
+
+class LocalMemoryCartStore(KeyValueCartStore):
+    def __init__(self):
+        self._carts = {}
+        self._claimed = {}
+        self._lock = threading.Lock()
+
+    def _entry(self, user):
+        entry = self._carts.get(self.key(user))
+        if entry is not None and entry["expires"] < time.monotonic():
+            del self._carts[self.key(user)]
+            return None
+        return entry
+
+    def _touch(self, entry):
+        entry["expires"] = time.monotonic() + self.ttl
+
+    def load(self, user):
+        with self._lock:
+            entry = self._entry(user)
+            return None if entry is None else (entry["id"], dict(entry["lines"]))
+
+    def create(self, user):
+        with self._lock:
+            entry = self._entry(user)
+            created = entry is None
+            if created:
+                entry = self._carts[self.key(user)] = {"id": str(uuid4()), "lines": {}}
+            self._touch(entry)
+            return entry["id"], dict(entry["lines"]), created
+
+    def write(self, user, cart_id, changes):
+        with self._lock:
+            entry = self._entry(user)
+            if entry is None or entry["id"] != str(cart_id):
+                return None
+            over, quantities = self.fold(entry["lines"], changes)
+            if over:
+                return over, {}
+            for size_id, quantity in quantities.items():
+                if quantity:
+                    entry["lines"][size_id] = quantity
+                else:
+                    entry["lines"].pop(size_id, None)
+            self._touch(entry)
+            return [], quantities
+
+    def drop(self, user, cart_id):
+        with self._lock:
+            entry = self._entry(user)
+            if entry is None or entry["id"] != str(cart_id):
+                return False
+            del self._carts[self.key(user)]
+            return True
+
+    def claim(self, user, cart_id):
+        with self._lock:
+            entry = self._entry(user)
+            if entry is None or entry["id"] != str(cart_id):
+                return None
+            if not entry["lines"]:
+                return {}
+            self._claimed[(self.key(user), entry["id"])] = self._carts.pop(self.key(user))
+            return dict(entry["lines"])
+
+    def release(self, user, cart_id):
+        with self._lock:
+            entry = self._claimed.pop((self.key(user), str(cart_id)), None)
+            # لو المستخدم عمل سلة جديدة أثناء الـ checkout تفضل هي
+            if entry is not None and self._entry(user) is None:
+                self._carts[self.key(user)] = entry
+                self._touch(entry)
+
+    def finish(self, user, cart_id):
+        with self._lock:
+            self._claimed.pop((self.key(user), str(cart_id)), None)
+
+    def import_cart(self, user, cart_id, lines):
+        with self._lock:
+            if self._entry(user) is not None:
+                return False
+            entry = self._carts[self.key(user)] = {"id": str(cart_id), "lines": dict(lines)}
+            self._touch(entry)
+            return True
+
+    def clear(self):
+        with self._lock:
+            self._carts.clear()
+            self._claimed.clear()
+
+
+class RedisCartStore(KeyValueCartStore):
+    """
+    hash ``cart:<user_id>``: الحقل ``id`` = cart id، وكل مقاس حقل برقمه
+    والقيمة الكمية. التعديلات scripts (Lua) ذرية: مقارنة الـ id، الإضافة،
+    فحص السقف، والكتابة + تجديد الـ TTL في خطوة واحدة.
+    """
+
+    CREATE = """
+    local created = redis.call('HSETNX', KEYS[1], 'id', ARGV[1])
+    redis.call('EXPIRE', KEYS[1], ARGV[2])
+    return {created, redis.call('HGETALL', KEYS[1])}
+    """
+
+    WRITE = """
+    if redis.call('HGET', KEYS[1], 'id') ~= ARGV[1] then return false end
+    local limit = tonumber(ARGV[3])
+    local fields, quantities, over = {}, {}, {}
+    for i = 4, #ARGV, 3 do
+        local field, op, quantity = ARGV[i], ARGV[i + 1], tonumber(ARGV[i + 2])
+        local current = redis.call('HGET', KEYS[1], field)
+        if current or (op ~= 'remove' and op ~= 'update') then
+            if op == 'remove' then
+                quantity = 0
+            elseif op == 'add' then
+                quantity = quantity + tonumber(current or '0')
+            end
+            if quantity > limit then table.insert(over, field) end
+            table.insert(fields, field)
+            table.insert(quantities, quantity)
+        end
+    end
+    if #over > 0 then return {0, over} end
+    local result = {}
+    for i, field in ipairs(fields) do
+        if quantities[i] == 0 then
+            redis.call('HDEL', KEYS[1], field)
+        else
+            redis.call('HSET', KEYS[1], field, quantities[i])
+        end
+        table.insert(result, field)
+        table.insert(result, quantities[i])
+    end
+    redis.call('EXPIRE', KEYS[1], ARGV[2])
+    return {1, result}
+    """
+
+    DROP = """
+    if redis.call('HGET', KEYS[1], 'id') ~= ARGV[1] then return 0 end
+    return redis.call('DEL', KEYS[1])
+    """
+
+    # السلة (بالـ TTL بتاعها) تتنقل لـ KEYS[2] لحد ما الـ checkout يخلص
+    CLAIM = """
+    if redis.call('HGET', KEYS[1], 'id') ~= ARGV[1] then return false end
+    if redis.call('HLEN', KEYS[1]) == 1 then return {} end
+    redis.call('RENAME', KEYS[1], KEYS[2])
+    return redis.call('HGETALL', KEYS[2])
+    """
+
+    RELEASE = """
+    if redis.call('EXISTS', KEYS[2]) == 0 then return 0 end
+    if redis.call('RENAMENX', KEYS[2], KEYS[1]) == 0 then
+        redis.call('DEL', KEYS[2])
+        return 0
+    end
+    redis.call('EXPIRE', KEYS[1], ARGV[1])
+    return 1
+    """
+
+    def __init__(self, client=None):
+        if client is None:
+            from django_redis import get_redis_connection
+
+            client = get_redis_connection(getattr(settings, "CART_STORE_CACHE", "default"))
+        self.client = client
+        self._create = self.client.register_script(self.CREATE)
+        self._write_script = self.client.register_script(self.WRITE)
+        self._drop = self.client.register_script(self.DROP)
+        self._claim = self.client.register_script(self.CLAIM)
+        self._release = self.client.register_script(self.RELEASE)
+
+    def claim_key(self, user, cart_id):
+        return f"{self.key(user)}:checkout:{cart_id}"
+
+    @staticmethod
+    def parse(data):
+        data = {key.decode() if isinstance(key, bytes) else key: value for key, value in data.items()}
+        cart_id = data.pop("id", None)
+        if cart_id is None:
+            return None
+        return cart_id.decode() if isinstance(cart_id, bytes) else cart_id, {
+            int(field): int(quantity) for field, quantity in data.items()
+        }
+
+    def load(self, user):
+        return self.parse(self.client.hgetall(self.key(user)))
+
+    def create(self, user):
+        created, flat = self._create(keys=[self.key(user)], args=[str(uuid4()), self.ttl])
+        cart_id, lines = self.parse(dict(zip(flat[::2], flat[1::2])))
+        return cart_id, lines, bool(created)
+
+    def write(self, user, cart_id, changes):
+        args = [str(cart_id), self.ttl, CART_ITEM_MAX_QUANTITY]
+        for size_id, (op, quantity) in changes.items():
+            args += [size_id, op, quantity]
+        result = self._write_script(keys=[self.key(user)], args=args)
+        if result is None:
+            return None
+        ok, values = result
+        if not ok:
+            return sorted(int(field) for field in values), {}
+        return [], {int(field): int(quantity) for field, quantity in zip(values[::2], values[1::2])}
+
+    def drop(self, user, cart_id):
+        return bool(self._drop(keys=[self.key(user)], args=[str(cart_id)]))
+
+    def claim(self, user, cart_id):
+        flat = self._claim(keys=[self.key(user), self.claim_key(user, cart_id)], args=[str(cart_id)])
+        if flat is None:
+            return None
+        if not flat:
+            return {}
+        return self.parse(dict(zip(flat[::2], flat[1::2])))[1]
+
+    def release(self, user, cart_id):
+        # لو المستخدم عمل سلة جديدة أثناء الـ checkout تفضل هي
+        self._release(keys=[self.key(user), self.claim_key(user, cart_id)], args=[self.ttl])
+
+    def finish(self, user, cart_id):
+        self.client.delete(self.claim_key(user, cart_id))
+
+    def import_cart(self, user, cart_id, lines):
+        key = self.key(user)
+        if not self.client.hsetnx(key, "id", str(cart_id)):
+            return False
+        pipe = self.client.pipeline()
+        if lines:
+            pipe.hset(key, mapping={str(size_id): quantity for size_id, quantity in lines.items()})
+        pipe.expire(key, self.ttl)
+        pipe.execute()
+        return True
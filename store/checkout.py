@@ -0,0 +1,68 @@
+"""
+إنشاء الطلب من السلة بعدد ثابت من الـ queries مهما كان عدد الأصناف:
+
+1. قراءة أصناف السلة + المقاسات مع ``SELECT ... FOR UPDATE`` (الأسعار لا
+   تتغير أثناء الـ checkout، وطلبان متزامنان لنفس السلة لا ينفذان معًا)
+2. ``INSERT`` للطلب بالإجمالي النهائي (الحساب في الذاكرة)
+3. ``bulk_create`` لعناصر الطلب
+4. حذف السلة (في الـ key-value stores السلة بتتسحب في الخطوة 1 وبترجع لو
+   الطلب فشل)
+
+الأصناف تأتي من الـ cart store (store/carts.py)؛ مع Redis هذه هي أول مرة
+تُكتب فيها السلة في قاعدة البيانات (كطلب).
+"""
+from decimal import Decimal
+
+from django.db import transaction
+
+from .carts import get_cart_store, set_prefetched
+from .models import Order, OrderItem
+
+
+class CheckoutError(Exception):
+    pass
+
+
+class CartNotFound(CheckoutError):
+    message = "No cart with the given ID was found."
+
+
+class EmptyCart(CheckoutError):
+    message = "The cart is empty."
+
+
+def unit_price(product_size):
+    # السعر المُجمَّد وقت الطلب
+    return product_size.price_after_discount or product_size.price
+
+
+def place_order(customer, cart_id, notes=""):
+    """Returns the new Order with its items prefetched (ready for OrderSerializer)."""
+    store = get_cart_store()
+    lines = None
+    try:
+        with transaction.atomic():
+            lines = store.checkout_lines(customer, cart_id)
+            if lines is None:
+                raise CartNotFound(CartNotFound.message)
+            if not lines:
+                raise EmptyCart(EmptyCart.message)
+
+            items = [
+                OrderItem(product_size=product_size, quantity=quantity, unit_price=unit_price(product_size))
+                for product_size, quantity in lines
+            ]
+            total = sum((item.quantity * item.unit_price for item in items), Decimal("0.00"))
+            order = Order.objects.create(customer=customer, notes=notes, total_price=total)
+
+            for item in items:
+                item.order = order
+            OrderItem.objects.bulk_create(items)
+            store.discard(customer, cart_id)
+    except BaseException:
+        if lines:
+            store.release(customer, cart_id)
+        raise
+
+    # same shape as a prefetch_related("items") result
+    return set_prefetched(order, "items", items)
@@ -0,0 +1,210 @@
+"""
+مسار قراءة سريع لقوائم الـ API (list فقط).
+
+بدل إنشاء Field objects لكل صف، كل Compiled*Serializer يقرأ صفوف
+``values()`` + جداول فرعية في query واحدة لكل علاقة، ويبني نفس الـ dicts
+التي يخرجها الـ ModelSerializer المقابل بنفس ترتيب الحقول والقيم — أي أن
+الـ JSON الناتج مطابق byte-by-byte (انظر ``manage.py bench_serializers``).
+"""
+from collections import defaultdict
+
+from django.conf import settings
+from django.utils.timezone import localtime
+from rest_framework import serializers
+from rest_framework.response import Response
+from rest_framework.reverse import reverse
+
+from . import metrics
+from .images import API_PRESETS, image_url, variant_url, variants
+from .models import OrderItem, ProductSize, Store
+
+# field objects are built once per process, not per row
+_price = serializers.DecimalField(max_digits=10, decimal_places=2)
+
+
+def _decimal(field, value):
+    return None if value is None else field.to_representation(value)
+
+
+def _images(image):
+    # store.images.ImageVariantsField
+    urls = variants(image)
+    return {preset: urls[preset] for preset in API_PRESETS} if urls else None
+
+
+class CompiledSerializer:
+    values_fields = ()
+
+    def __init__(self, context=None):
+        self.context = context or {}
+
+    def prepare(self, queryset):
+        return queryset.prefetch_related(None).values(*self.values_fields)
+
+    def serialize(self, rows):
+        raise NotImplementedError
+
+
+# -----------------------------------------------------------------------------
+# ✅ ProductSerializer
+# -----------------------------------------------------------------------------
+class CompiledProductSerializer(CompiledSerializer):
+    values_fields = (
+        "id", "title", "description", "store_id", "store_category_id", "store_category__name", "image", "available",
+    )
+
+    def serialize(self, rows):
+        rows = list(rows)
+        sizes = defaultdict(list)
+        size_rows = (
+            ProductSize.objects.filter(product_id__in=[row["id"] for row in rows])
+            .order_by("product_id", "size_name")
+            .values_list("product_id", "id", "size_name", "size_type", "price", "price_after_discount", "is_available")
+        )
+        for product_id, pk, size_name, size_type, price, price_after_discount, is_available in size_rows:
+            sizes[product_id].append({
+                "id": pk,
+                "size_name": size_name,
+                "size_type": size_type,
+                "price": _decimal(_price, price),
+                "price_after_discount": _decimal(_price, price_after_discount),
+                "is_available": is_available,
+            })
+
+        return [
+            {
+                "id": row["id"],
+                "title": row["title"],
+                "description": row["description"],
+                "store": row["store_id"],
+                "store_category": (
+                    {"id": row["store_category_id"], "name": row["store_category__name"]}
+                    if row["store_category_id"] is not None else None
+                ),
+                "sizes": sizes.get(row["id"], []),
+                "image": variant_url(row["image"], "card_600"),
+                "images": _images(row["image"]),
+                "available": row["available"],
+            }
+            for row in rows
+        ]
+
+
+# -----------------------------------------------------------------------------
+# ✅ CategorySerializer
+# -----------------------------------------------------------------------------
+class CompiledCategorySerializer(CompiledSerializer):
+    values_fields = ("id", "name", "total_stores", "image")
+
+    def serialize(self, rows):
+        rows = list(rows)
+        request = self.context.get("request")
+        # reverse() once, then substitute the pk per store
+        store_url = reverse("stores-detail", args=["__pk__"], request=request)
+        stores = defaultdict(list)
+        store_rows = (
+            Store.objects.filter(category_id__in=[row["id"] for row in rows])
+            .order_by("id")
+            .values_list("category_id", "id", "name", "image")
+        )
+        for category_id, pk, name, image in store_rows:
+            stores[category_id].append({
+                "id": pk,
+                "name": name,
+                "store_url": store_url.replace("__pk__", str(pk)),
+                "image": image_url(image),
+            })
+
+        return [
+            {
+                "id": row["id"],
+                "name": row["name"],
+                "total_stores": row["total_stores"],
+                "stores": stores.get(row["id"], []),
+                "image": self._image(row["image"], request),
+            }
+            for row in rows
+        ]
+
+    @staticmethod
+    def _image(image, request):
+        # serializers.ImageField.to_representation
+        if not image:
+            return None
+        try:
+            url = image.url
+        except AttributeError:
+            return None
+        return request.build_absolute_uri(url) if request is not None else url
+
+
+# -----------------------------------------------------------------------------
+# ✅ OrderSerializer
+# -----------------------------------------------------------------------------
+class CompiledOrderSerializer(CompiledSerializer):
+    values_fields = ("id", "order_status", "placed_at", "customer__full_name", "total_price", "notes", "version")
+
+    def serialize(self, rows):
+        rows = list(rows)
+        request = self.context.get("request")
+        items = defaultdict(list)
+        stores = {}
+        item_rows = (
+            OrderItem.objects.filter(order_id__in=[row["id"] for row in rows])
+            .order_by("id")
+            .values_list(
+                "order_id", "id", "product_size_id", "product_size__product__title", "product_size__product__image",
+                "quantity", "unit_price", "product_size__product__store__name", "product_size__product__store__image",
+            )
+        )
+        for order_id, pk, product_size_id, title, image, quantity, unit_price, store_name, store_image in item_rows:
+            items[order_id].append({
+                "id": pk,
+                "product_size": product_size_id,
+                "product_name": title,
+                "product_image": variant_url(image, "thumb_150"),
+                "quantity": quantity,
+                "total_item_price": float(quantity * unit_price),
+            })
+            stores.setdefault(order_id, (store_name, store_image))
+
+        output = []
+        for row in rows:
+            store_name, store_image = stores.get(row["id"], (None, None))
+            store_image = image_url(store_image)
+            output.append({
+                "id": row["id"],
+                "order_status": row["order_status"],
+                "placed_at": localtime(row["placed_at"]).strftime("%Y-%m-%d %H:%M"),
+                "customer": row["customer__full_name"],
+                "items": items.get(row["id"], []),
+                "total_price": _decimal(_price, row["total_price"]),
+                "notes": row["notes"],
+                "store_name": store_name,
+                "store_image": request.build_absolute_uri(store_image) if store_image else None,
+                "version": row["version"],
+            })
+        return output
+
+
+# -----------------------------------------------------------------------------
+# ✅ ViewSet mixin
+# -----------------------------------------------------------------------------
+class CompiledListMixin:
+    """``list`` goes through ``compiled_serializer_class`` when enabled."""
+
+    compiled_serializer_class = None
+
+    def list(self, request, *args, **kwargs):
+        if self.compiled_serializer_class is None or not getattr(settings, "STORE_COMPILED_SERIALIZERS", True):
+            return super().list(request, *args, **kwargs)
+
+        compiled = self.compiled_serializer_class(context=self.get_serializer_context())
+        queryset = compiled.prepare(self.filter_queryset(self.get_queryset()))
+
+        page = self.paginate_queryset(queryset)
+        with metrics.timed("serialize", self):
+            data = compiled.serialize(page if page is not None else queryset)
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
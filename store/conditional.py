@@ -0,0 +1,72 @@
+"""
+Conditional GET (ETag / Last-Modified / 304).
+
+الـ viewset يحسب validators رخيصة (عدادات الكاش، أو aggregate واحد) في
+``get_validators`` قبل تشغيل الـ queryset الأساسي؛ لو العميل أرسل
+``If-None-Match``/``If-Modified-Since`` مطابقًا يرجع 304 بدون body.
+"""
+import hashlib
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+
+class ConditionalResponse(Exception):
+    def __init__(self, response):
+        self.response = response
+
+
+def make_etag(*parts):
+    """Weak ETag: the body is equivalent, not byte-identical (brotli, renderers)."""
+    digest = hashlib.md5("|".join(str(part) for part in parts).encode()).hexdigest()
+    return f"W/{quote_etag(digest)}"
+
+
+def timestamp(value):
+    """datetime / epoch seconds / None → int epoch seconds (HTTP-date precision)."""
+    if value is None:
+        return None
+    if hasattr(value, "timestamp"):
+        value = value.timestamp()
+    return int(value)
+
+
+class ConditionalGetMixin:
+    """
+    Runs after authentication/permissions (``initial``) and before the
+    handler, so it also covers overridden ``list``/``retrieve`` methods.
+    Subclasses return ``(etag, last_modified)`` from ``get_validators``.
+    """
+
+    conditional_actions = ("list", "retrieve")
+
+    def get_validators(self, request, *args, **kwargs):
+        return None, None
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.conditional_validators = None
+        if request.method not in ("GET", "HEAD") or self.action not in self.conditional_actions:
+            return
+
+        etag, last_modified = self.get_validators(request, *args, **kwargs)
+        self.conditional_validators = etag, timestamp(last_modified)
+        response = get_conditional_response(request, etag=etag, last_modified=self.conditional_validators[1])
+        if response is not None:  # 304 (or 412 for a failed If-Match)
+            raise ConditionalResponse(response)
+
+    def handle_exception(self, exc):
+        if isinstance(exc, ConditionalResponse):
+            return exc.response
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        validators = getattr(self, "conditional_validators", None)
+        if validators and response.status_code in (200, 304):
+            etag, last_modified = validators
+            if etag and not response.has_header("ETag"):
+                response["ETag"] = etag
+            if last_modified and not response.has_header("Last-Modified"):
+                response["Last-Modified"] = http_date(last_modified)
+        return response
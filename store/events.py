@@ -0,0 +1,218 @@
+"""
+أحداث الطلبات للـ admin (Server-Sent Events) بدل الـ polling.
+
+- ``notify_order_saved`` (من store/signals.py) تنشر حدث عند إنشاء طلب أو
+  تغيير حالته، بعد الـ commit فقط.
+- الـ broker (``ORDER_EVENTS_BROKER``): ``RedisBroker`` (pub/sub، كل الـ
+  workers) أو ``LocalBroker`` (داخل الـ process — للتطوير والاختبارات).
+- عدد الطلبات الـ Pending محفوظ في الكاش ويتعدل بـ incr/decr مع كل حدث؛
+  يُعاد حسابه من قاعدة البيانات فقط لو المفتاح غير موجود (أو انتهت مدته).
+- ``order_events_stream`` هو الـ body بتاع ``/admin/store/order/events/``.
+"""
+import asyncio
+import json
+import threading
+from functools import lru_cache
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+from .models import Order
+
+PENDING_KEY = "orders:pending"
+ORDER_CREATED = "order_created"
+ORDER_STATUS = "order_status"
+PENDING = "pending"
+# الحالة السابقة غير معروفة (instance لم يُقرأ من قاعدة البيانات)
+UNKNOWN = object()
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+# -----------------------------------------------------------------------------
+# ✅ Pending counter
+# -----------------------------------------------------------------------------
+def pending_orders_count():
+    count = cache.get(PENDING_KEY)
+    if count is None:
+        count = Order.objects.filter(order_status=Order.ORDER_STATUS_PENDING).count()
+        # المدة تعالج أي drift (تعديلات بـ queryset.update لا تمر على الـ signals)
+        cache.add(PENDING_KEY, count, _setting("ORDER_PENDING_COUNT_TIMEOUT", 60 * 60))
+    return count
+
+
+def adjust_pending_count(delta):
+    if not delta:
+        return
+    try:
+        cache.incr(PENDING_KEY, delta)
+    except ValueError:
+        pass  # لم يُحسب بعد — أول قراءة تحسبه من قاعدة البيانات
+
+
+def pending_delta(previous, status):
+    return (status == Order.ORDER_STATUS_PENDING) - (previous == Order.ORDER_STATUS_PENDING)
+
+
+# -----------------------------------------------------------------------------
+# ✅ Brokers
+# -----------------------------------------------------------------------------
+def get_broker():
+    return _load_broker(_setting("ORDER_EVENTS_BROKER", "store.events.RedisBroker"))
+
+
+@lru_cache(maxsize=None)
+def _load_broker(path):
+    return import_string(path)()
+
+
+class LocalBroker:
+    """كل subscriber له asyncio.Queue؛ النشر ممكن من أي thread."""
+
+    max_queue = 100
+
+    def __init__(self):
+        self.subscribers = set()
+        self.lock = threading.Lock()
+
+    def publish(self, event):
+        with self.lock:
+            subscribers = list(self.subscribers)
+        for subscription in subscribers:
+            subscription.loop.call_soon_threadsafe(subscription.put, event)
+
+    def subscribe(self):
+        return LocalSubscription(self)
+
+
+class LocalSubscription:
+    # class (مش asynccontextmanager) عشان الإغلاق يشتغل صح لما الـ stream يتقفل من برا
+    def __init__(self, broker):
+        self.broker = broker
+
+    async def __aenter__(self):
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(self.broker.max_queue)
+        with self.broker.lock:
+            self.broker.subscribers.add(self)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        with self.broker.lock:
+            self.broker.subscribers.discard(self)
+
+    def put(self, event):
+        if not self.queue.full():  # subscriber بطيء: نسقط الحدث بدل ما نحجز الذاكرة
+            self.queue.put_nowait(event)
+
+    async def get(self, timeout):
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class RedisBroker:
+    @property
+    def channel(self):
+        return _setting("ORDER_EVENTS_CHANNEL", "orders:events")
+
+    def publish(self, event):
+        from django_redis import get_redis_connection
+
+        get_redis_connection("default").publish(self.channel, json.dumps(event))
+
+    def subscribe(self):
+        return RedisSubscription(self.channel)
+
+
+class RedisSubscription:
+    def __init__(self, channel):
+        self.channel = channel
+
+    async def __aenter__(self):
+        from redis import asyncio as aioredis
+
+        self.client = aioredis.from_url(settings.CACHES["default"]["LOCATION"])
+        self.pubsub = self.client.pubsub()
+        await self.pubsub.subscribe(self.channel)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.pubsub.aclose()
+        await self.client.aclose()
+
+    async def get(self, timeout):
+        message = await self.pubsub.get_message(ignore_subscribe_messages=True, timeout=timeout)
+        return json.loads(message["data"]) if message else None
+
+
+# -----------------------------------------------------------------------------
+# ✅ Publishing
+# -----------------------------------------------------------------------------
+def notify_order_saved(order, previous_status, created):
+    """
+    ``previous_status`` هي الحالة المحفوظة قبل هذا الـ save (None لو الطلب
+    جديد، أو ``UNKNOWN``). لو الحالة لم تتغير لا يُنشر شيء.
+    """
+    status = order.order_status
+    if not created and previous_status == status:
+        return
+    if previous_status is UNKNOWN:
+        previous_status, delta = None, None
+    else:
+        delta = pending_delta(previous_status, status)
+    event = {
+        "type": ORDER_CREATED if created else ORDER_STATUS,
+        "order": order.pk,
+        "status": status,
+        "previous": previous_status,
+    }
+    transaction.on_commit(lambda: publish(event, delta), robust=True)
+
+
+def notify_order_deleted(order):
+    if order.order_status == Order.ORDER_STATUS_PENDING:
+        transaction.on_commit(lambda: adjust_pending_count(-1), robust=True)
+
+
+def publish(event, pending_change=0):
+    """``pending_change=None``: التغيير غير معروف، يُعاد العد من قاعدة البيانات."""
+    if pending_change is None:
+        cache.delete(PENDING_KEY)
+    else:
+        adjust_pending_count(pending_change)
+    event[PENDING] = pending_orders_count()
+    get_broker().publish(event)
+
+
+# -----------------------------------------------------------------------------
+# ✅ SSE
+# -----------------------------------------------------------------------------
+def format_event(event, name=None):
+    lines = [f"event: {name}"] if name else []
+    lines.append(f"data: {json.dumps(event)}")
+    return "\n".join(lines) + "\n\n"
+
+
+async def order_events_stream():
+    keepalive = _setting("ORDER_EVENTS_KEEPALIVE", 15)
+    count = await sync_to_async(pending_orders_count)()
+    yield f"retry: {_setting('ORDER_EVENTS_RETRY', 3000)}\n" + format_event({PENDING: count}, PENDING)
+
+    async with get_broker().subscribe() as subscription:
+        while True:
+            event = await subscription.get(keepalive)
+            # comment كل ``keepalive`` ثانية عشان الـ proxies ما تقفلش الاتصال
+            yield format_event(event, event["type"]) if event else ": keepalive\n\n"
+
+
+def order_events_snapshot():
+    """تحت WSGI: حدث واحد بالعدد الحالي ثم يقفل، و EventSource يعيد الاتصال بعد ``retry``."""
+    retry = _setting("ORDER_EVENTS_WSGI_RETRY", 15000)
+    yield f"retry: {retry}\n" + format_event({PENDING: pending_orders_count()}, PENDING)
@@ -1,16 +1,16 @@
 import django_filters
-from .models import Product,Store,Category
-from django.db import models
+from .models import Product,Store,Category,Order,ArchivedOrder
+from .search import search_store_name, search_title
 
 class ProductFilter(django_filters.FilterSet):
-    # فلترة السعر الأدنى
-    min_price = django_filters.NumberFilter(field_name="unit_price", lookup_expr='gte')
+    # فلترة السعر الأدنى (على العمود المُجمَّع min_price المفهرس)
+    min_price = django_filters.NumberFilter(field_name="min_price", lookup_expr='gte')
     # فلترة السعر الأعلى
-    max_price = django_filters.NumberFilter(field_name="unit_price", lookup_expr='lte')
-    # البحث في العنوان باستخدام contains (غير حساس لحالة الأحرف)
-    title = django_filters.CharFilter(field_name="title", lookup_expr='icontains')
-    # البحث باستخدام اسم المتجر
-    store_name = django_filters.CharFilter(field_name="store__name", lookup_expr='icontains')
+    max_price = django_filters.NumberFilter(field_name="min_price", lookup_expr='lte')
+    # العنوان المُطبَّع بس (store/search.py) — البحث في كل النص عبر ?search=
+    title = django_filters.CharFilter(method='filter_title')
+    # اسم المتجر المُطبَّع بس (Store.search_name)
+    store_name = django_filters.CharFilter(method='filter_store_name')
     store = django_filters.NumberFilter(field_name="store__id")  # ✅ فلترة حسب المتجر بالـ ID
     has_discount = django_filters.BooleanFilter(method='filter_has_discount',label='Has discount')
     available = django_filters.BooleanFilter(field_name="available")  # ✅ أهو دا الجديد
@@ -18,19 +18,16 @@ class ProductFilter(django_filters.FilterSet):
     
     
     
+    def filter_title(self, queryset, name, value):
+        return search_title(queryset, value)
+
+    def filter_store_name(self, queryset, name, value):
+        return search_store_name(queryset, value)
+
     def filter_has_discount(self, queryset, name, value):
         if value:
-            return queryset.filter(
-                price_after_discount__lt=models.F('unit_price'),
-                price_after_discount__isnull=False,
-                unit_price__isnull=False
-            )
-        else:
-            return queryset.filter(
-                price_after_discount__gte=models.F('unit_price'),
-                price_after_discount__isnull=False,
-                unit_price__isnull=False
-            )
+            return queryset.filter(max_discount_pct__gt=0)
+        return queryset.filter(max_discount_pct=0)
 
 
     
@@ -63,5 +60,16 @@ class CategoryFilter(django_filters.FilterSet):
 
 
 
+class OrderFilter(django_filters.FilterSet):
+    # مدى تاريخ صريح — بدونه قائمة الـ staff آخر ORDERS_RECENT_DAYS يوم (store/archive.py)
+    placed_after = django_filters.DateTimeFilter(field_name="placed_at", lookup_expr='gte')
+    placed_before = django_filters.DateTimeFilter(field_name="placed_at", lookup_expr='lt')
+
+    class Meta:
+        model = Order
+        fields = ['order_status', 'placed_after', 'placed_before']
 
 
+class ArchivedOrderFilter(OrderFilter):
+    class Meta(OrderFilter.Meta):
+        model = ArchivedOrder
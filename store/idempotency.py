@@ -0,0 +1,121 @@
+"""
+Idempotency-Key لطلبات POST (إنشاء الطلب / إضافة صنف للسلة).
+
+أول request بمفتاح معين يحجز المفتاح في الكاش (``cache.add``) وينفذ، ثم
+يخزن الـ response (status + bytes) لمدة ``IDEMPOTENCY_KEY_TTL``. أي إعادة
+بنفس المفتاح ونفس الـ payload ترجع الـ response المخزن بدون لمس قاعدة
+البيانات؛ وإعادة متزامنة تنتظر انتهاء التنفيذ الأول بدل أن تسبقه.
+"""
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from rest_framework import status
+from rest_framework.response import Response
+
+HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+RUNNING = "running"
+DONE = "done"
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+class IdempotencyMixin:
+    """
+    ``create`` honours the ``Idempotency-Key`` header. Viewsets that
+    override ``create`` wrap their handler with ``idempotent_response``.
+    """
+
+    idempotency_poll_interval = 0.05
+
+    def create(self, request, *args, **kwargs):
+        return self.idempotent_response(super().create, request, *args, **kwargs)
+
+    def get_idempotency_cache_key(self, request, key):
+        digest = hashlib.sha256(key.encode()).hexdigest()[:32]
+        return f"idem:{self.basename}:{request.user.pk or 'anon'}:{digest}"
+
+    def get_idempotency_fingerprint(self, request):
+        payload = json.dumps(request.data, sort_keys=True, default=str)
+        return hashlib.sha256(f"{request.method}|{request.path}|{payload}".encode()).hexdigest()
+
+    def idempotent_response(self, handler, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key:
+            return handler(request, *args, **kwargs)
+        if len(key) > 255:
+            return Response({"detail": f"{HEADER} is too long."}, status=status.HTTP_400_BAD_REQUEST)
+
+        cache_key = self.get_idempotency_cache_key(request, key)
+        fingerprint = self.get_idempotency_fingerprint(request)
+        lock_timeout = _setting("IDEMPOTENCY_LOCK_TIMEOUT", 60)
+
+        if not cache.add(cache_key, {"state": RUNNING, "fingerprint": fingerprint}, lock_timeout):
+            return self.replay(cache_key, fingerprint)
+
+        try:
+            response = handler(request, *args, **kwargs)
+        except Exception:
+            cache.delete(cache_key)  # nothing was committed: let the client retry
+            raise
+
+        def store(rendered):
+            if rendered.status_code >= 500:
+                cache.delete(cache_key)
+                return
+            cache.set(
+                cache_key,
+                {
+                    "state": DONE,
+                    "fingerprint": fingerprint,
+                    "status": rendered.status_code,
+                    "content": rendered.content,
+                    "content_type": rendered["Content-Type"],
+                },
+                _setting("IDEMPOTENCY_KEY_TTL", 60 * 60 * 24),
+            )
+
+        if hasattr(response, "add_post_render_callback"):
+            response.add_post_render_callback(store)
+        else:
+            store(response)
+        return response
+
+    def replay(self, cache_key, fingerprint):
+        deadline = time.monotonic() + _setting("IDEMPOTENCY_WAIT", 10)
+        record = cache.get(cache_key)
+        # a duplicate that arrives while the first request runs waits for it
+        while (
+            record is not None
+            and record["state"] == RUNNING
+            and record["fingerprint"] == fingerprint
+            and time.monotonic() < deadline
+        ):
+            time.sleep(self.idempotency_poll_interval)
+            record = cache.get(cache_key)
+
+        if record is None:
+            # the first attempt failed and released the key
+            return Response(
+                {"detail": "The original request failed, retry it."}, status=status.HTTP_409_CONFLICT
+            )
+        if record["fingerprint"] != fingerprint:
+            return Response(
+                {"detail": f"{HEADER} was already used with a different request."},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            )
+        if record["state"] == RUNNING:
+            return Response(
+                {"detail": "A request with this Idempotency-Key is still in progress."},
+                status=status.HTTP_409_CONFLICT,
+            )
+
+        response = HttpResponse(record["content"], status=record["status"], content_type=record["content_type"])
+        response[REPLAYED_HEADER] = "true"
+        return response
@@ -0,0 +1,90 @@
+"""
+روابط صور Cloudinary بمقاسات ثابتة (presets).
+
+كل preset هو transformation يُضاف بعد ``/upload/``. الروابط تُحسب مرة واحدة
+لكل (public_id, version, format) وتُحفظ في LRU داخل الـ process، فلا يُبنى
+``CloudinaryResource.url`` لكل صف في كل request. الحفظ من الـ admin/API
+يُسخّن الـ LRU (store/signals.py).
+"""
+from functools import lru_cache
+
+import cloudinary
+from cloudinary import CloudinaryResource
+from rest_framework import serializers
+
+PRESETS = {
+    "thumb_150": "w_150,h_150,c_fit,q_auto,f_auto",
+    "card_600": "w_600,h_600,c_fit,q_auto:eco,f_auto",
+    "admin_100": "w_100,q_auto,f_auto",
+}
+ORIGINAL = "original"
+# the map exposed by the API (``images`` field)
+API_PRESETS = ("thumb_150", "card_600")
+
+
+def image_key(image):
+    """Hashable identity of a stored image, or None."""
+    if not image or not isinstance(image, CloudinaryResource):
+        return None
+    config = cloudinary.config()
+    return (
+        image.resource_type,
+        image.type,
+        image.public_id,
+        image.version,
+        image.format,
+        config.cloud_name,
+        bool(config.secure),
+    )
+
+
+@lru_cache(maxsize=20_000)
+def _variants(key):
+    resource_type, delivery_type, public_id, version, file_format, _, _ = key
+    url = CloudinaryResource(
+        public_id, format=file_format, version=version, type=delivery_type, resource_type=resource_type
+    ).url
+    urls = {name: url.replace("/upload/", f"/upload/{transformation}/") for name, transformation in PRESETS.items()}
+    urls[ORIGINAL] = url
+    return urls
+
+
+def variants(image):
+    """{preset: url, "original": url} أو None لو مفيش صورة (أو Cloudinary غير مُعد)."""
+    key = image_key(image)
+    if key is None:
+        return None
+    try:
+        return _variants(key)
+    except Exception:
+        return None
+
+
+def variant_url(image, preset):
+    urls = variants(image)
+    return urls[preset] if urls else None
+
+
+def image_url(image):
+    return variant_url(image, ORIGINAL)
+
+
+def warm(image):
+    variants(image)
+
+
+def cache_info():
+    return _variants.cache_info()
+
+
+class ImageVariantsField(serializers.ReadOnlyField):
+    """``{"thumb_150": url, "card_600": url}`` — srcset-style map."""
+
+    def __init__(self, presets=API_PRESETS, **kwargs):
+        kwargs.setdefault("source", "image")
+        self.presets = presets
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        urls = variants(value)
+        return {preset: urls[preset] for preset in self.presets} if urls else None
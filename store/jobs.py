@@ -0,0 +1,163 @@
+"""
+Background jobs خفيفة فوق قاعدة البيانات (بدون broker خارجي).
+
+- ``@job("name")`` يسجل الدالة؛ ``enqueue("name", *args, **kwargs)`` أو
+  ``fn.enqueue(...)`` يضيف صف ``Job`` بعد الـ commit (``transaction.on_commit``)
+  فالـ job لا يرى بيانات لم تُحفظ ولا يُنفذ لو الـ transaction اتلغى.
+- الـ worker (``manage.py run_jobs``) يحجز الـ jobs بـ
+  ``SELECT ... FOR UPDATE SKIP LOCKED``، ويعيد المحاولة مع backoff أُسّي.
+- ``JOBS_SYNC = True``: التنفيذ مباشرة بعد الـ commit داخل نفس الـ process
+  (الاختبارات / التطوير بدون worker)، والأخطاء تظهر كما هي.
+
+الـ args/kwargs لازم تكون JSON (ids مش model instances).
+"""
+import logging
+import random
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+_registry = {}
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def job(name, max_attempts=5):
+    def register(func):
+        if name in _registry:
+            raise ValueError(f"Job {name!r} is already registered.")
+        _registry[name] = (func, max_attempts)
+        func.job_name = name
+        func.enqueue = lambda *args, **kwargs: enqueue(name, *args, **kwargs)
+        return func
+
+    return register
+
+
+def get_job(name):
+    try:
+        return _registry[name]
+    except KeyError:
+        raise LookupError(f"No job registered as {name!r}.") from None
+
+
+def enqueue(name, *args, dedupe_key=None, delay=None, **kwargs):
+    """
+    ``dedupe_key``: لو فيه job منتظر بنفس المفتاح لا يُضاف غيره.
+    ``delay``: timedelta أو ثواني قبل أول تنفيذ.
+    """
+    _, max_attempts = get_job(name)  # اسم غلط يظهر وقت الـ enqueue مش في الـ worker
+    if _setting("JOBS_SYNC", False):
+        transaction.on_commit(lambda: run_inline(name, args, kwargs))
+        return
+
+    if delay is not None and not isinstance(delay, timedelta):
+        delay = timedelta(seconds=delay)
+
+    def insert():
+        # ignore_conflicts: نفس الـ dedupe_key منتظر بالفعل
+        Job.objects.bulk_create(
+            [
+                Job(
+                    name=name,
+                    args=list(args),
+                    kwargs=kwargs,
+                    dedupe_key=dedupe_key,
+                    max_attempts=max_attempts,
+                    run_after=timezone.now() + (delay or timedelta()),
+                )
+            ],
+            ignore_conflicts=True,
+        )
+
+    transaction.on_commit(insert, robust=True)
+
+
+def run_inline(name, args, kwargs):
+    func, _ = get_job(name)
+    return func(*args, **kwargs)
+
+
+# -----------------------------------------------------------------------------
+# ✅ Worker
+# -----------------------------------------------------------------------------
+def backoff(attempts):
+    """ثواني الانتظار قبل المحاولة رقم ``attempts + 1`` (أُسّي + jitter)."""
+    base = _setting("JOBS_RETRY_BASE", 5)
+    cap = _setting("JOBS_RETRY_MAX", 60 * 60)
+    delay = min(cap, base * 2 ** (attempts - 1))
+    return delay * random.uniform(0.8, 1.2)
+
+
+def claim(batch_size):
+    """يحجز ``batch_size`` jobs جاهزة (الـ workers الآخرين يتخطوها)."""
+    now = timezone.now()
+    with transaction.atomic():
+        jobs = list(
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(status=Job.STATUS_QUEUED, run_after__lte=now)
+            .order_by("run_after", "id")[:batch_size]
+        )
+        if jobs:
+            Job.objects.filter(pk__in=[job.pk for job in jobs]).update(
+                status=Job.STATUS_RUNNING, locked_at=now, attempts=F("attempts") + 1
+            )
+    for job in jobs:
+        job.status, job.locked_at, job.attempts = Job.STATUS_RUNNING, now, job.attempts + 1
+    return jobs
+
+
+def execute(job):
+    try:
+        run_inline(job.name, job.args, job.kwargs)
+    except Exception:
+        error = traceback.format_exc()
+        logger.exception("Job %s #%s failed (attempt %s/%s)", job.name, job.pk, job.attempts, job.max_attempts)
+        if job.attempts < job.max_attempts:
+            fields = {
+                "status": Job.STATUS_QUEUED,
+                "run_after": timezone.now() + timedelta(seconds=backoff(job.attempts)),
+            }
+        else:
+            fields = {"status": Job.STATUS_FAILED}
+        try:
+            Job.objects.filter(pk=job.pk).update(locked_at=None, last_error=error, updated_at=timezone.now(), **fields)
+        except IntegrityError:
+            # job بنفس الـ dedupe_key اتضاف أثناء التنفيذ — هو يكفي
+            Job.objects.filter(pk=job.pk).update(status=Job.STATUS_FAILED, last_error=error, locked_at=None)
+        return False
+
+    Job.objects.filter(pk=job.pk).update(status=Job.STATUS_DONE, locked_at=None, updated_at=timezone.now())
+    return True
+
+
+def requeue_stuck():
+    """jobs فضلت running بعد ``JOBS_LOCK_TIMEOUT`` (worker وقع) ترجع للطابور."""
+    cutoff = timezone.now() - timedelta(seconds=_setting("JOBS_LOCK_TIMEOUT", 15 * 60))
+    stuck = Job.objects.filter(status=Job.STATUS_RUNNING, locked_at__lt=cutoff)
+    requeued = 0
+    for job_id in stuck.values_list("pk", flat=True):
+        try:
+            requeued += Job.objects.filter(pk=job_id, status=Job.STATUS_RUNNING).update(
+                status=Job.STATUS_QUEUED, locked_at=None
+            )
+        except IntegrityError:
+            # job بنفس الـ dedupe_key منتظر بالفعل
+            Job.objects.filter(pk=job_id).update(status=Job.STATUS_FAILED, locked_at=None)
+    return requeued
+
+
+def purge_finished():
+    cutoff = timezone.now() - timedelta(seconds=_setting("JOBS_KEEP_DONE", 7 * 24 * 60 * 60))
+    deleted, _ = Job.objects.filter(status=Job.STATUS_DONE, updated_at__lt=cutoff).delete()
+    return deleted
@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from store.archive import archivable_orders, archive_batch, archive_cutoff
+
+
+class Command(BaseCommand):
+    help = "Move Delivered/Canceled orders older than N months from the order tables to the archive."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--months",
+            type=int,
+            default=getattr(settings, "ORDERS_ARCHIVE_AFTER_MONTHS", 6),
+            help="Archive closed orders placed before the start of the month N months ago.",
+        )
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--dry-run", action="store_true", help="Only count the orders that would move.")
+
+    def handle(self, *args, **options):
+        before = archive_cutoff(options["months"])
+        if options["dry_run"]:
+            count = archivable_orders(before).count()
+            self.stdout.write(f"{count} orders placed before {before:%Y-%m-%d} would be archived.")
+            return
+
+        archived = 0
+        while moved := archive_batch(before, options["batch_size"]):
+            archived += moved
+            self.stdout.write(f"Archived {archived} orders...")
+        self.stdout.write(self.style.SUCCESS(f"Archived {archived} orders placed before {before:%Y-%m-%d}."))
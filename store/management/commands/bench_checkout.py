@@ -0,0 +1,56 @@
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from store.checkout import place_order
+from store.models import Cart, CartItem, Category, Product, ProductSize, Store, User
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Time place_order() for carts of 1-100 lines (seeded data is rolled back)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lines", type=int, nargs="+", default=[1, 5, 10, 25, 50, 100])
+        parser.add_argument("--rounds", type=int, default=10)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options["lines"], options["rounds"])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, line_counts, rounds):
+        user = User.objects.create_user(phone="bench-checkout", full_name="Bench")
+        category = Category.objects.create(name="bench checkout")
+        store = Store.objects.create(name="bench checkout store", address="-", category=category)
+        sizes = []
+        for index in range(max(line_counts)):
+            product = Product.objects.create(title=f"bench {index}", store=store)
+            sizes.append(ProductSize(product=product, size_name="M", size_type="default", price=Decimal("50.00")))
+        ProductSize.objects.bulk_create(sizes)
+
+        self.stdout.write(f"{'lines':>5} {'queries':>8} {'avg':>10} {'best':>10}")
+        for lines in line_counts:
+            timings = []
+            for _ in range(max(1, rounds)):
+                cart = Cart.objects.create(user=user)
+                CartItem.objects.bulk_create(
+                    CartItem(cart=cart, product_size=size, quantity=1) for size in sizes[:lines]
+                )
+                with CaptureQueriesContext(connection) as queries:
+                    started = time.perf_counter()
+                    place_order(user, cart.pk)
+                    timings.append(time.perf_counter() - started)
+
+            self.stdout.write(
+                f"{lines:>5} {len(queries):>8} {sum(timings) / len(timings) * 1000:>7.2f} ms {min(timings) * 1000:>7.2f} ms"
+            )
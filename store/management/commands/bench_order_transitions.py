@@ -0,0 +1,94 @@
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import override_settings
+
+from store import events
+from store.models import Order, User
+from store.transitions import TransitionConflict, transition_order
+
+# كل updater يحاول يمشي الطلب للآخر؛ المتزامنين يتسابقوا على نفس الخطوة
+PATH = (Order.ORDER_STATUS_ACCEPTED, Order.ORDER_STATUS_SHIPPED, Order.ORDER_STATUS_DELIVERED)
+
+
+def conditional_update(order_id, status):
+    try:
+        transition_order(Order.objects.all(), order_id, status)
+    except TransitionConflict:
+        return False
+    return True
+
+
+def locked_update(order_id, status):
+    # الطريقة القديمة: SELECT ... FOR UPDATE ثم save
+    with transaction.atomic():
+        order = Order.objects.select_for_update().get(pk=order_id)
+        if status not in Order.TRANSITIONS[order.order_status]:
+            return False
+        order.order_status = status
+        order.save(update_fields=["order_status", "updated_at"])
+    return True
+
+
+STRATEGIES = {"conditional": conditional_update, "locked": locked_update}
+
+
+class Command(BaseCommand):
+    help = (
+        "Race N concurrent updaters through Pending -> Delivered on the same orders and compare the "
+        "conditional UPDATE with SELECT ... FOR UPDATE. Needs PostgreSQL for meaningful numbers; "
+        "the seeded orders are deleted afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--orders", type=int, default=200)
+        parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 16, 32])
+        parser.add_argument("--strategy", choices=sorted(STRATEGIES), nargs="+", default=sorted(STRATEGIES))
+
+    def handle(self, *args, **options):
+        user, _ = User.objects.get_or_create(phone="bench-transitions", defaults={"full_name": "Bench"})
+        self.stdout.write(f"{'strategy':>12} {'workers':>8} {'attempts':>9} {'won':>6} {'per sec':>10}")
+        # الأحداث داخل الـ process بدل Redis
+        with override_settings(ORDER_EVENTS_BROKER="store.events.LocalBroker"):
+            try:
+                for strategy in options["strategy"]:
+                    for workers in options["workers"]:
+                        self.run(user, STRATEGIES[strategy], strategy, workers, options["orders"])
+            finally:
+                Order.objects.filter(customer=user).delete()
+                user.delete()
+                # الطلبات اتعملت بـ bulk_create (بدون signals) فالعداد لازم يتحسب من جديد
+                cache.delete(events.PENDING_KEY)
+
+    def run(self, user, update, name, workers, order_count):
+        Order.objects.filter(customer=user).delete()
+        orders = Order.objects.bulk_create(Order(customer=user) for _ in range(order_count))
+        order_ids = [order.pk for order in orders]
+
+        def updater(seed):
+            attempts = won = 0
+            ids = order_ids[:]
+            random.Random(seed).shuffle(ids)
+            try:
+                for order_id in ids:
+                    for status in PATH:
+                        attempts += 1
+                        won += update(order_id, status)
+            finally:
+                connection.close()
+            return attempts, won
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(workers) as pool:
+            results = list(pool.map(updater, range(workers)))
+        elapsed = time.perf_counter() - started
+
+        attempts = sum(result[0] for result in results)
+        won = sum(result[1] for result in results)
+        self.stdout.write(f"{name:>12} {workers:>8} {attempts:>9} {won:>6} {attempts / elapsed:>10.0f}")
+        if won != order_count * len(PATH):
+            self.stderr.write(f"  expected {order_count * len(PATH)} winning transitions, got {won}")
@@ -0,0 +1,45 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django_brotli.middleware import compress
+from rest_framework.renderers import JSONRenderer
+
+from store.menus import build_menu_document
+from store.models import Store
+from store.renderers import FastJSONRenderer, MessagePackRenderer, msgpack
+
+
+class Command(BaseCommand):
+    help = "Measure render time and payload size (raw + brotli) of store menus per renderer."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--store", type=int, action="append", dest="stores", help="Store id (repeatable).")
+        parser.add_argument("--rounds", type=int, default=20)
+
+    def handle(self, *args, **options):
+        stores = Store.objects.order_by("pk")
+        if options["stores"]:
+            stores = stores.filter(pk__in=options["stores"])
+        documents = [build_menu_document(store_id) for store_id in stores.values_list("pk", flat=True)]
+        if not documents:
+            raise CommandError("No stores to measure.")
+
+        renderers = {"json (stdlib)": JSONRenderer(), "json (orjson)": FastJSONRenderer()}
+        if msgpack is not None:
+            renderers["msgpack"] = MessagePackRenderer()
+        else:
+            self.stderr.write("msgpack is not installed, skipping MessagePackRenderer.")
+
+        self.stdout.write(f"{len(documents)} menus, {options['rounds']} rounds (best round shown)")
+        self.stdout.write(f"{'renderer':<15} {'time':>10} {'bytes':>10} {'brotli':>10}")
+        for name, renderer in renderers.items():
+            best = None
+            for _ in range(max(1, options["rounds"])):
+                started = time.perf_counter()
+                bodies = [renderer.render(document) for document in documents]
+                elapsed = time.perf_counter() - started
+                best = elapsed if best is None else min(best, elapsed)
+
+            size = sum(len(body) for body in bodies)
+            compressed = sum(len(compress(body)) for body in bodies)
+            self.stdout.write(f"{name:<15} {best * 1000:>7.2f} ms {size:>10} {compressed:>10}")
@@ -0,0 +1,156 @@
+import time
+from decimal import Decimal
+
+import cloudinary
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from store.compiled_serializers import (
+    CompiledCategorySerializer,
+    CompiledOrderSerializer,
+    CompiledProductSerializer,
+)
+from store.models import Category, Order, OrderItem, Product, ProductSize, Store, StoreCategory, User
+from store.views import CategoryViewSet, OrderViewSet, ProductViewSet
+
+VIEWSETS = {
+    "products": (ProductViewSet, CompiledProductSerializer),
+    "categories": (CategoryViewSet, CompiledCategorySerializer),
+    "orders": (OrderViewSet, CompiledOrderSerializer),
+}
+IMAGE = "image/upload/v1700000000/dawarmarket/sample.jpg"
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Compare the ModelSerializer and compiled list serializers (speed + byte-identical JSON)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--stores", type=int, default=20)
+        parser.add_argument("--products", type=int, default=50, help="Products per store.")
+        parser.add_argument("--orders", type=int, default=200)
+        parser.add_argument("--rounds", type=int, default=5)
+        parser.add_argument("--no-seed", action="store_true", help="Benchmark the existing data instead.")
+
+    def handle(self, *args, **options):
+        # روابط الصور بتتبني محليًا بس، فمن غير CLOUDINARY_* يكفي cloud_name مؤقت
+        config = cloudinary.config()
+        placeholder = not config.cloud_name
+        if placeholder:
+            config.cloud_name = "bench"
+        try:
+            self.bench(options)
+        finally:
+            if placeholder:
+                config.cloud_name = None
+
+    def bench(self, options):
+        # البيانات التجريبية داخل transaction يتم التراجع عنها في النهاية
+        try:
+            with transaction.atomic():
+                user = None if options["no_seed"] else self.seed(options)
+                self.run(user or User.objects.filter(is_staff=True).first(), options["rounds"])
+                if not options["no_seed"]:
+                    raise Rollback
+        except Rollback:
+            pass
+
+    def seed(self, options):
+        category = Category.objects.create(name="bench category", image=IMAGE)
+        user = User.objects.create_user(phone="bench-0000", full_name="Bench", is_staff=True)
+
+        sizes = []
+        for s in range(options["stores"]):
+            store = Store.objects.create(
+                name=f"bench store {s}", address="-", category=category, image=IMAGE, max_discount=Decimal("15.0")
+            )
+            sections = [StoreCategory.objects.create(name=f"قسم {k}", store=store) for k in range(3)]
+            # save() fills slug + search_document, so no bulk_create here
+            products = [
+                Product.objects.create(
+                    title=f"منتج {s}-{p}",
+                    description="وصف تجريبي",
+                    store=store,
+                    store_category=sections[p % len(sections)],
+                    image=IMAGE if p % 2 else None,
+                )
+                for p in range(options["products"])
+            ]
+            sizes += ProductSize.objects.bulk_create(
+                ProductSize(
+                    product=product,
+                    size_name=name,
+                    size_type="default",
+                    price=Decimal("100.00") + p,
+                    price_after_discount=Decimal("85.50") + p if name == "L" else None,
+                )
+                for p, product in enumerate(products)
+                for name in ("S", "L")
+            )
+
+        orders = Order.objects.bulk_create(
+            Order(customer=user, total_price=Decimal("0.00"), notes="bench") for _ in range(options["orders"])
+        )
+        OrderItem.objects.bulk_create(
+            OrderItem(order=order, product_size=sizes[(o * 3 + i) % len(sizes)], quantity=i + 1, unit_price=Decimal("42.50"))
+            for o, order in enumerate(orders)
+            for i in range(3)
+        )
+        return user
+
+    def run(self, user, rounds):
+        if user is None:
+            raise CommandError("--no-seed needs at least one staff user (orders are listed as staff).")
+
+        renderer = JSONRenderer()
+        for name, (viewset, compiled_class) in VIEWSETS.items():
+            view = self.make_view(viewset, name, user)
+            queryset = view.filter_queryset(view.get_queryset())
+            compiled = compiled_class(context=view.get_serializer_context())
+
+            def classic():
+                return renderer.render(view.get_serializer(queryset, many=True).data)
+
+            def fast():
+                return renderer.render(compiled.serialize(compiled.prepare(queryset)))
+
+            classic_body, fast_body = classic(), fast()
+            if classic_body != fast_body:
+                raise CommandError(f"{name}: compiled output differs from {viewset.serializer_class.__name__}")
+
+            classic_time = self.timeit(classic, rounds)
+            fast_time = self.timeit(fast, rounds)
+            self.stdout.write(
+                f"{name:<11} rows={queryset.count():<6} bytes={len(fast_body):<9} "
+                f"classic={classic_time * 1000:8.1f} ms  compiled={fast_time * 1000:8.1f} ms  "
+                f"x{classic_time / fast_time:.1f}"
+            )
+        self.stdout.write(self.style.SUCCESS("✅ compiled output is byte-identical"))
+
+    def make_view(self, viewset, name, user):
+        # أول host مسموح (الـ testserver الافتراضي بيتعمله DisallowedHost برا الاختبارات)
+        host = next((host for host in settings.ALLOWED_HOSTS if "*" not in host and not host.startswith(".")), "localhost")
+        request = APIRequestFactory().get(f"/{name}/", HTTP_HOST=host)
+        request.user = user
+        view = viewset(action="list", kwargs={}, format_kwarg=None)
+        view.request = Request(request)
+        view.request.user = user
+        return view
+
+    @staticmethod
+    def timeit(func, rounds):
+        best = None
+        for _ in range(max(1, rounds)):
+            started = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best
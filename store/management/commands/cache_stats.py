@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+
+from store.cache import HIT, MISS, STALE, VersionedCacheMixin, get_stats, reset_stats
+from store.nearcache import worker_stats
+from store.urls import router
+
+
+class Command(BaseCommand):
+    help = (
+        "Show the response cache hit/stale/miss counters per endpoint (--reset clears them) and the "
+        "per-worker near-cache size and hit ratio."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--reset", action="store_true")
+
+    def handle(self, *args, **options):
+        basenames = [
+            basename for _, viewset, basename in router.registry if issubclass(viewset, VersionedCacheMixin)
+        ]
+        stats = get_stats(basenames)
+        self.stdout.write(f"{'endpoint':>16} {HIT:>9} {STALE:>9} {MISS:>9} {'hit ratio':>10}")
+        for basename, counters in stats.items():
+            total = sum(counters.values())
+            ratio = f"{(counters[HIT] + counters[STALE]) / total:.1%}" if total else "-"
+            self.stdout.write(
+                f"{basename:>16} {counters[HIT]:>9} {counters[STALE]:>9} {counters[MISS]:>9} {ratio:>10}"
+            )
+
+        workers = worker_stats()
+        if workers:
+            self.stdout.write("")
+            self.stdout.write(
+                f"{'near-cache worker':>24} {'entries':>9} {'MB':>13} {'hits':>9} {'misses':>9} "
+                f"{'evictions':>10} {'hit ratio':>10}"
+            )
+        for worker, near in sorted(workers.items()):
+            size = f"{near['bytes'] / 2**20:.1f}/{near['max_bytes'] / 2**20:.0f}"
+            ratio = f"{near['hit_ratio']:.1%}" if near["hit_ratio"] is not None else "-"
+            self.stdout.write(
+                f"{worker:>24} {near['entries']:>4}/{near['max_entries']:<4} {size:>13} {near['hits']:>9} "
+                f"{near['misses']:>9} {near['evictions']:>10} {ratio:>10}"
+            )
+        if options["reset"]:
+            reset_stats(basenames)
+            self.stdout.write(self.style.SUCCESS("Counters reset."))
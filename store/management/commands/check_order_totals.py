@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from store.cache import invalidate_order_ids
+from store.models import Order
+
+
+class Command(BaseCommand):
+    help = "Report orders whose total_price does not match their items, and repair them with --fix."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--fix", action="store_true", help="Recompute the drifted totals.")
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        drifted = list(
+            Order.objects.with_total_drift().order_by("pk").values_list("pk", "total_price", "items_total")
+        )
+        for order_id, stored, computed in drifted:
+            self.stdout.write(f"Order {order_id}: stored {stored}, items {computed}")
+
+        if not drifted:
+            self.stdout.write(self.style.SUCCESS("All order totals match their items."))
+            return
+        if not options["fix"]:
+            self.stdout.write(self.style.WARNING(f"{len(drifted)} orders drifted (run with --fix to repair)."))
+            return
+
+        batch_size = options["batch_size"]
+        fixed = 0
+        for start in range(0, len(drifted), batch_size):
+            batch = [order_id for order_id, _, _ in drifted[start:start + batch_size]]
+            fixed += Order.objects.filter(pk__in=batch).refresh_totals()
+            invalidate_order_ids(batch)
+        self.stdout.write(self.style.SUCCESS(f"Repaired {fixed} order totals."))
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Prefetch
+
+from store.carts import DatabaseCartStore, get_cart_store
+from store.models import Cart, CartItem
+
+
+class Command(BaseCommand):
+    help = "Copy the carts stored in the database into the configured STORE_CART_BACKEND."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--keep", action="store_true", help="Keep the database rows after copying them.")
+
+    def handle(self, *args, **options):
+        store = get_cart_store()
+        if isinstance(store, DatabaseCartStore):
+            raise CommandError("STORE_CART_BACKEND is the database store, nothing to migrate.")
+
+        carts = (
+            Cart.objects.select_related("user")
+            .prefetch_related(Prefetch("items", queryset=CartItem.objects.only("cart_id", "product_size_id", "quantity")))
+            .order_by("pk")
+        )
+        copied = skipped = 0
+        for cart in carts.iterator(chunk_size=options["batch_size"]):
+            lines = {item.product_size_id: item.quantity for item in cart.items.all()}
+            # سلة موجودة بالفعل في الـ store (المستخدم استخدم التطبيق بعد التحويل) لها الأولوية
+            if store.import_cart(cart.user, cart.pk, lines):
+                copied += 1
+            else:
+                skipped += 1
+            if not options["keep"]:
+                cart.delete()
+
+        self.stdout.write(self.style.SUCCESS(f"Copied {copied} carts ({skipped} already in the store)."))
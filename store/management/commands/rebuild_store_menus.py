@@ -0,0 +1,48 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from store.menus import rebuild_menu
+from store.models import Store
+
+
+def _rebuild(store_id):
+    try:
+        started = time.perf_counter()
+        rebuild_menu(store_id)
+        return store_id, time.perf_counter() - started
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = "Rebuild the materialized store menus in parallel."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=4)
+        parser.add_argument("--store", type=int, action="append", dest="stores", help="Store id (repeatable).")
+        parser.add_argument("--stale-only", action="store_true", help="Only rebuild missing or stale menus.")
+
+    def handle(self, *args, **options):
+        stores = Store.objects.order_by("pk")
+        if options["stores"]:
+            stores = stores.filter(pk__in=options["stores"])
+        if options["stale_only"]:
+            stores = stores.exclude(menu__is_stale=False)
+        store_ids = list(stores.values_list("pk", flat=True))
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max(1, options["workers"])) as pool:
+            futures = [pool.submit(_rebuild, store_id) for store_id in store_ids]
+            for future in as_completed(futures):
+                try:
+                    store_id, elapsed = future.result()
+                except Exception as exc:
+                    self.stderr.write(self.style.ERROR(f"❌ {exc}"))
+                    continue
+                self.stdout.write(f"✅ store {store_id} ({elapsed * 1000:.0f} ms)")
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {len(store_ids)} menus in {elapsed:.2f}s."))
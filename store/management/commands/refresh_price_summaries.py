@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from store.models import Product
+
+
+class Command(BaseCommand):
+    help = "Backfill the denormalized price columns on Product from its available sizes."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--store", type=int, help="Only refresh the products of this store id.")
+
+    def handle(self, *args, **options):
+        products = Product.objects.order_by("pk")
+        if options["store"]:
+            products = products.filter(store_id=options["store"])
+
+        product_ids = list(products.values_list("pk", flat=True))
+        batch_size = options["batch_size"]
+        updated = 0
+        for start in range(0, len(product_ids), batch_size):
+            batch = product_ids[start:start + batch_size]
+            updated += Product.objects.filter(pk__in=batch).refresh_price_summaries()
+
+        self.stdout.write(self.style.SUCCESS(f"Refreshed price summaries for {updated} products."))
@@ -0,0 +1,50 @@
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from store import jobs
+
+
+class Command(BaseCommand):
+    help = "Run queued background jobs (store/jobs.py)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=10)
+        parser.add_argument("--sleep", type=float, default=1.0, help="Seconds to wait when the queue is empty.")
+        parser.add_argument("--once", action="store_true", help="Exit when the queue is empty.")
+
+    def handle(self, *args, **options):
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        done = failed = 0
+        last_maintenance = 0
+        while not self.stopping:
+            if time.monotonic() - last_maintenance > 60:
+                jobs.requeue_stuck()
+                jobs.purge_finished()
+                last_maintenance = time.monotonic()
+
+            claimed = jobs.claim(options["batch_size"])
+            for job in claimed:
+                # الـ jobs المحجوزة تكمل حتى لو وصل SIGTERM، وغير المُنفذ يرجع بـ requeue_stuck
+                if jobs.execute(job):
+                    done += 1
+                    self.stdout.write(f"✅ {job.name} #{job.pk}")
+                else:
+                    failed += 1
+                    self.stderr.write(self.style.ERROR(f"❌ {job.name} #{job.pk} (attempt {job.attempts}/{job.max_attempts})"))
+            close_old_connections()
+
+            if not claimed:
+                if options["once"]:
+                    break
+                time.sleep(options["sleep"])
+
+        self.stdout.write(self.style.SUCCESS(f"Ran {done} jobs ({failed} failed)."))
+
+    def stop(self, signum, frame):
+        self.stopping = True
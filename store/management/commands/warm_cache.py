@@ -0,0 +1,152 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test import RequestFactory
+from django.urls import resolve, reverse
+
+from store.cache import REFRESH_ATTR
+from store.models import Category, Store, StoreCategory
+
+
+def url(name, pk=None, **params):
+    path = reverse(name, args=[pk] if pk is not None else [])
+    return f"{path}?{urlencode(params)}" if params else path
+
+
+# الطلبات العامة بس — /store/orders/ لكل مستخدم فمفيش معنى نسخنه anonymous
+def category_urls():
+    return [url("categories-list")]
+
+
+def store_urls():
+    category_ids = Category.objects.filter(stores__isnull=False).distinct().order_by("pk").values_list("pk", flat=True)
+    return [url("stores-list")] + [url("stores-list", category=pk) for pk in category_ids]
+
+
+def product_urls():
+    urls = [url("products-list"), url("products-list", has_discount="true"), url("products-list", available="true")]
+    urls += [url("products-list", store=pk) for pk in Store.objects.order_by("pk").values_list("pk", flat=True)]
+    urls += [
+        url("products-list", store=store_id, store_category=pk)
+        for pk, store_id in StoreCategory.objects.order_by("store_id", "pk").values_list("pk", "store_id")
+    ]
+    return urls
+
+
+def menu_urls():
+    # JSON من المنيو المُجهَّز (store/menus.py): الطلب يبني أي منيو ناقص أو stale
+    store_ids = list(Store.objects.order_by("pk").values_list("pk", flat=True))
+    return [url("stores-detail", pk) for pk in store_ids] + [
+        url("storecategories-list", store_id=pk) for pk in store_ids
+    ]
+
+
+SCOPES = {
+    "categories": category_urls,
+    "stores": store_urls,
+    "products": product_urls,
+    "menus": menu_urls,
+}
+
+
+def default_hosts():
+    return [host for host in settings.ALLOWED_HOSTS if host and "*" not in host and not host.startswith(".")]
+
+
+def render(path, host, secure, accept):
+    """يمرر الطلب على الـ viewset نفسه ويخزن الناتج (حتى لو فيه مدخل قديم)."""
+    request = RequestFactory().get(path, HTTP_HOST=host, HTTP_ACCEPT=accept, secure=secure)
+    setattr(request, REFRESH_ATTR, True)
+    match = resolve(request.path_info)
+    started = time.perf_counter()
+    response = match.func(request, *match.args, **match.kwargs)
+    if hasattr(response, "render"):
+        response.render()  # الـ post-render callback هو اللي بيكتب في الكاش
+    return response.status_code, len(response.content), time.perf_counter() - started
+
+
+class Command(BaseCommand):
+    help = (
+        "Render the public catalog responses through the viewsets and store them in the response cache, "
+        "so a new deployment can be warmed before it takes traffic. Responses are cached per host, "
+        "scheme and Accept header, so pass the ones real clients use."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--only", choices=sorted(SCOPES), nargs="+", default=list(SCOPES))
+        parser.add_argument(
+            "--host",
+            action="append",
+            dest="hosts",
+            help="Host header to warm (repeatable). Defaults to the non-wildcard ALLOWED_HOSTS.",
+        )
+        parser.add_argument("--scheme", choices=["http", "https"], default="https")
+        parser.add_argument("--accept", default="application/json")
+        parser.add_argument("--workers", type=int, default=4, help="1 renders sequentially in this thread.")
+        parser.add_argument(
+            "--dry-run", action="store_true", help="List the URLs and how long collecting them took, without rendering."
+        )
+
+    def handle(self, *args, **options):
+        hosts = options["hosts"] or default_hosts()
+        secure = options["scheme"] == "https"
+        verbose = options["verbosity"] > 1
+
+        for scope in options["only"]:
+            started = time.perf_counter()
+            paths = SCOPES[scope]()
+            collected = time.perf_counter() - started
+            tasks = [(path, host) for host in hosts for path in paths]
+
+            if options["dry_run"]:
+                self.stdout.write(
+                    f"{scope}: {len(paths)} URLs x {len(hosts)} hosts (collected in {collected * 1000:.0f} ms)"
+                )
+                if verbose:
+                    for path in paths:
+                        self.stdout.write(f"  {path}")
+                continue
+
+            def warm(task):
+                path, host = task
+                try:
+                    return task, render(path, host, secure, options["accept"]), None
+                except Exception as exc:
+                    return task, None, exc
+
+            def warm_in_pool(task):
+                try:
+                    return warm(task)
+                finally:
+                    connections.close_all()
+
+            started = time.perf_counter()
+            if options["workers"] > 1:
+                with ThreadPoolExecutor(options["workers"]) as pool:
+                    results = list(pool.map(warm_in_pool, tasks))
+            else:
+                results = [warm(task) for task in tasks]
+            elapsed = time.perf_counter() - started
+
+            warmed = 0
+            slowest = None
+            for (path, host), result, exc in results:
+                if exc is not None or result[0] != 200:
+                    error = exc if exc is not None else f"status {result[0]}"
+                    self.stderr.write(self.style.ERROR(f"❌ {host}{path}: {error}"))
+                    continue
+                warmed += 1
+                _, size, took = result
+                if slowest is None or took > slowest[1]:
+                    slowest = (f"{host}{path}", took)
+                if verbose:
+                    self.stdout.write(f"✅ {host}{path} ({took * 1000:.0f} ms, {size / 1024:.1f} KB)")
+
+            summary = f"{scope}: warmed {warmed}/{len(tasks)} responses in {elapsed:.2f}s"
+            if slowest is not None:
+                summary += f" (slowest {slowest[0]} {slowest[1] * 1000:.0f} ms)"
+            self.stdout.write(self.style.SUCCESS(summary))
@@ -1,4 +1,14 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from decimal import Decimal
+
 from django.contrib.auth.models import BaseUserManager
+from django.db import connections, models, router, transaction
+from django.db.models import Case, DecimalField, Exists, F, Max, Min, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .cache import invalidate_products
 
 class UserManager(BaseUserManager):
     def create_user(self, phone, password=None, **extra_fields):
@@ -16,3 +26,302 @@ class UserManager(BaseUserManager):
         extra_fields.setdefault("is_superuser", True)
 
         return self.create_user(phone, password, **extra_fields)
+
+
+# -----------------------------------------------------------------------------
+# ✅ Product price summaries
+# -----------------------------------------------------------------------------
+def effective_price():
+    """SQL twin of ``price_after_discount or price`` used across the app."""
+    return Case(
+        When(price_after_discount__gt=0, then=F("price_after_discount")),
+        default=F("price"),
+        output_field=DecimalField(max_digits=10, decimal_places=2),
+    )
+
+
+def discount_pct():
+    return Case(
+        When(
+            price__gt=0,
+            price_after_discount__gt=0,
+            price_after_discount__lt=F("price"),
+            then=(F("price") - F("price_after_discount")) * Value(100) / F("price"),
+        ),
+        default=Value(Decimal("0")),
+        output_field=DecimalField(max_digits=5, decimal_places=2),
+    )
+
+
+class ProductQuerySet(models.QuerySet):
+    def refresh_price_summaries(self):
+        """
+        إعادة حساب أعمدة الأسعار المجمعة من المقاسات المتاحة في UPDATE واحد.
+        """
+        size_model = self.model._meta.get_field("sizes").related_model
+        sizes = size_model.objects.filter(product=OuterRef("pk"), is_available=True).order_by().values("product")
+
+        def aggregate(expression):
+            return Subquery(sizes.annotate(value=expression).values("value")[:1])
+
+        return self.order_by().update(
+            min_price=aggregate(Min(effective_price())),
+            max_price=aggregate(Max(effective_price())),
+            max_discount_pct=Coalesce(aggregate(Max(discount_pct())), Value(Decimal("0"))),
+            has_available_size=Exists(sizes),
+        )
+
+    def refresh_search_documents(self, batch_size=500):
+        """إعادة بناء search_document (بعد تغيير اسم متجر أو قسم مثلًا)."""
+        products = self.select_related("store", "store_category").only(
+            "id", "title", "description", "search_document", "store__name", "store_category__name"
+        )
+        changed = []
+        for product in products.iterator(chunk_size=batch_size):
+            document = product.build_search_document()
+            if document != product.search_document:
+                product.search_document = document
+                changed.append(product)
+        self.model.objects.bulk_update(changed, ["search_document"], batch_size=batch_size)
+        return len(changed)
+
+
+class ProductSizeQuerySet(models.QuerySet):
+    """
+    Bulk writes skip post_save/post_delete, so they refresh the owning
+    products' price summaries themselves.
+    """
+
+    def _refresh_products(self, product_ids):
+        if not product_ids:
+            return
+        product_model = self.model._meta.get_field("product").related_model
+        product_model.objects.filter(pk__in=product_ids).refresh_price_summaries()
+        store_ids = invalidate_products(product_ids)
+
+        from .menus import mark_stale
+
+        mark_stale(store_ids)
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = super().bulk_create(objs, *args, **kwargs)
+        self._refresh_products({obj.product_id for obj in objs})
+        return objs
+
+    def bulk_update(self, objs, fields, batch_size=None):
+        objs = list(objs)
+        product_ids = {product_id for obj in objs for product_id in obj.affected_product_ids()}
+        if "product" in fields or "product_id" in fields:
+            # المنتجات القديمة من الـ database (الـ objects ممكن ما تكونش متحملة منها)
+            product_ids |= set(self.filter(pk__in=[obj.pk for obj in objs]).values_list("product_id", flat=True))
+        rows = super().bulk_update(objs, fields, batch_size=batch_size)
+        self._refresh_products(product_ids)
+        for obj in objs:
+            obj._saved_product_id = obj.product_id
+        return rows
+
+    def update(self, **kwargs):
+        product_ids = set(self.values_list("product_id", flat=True))
+        rows = super().update(**kwargs)
+        # نقل المقاسات لمنتج تاني: المنتج الجديد كمان
+        product = kwargs.get("product_id", kwargs.get("product"))
+        if product is not None:
+            product_ids.add(getattr(product, "pk", product))
+        self._refresh_products(product_ids)
+        return rows
+
+
+# -----------------------------------------------------------------------------
+# ✅ Cart items
+# -----------------------------------------------------------------------------
+# سقف PositiveSmallIntegerField
+CART_ITEM_MAX_QUANTITY = 32767
+
+
+class CartItemQuerySet(models.QuerySet):
+    def add_quantity(self, cart_id, product_size_id, quantity):
+        """
+        يضيف ``quantity`` للصنف (أو ينشئه) في statement واحد بدون lost
+        updates. يرجع الـ CartItem، أو None لو الكمية ستتجاوز السقف.
+        """
+        using = self.db or router.db_for_write(self.model)
+        rows = self._add_quantities(using, cart_id, {product_size_id: quantity})
+        if not rows:
+            return None
+        pk, _, total = rows[0]
+        item = self.model(id=pk, cart_id=cart_id, product_size_id=product_size_id, quantity=total)
+        item._state.adding = False
+        item._state.db = using
+        return item
+
+    def _add_quantities(self, using, cart_id, added):
+        """
+        ``[(pk, product_size_id, quantity), ...]`` للأصناف اللي اتضافت؛ اللي
+        هتتجاوز السقف مش راجعة (ومش متكتبة).
+        """
+        connection = connections[using]
+        # ON CONFLICT ... RETURNING: PostgreSQL, SQLite >= 3.35
+        if connection.vendor == "postgresql" or (
+            connection.vendor == "sqlite" and connection.features.can_return_rows_from_bulk_insert
+        ):
+            return self._upsert(connection, cart_id, added)
+        rows = []
+        for size_id, quantity in sorted(added.items()):
+            row = self._add_quantity_orm(using, cart_id, size_id, quantity)
+            if row is not None:
+                rows.append((row[0], size_id, row[1]))
+        return rows
+
+    def _upsert(self, connection, cart_id, added):
+        opts = self.model._meta
+        qn = connection.ops.quote_name
+        table = qn(opts.db_table)
+        cart, product_size, column = (qn(opts.get_field(name).column) for name in ("cart", "product_size", "quantity"))
+        sql = (
+            f"INSERT INTO {table} ({cart}, {product_size}, {column}) "
+            f"VALUES {', '.join(['(%s, %s, %s)'] * len(added))} "
+            f"ON CONFLICT ({cart}, {product_size}) DO UPDATE "
+            f"SET {column} = {table}.{column} + EXCLUDED.{column} "
+            # الجمع بعد الفحص: على PostgreSQL الـ smallint يعمل overflow قبل المقارنة
+            f"WHERE {table}.{column} <= %s - EXCLUDED.{column} "
+            f"RETURNING {qn(opts.pk.column)}, {product_size}, {column}"
+        )
+        cart_value = opts.get_field("cart").get_db_prep_value(cart_id, connection)
+        params = []
+        # ترتيب ثابت للصفوف = ترتيب ثابت للأقفال بين الـ batches المتزامنة
+        for size_id, quantity in sorted(added.items()):
+            params += [cart_value, size_id, quantity]
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [*params, CART_ITEM_MAX_QUANTITY])
+            return cursor.fetchall()
+
+    def _add_quantity_orm(self, using, cart_id, product_size_id, quantity):
+        with transaction.atomic(using=using):
+            item, created = self.using(using).select_for_update().get_or_create(
+                cart_id=cart_id, product_size_id=product_size_id, defaults={"quantity": quantity}
+            )
+            if created:
+                return item.pk, item.quantity
+            updated = self.using(using).filter(pk=item.pk, quantity__lte=CART_ITEM_MAX_QUANTITY - quantity).update(
+                quantity=F("quantity") + quantity
+            )
+            if not updated:
+                return None
+            return item.pk, item.quantity + quantity
+
+    def apply_changes(self, cart_id, changes):
+        """
+        ``changes``: ``{product_size_id: (op, quantity)}`` بعد دمج العمليات
+        (op = add / set / remove). الإضافة upsert واحد بيجمع في الـ database
+        (زي ``add_quantity``)، والتعديل bulk upsert، والحذف DELETE واحد. يرجع
+        ids المقاسات التي ستتجاوز السقف (ولا يكتب شيئًا في هذه الحالة).
+        """
+        using = self.db or router.db_for_write(self.model)
+        removed = [size_id for size_id, (op, _) in changes.items() if op == "remove"]
+        quantities = {size_id: quantity for size_id, (op, quantity) in changes.items() if op == "set"}
+        added = {size_id: quantity for size_id, (op, quantity) in changes.items() if op == "add"}
+
+        over = sorted(
+            size_id for size_id, quantity in (*quantities.items(), *added.items()) if quantity > CART_ITEM_MAX_QUANTITY
+        )
+        if over:
+            return over
+
+        with transaction.atomic(using=using):
+            if added:
+                written = {row[1] for row in self._add_quantities(using, cart_id, added)}
+                over = sorted(set(added) - written)
+                if over:
+                    transaction.set_rollback(True, using=using)
+                    return over
+
+            if removed:
+                self.using(using).filter(cart_id=cart_id, product_size_id__in=removed).delete()
+            if quantities:
+                self.using(using).bulk_create(
+                    [
+                        self.model(cart_id=cart_id, product_size_id=size_id, quantity=quantity)
+                        for size_id, quantity in sorted(quantities.items())
+                    ],
+                    update_conflicts=True,
+                    unique_fields=["cart", "product_size"],
+                    update_fields=["quantity"],
+                )
+        return []
+
+
+# -----------------------------------------------------------------------------
+# ✅ Orders
+# -----------------------------------------------------------------------------
+# order ids اللي إجماليها هيتحسب مرة واحدة عند الخروج من defer_totals()
+_deferred_order_totals = ContextVar("deferred_order_totals", default=None)
+
+
+class OrderQuerySet(models.QuerySet):
+    def _items_total(self):
+        items = self.model._meta.get_field("items").related_model.objects
+        return Coalesce(
+            Subquery(
+                items.filter(order=OuterRef("pk"))
+                .order_by()
+                .values("order")
+                .annotate(total=Sum(F("quantity") * F("unit_price"), output_field=DecimalField(max_digits=10, decimal_places=2)))
+                .values("total")
+            ),
+            Value(Decimal("0.00")),
+            output_field=DecimalField(max_digits=10, decimal_places=2),
+        )
+
+    def with_items_total(self):
+        return self.annotate(items_total=self._items_total())
+
+    def with_total_drift(self):
+        """الطلبات اللي total_price فيها لا يساوي مجموع عناصرها."""
+        return self.with_items_total().exclude(total_price=F("items_total"))
+
+    def refresh_totals(self):
+        """إعادة حساب total_price من العناصر في UPDATE واحد."""
+        return self.update(total_price=self._items_total(), updated_at=timezone.now())
+
+    def transition(self, status, sources, version=None):
+        """
+        UPDATE واحد مشروط بدون قراءة أو lock مسبق: ينجح فقط للصفوف اللي
+        حالتها الحالية من ``sources`` (و ``version`` لو اتبعت). يرجع عدد
+        الصفوف — 0 يعني حد تاني سبق.
+        """
+        rows = self.filter(order_status__in=sources)
+        if version is not None:
+            rows = rows.filter(version=version)
+        return rows.update(order_status=status, version=F("version") + 1, updated_at=timezone.now())
+
+    def add_to_totals(self, deltas):
+        """
+        ``{order_id: delta}`` — تعديل الإجمالي بـ ``F()`` بدل إعادة قراءة كل
+        العناصر. داخل ``defer_totals()`` تتسجل الطلبات فقط.
+        """
+        pending = _deferred_order_totals.get()
+        for order_id, delta in deltas.items():
+            if pending is not None:
+                pending.add(order_id)
+            elif delta is None:  # الإجمالي القديم للعنصر غير معروف
+                self.filter(pk=order_id).refresh_totals()
+            elif delta:
+                self.filter(pk=order_id).update(total_price=F("total_price") + delta, updated_at=timezone.now())
+
+    @contextmanager
+    def defer_totals(self):
+        """
+        كل تعديلات العناصر داخل الـ block تُجمع، ويُعاد حساب إجمالي كل طلب
+        اتلمس مرة واحدة في النهاية (لا شيء لو حصل exception).
+        """
+        if _deferred_order_totals.get() is not None:  # nested
+            yield
+            return
+        pending = set()
+        token = _deferred_order_totals.set(pending)
+        try:
+            yield
+        finally:
+            _deferred_order_totals.reset(token)
+        if pending:
+            self.filter(pk__in=pending).refresh_totals()
@@ -0,0 +1,105 @@
+"""
+منيو المتجر المُجهَّز (materialized store menu).
+
+المستند يحتوي بيانات StoreSerializer + الأقسام ومنتجاتها ومقاساتها بالأسعار
+الفعلية، ويُحفظ كنص JSON جاهز في ``StoreMenu``. أي تعديل على صفوف المتجر
+يعلّم المنيو كـ stale (داخل نفس الـ transaction) ويُعاد بناؤه بعد الـ commit
+في background job.
+عمود ``version`` يمنع بناءً قديمًا من الكتابة فوق تعديل أحدث.
+"""
+from collections import defaultdict
+
+from django.db.models import F, Prefetch
+from django.utils import timezone
+
+from .jobs import job
+from .models import Product, ProductSize, Store, StoreCategory, StoreMenu
+from .renderers import FastJSONRenderer
+from .serializers import MenuProductSerializer, StoreSerializer
+
+
+def build_menu_document(store_id):
+    store = (
+        Store.objects.select_related("category")
+        .prefetch_related(Prefetch("store_categories", queryset=StoreCategory.objects.order_by("id")))
+        .get(pk=store_id)
+    )
+    products = Product.objects.filter(store_id=store_id).prefetch_related(
+        Prefetch("sizes", queryset=ProductSize.objects.order_by("size_name"))
+    )
+
+    by_category = defaultdict(list)
+    for product in products:
+        by_category[product.store_category_id].append(product)
+
+    document = StoreSerializer(store).data
+    document["store_categories"] = [
+        {**category, "products": MenuProductSerializer(by_category.pop(category["id"], []), many=True).data}
+        for category in document["store_categories"]
+    ]
+    document["uncategorized_products"] = MenuProductSerializer(by_category.pop(None, []), many=True).data
+    return document
+
+
+def render_menu(store_id):
+    document = build_menu_document(store_id)
+    renderer = FastJSONRenderer()
+    return (
+        renderer.render(document).decode(),
+        renderer.render(document["store_categories"]).decode(),
+    )
+
+
+def rebuild_menu(store_id):
+    """يبني المنيو ويحفظه، ويرجع StoreMenu (حتى لو سبقنا تعديل أحدث)."""
+    version = StoreMenu.objects.filter(store_id=store_id).values_list("version", flat=True).first()
+    if version is None:
+        if not Store.objects.filter(pk=store_id).exists():
+            raise Store.DoesNotExist(f"Store {store_id} does not exist.")
+        # placeholder first, so a concurrent mark_stale() has a row to bump
+        menu, _ = StoreMenu.objects.get_or_create(
+            store_id=store_id, defaults={"payload": "", "categories_payload": "", "is_stale": True}
+        )
+        version = menu.version
+
+    payload, categories_payload = render_menu(store_id)
+    StoreMenu.objects.filter(store_id=store_id, version=version).update(
+        payload=payload,
+        categories_payload=categories_payload,
+        is_stale=False,
+        built_at=timezone.now(),
+    )
+    return StoreMenu(store_id=store_id, payload=payload, categories_payload=categories_payload, version=version)
+
+
+def get_menu(store_id):
+    """Raises ``Store.DoesNotExist`` for unknown stores."""
+    menu = StoreMenu.objects.filter(store_id=store_id, is_stale=False).first()
+    return menu or rebuild_menu(store_id)
+
+
+def rebuild_stale_menus(store_ids):
+    stale = StoreMenu.objects.filter(store_id__in=store_ids, is_stale=True).values_list("store_id", flat=True)
+    for store_id in stale:
+        try:
+            rebuild_menu(store_id)
+        except Store.DoesNotExist:
+            pass
+
+
+@job("menus.rebuild_stale")
+def rebuild_stale_menu(store_id):
+    rebuild_stale_menus([store_id])
+
+
+def mark_stale(store_ids):
+    """
+    إعادة البناء job بعد الـ commit (store/jobs.py)؛ لحد ما يتنفذ ``get_menu``
+    يبني المنيو الـ stale عند أول طلب.
+    """
+    store_ids = set(store_ids)
+    if not store_ids:
+        return
+    StoreMenu.objects.filter(store_id__in=store_ids).update(is_stale=True, version=F("version") + 1)
+    for store_id in sorted(store_ids):
+        rebuild_stale_menu.enqueue(store_id, dedupe_key=f"menu:{store_id}")
@@ -0,0 +1,235 @@
+"""
+Prometheus metrics على ``/metrics`` (text format).
+
+``MetricsMiddleware`` يسجل لكل request: الـ latency حسب الـ route
+(``<basename>.<action>`` للـ viewsets)، وعدد ووقت الـ queries، وذاكرة الـ
+worker. الكاش (store/cache.py, store/nearcache.py) والـ compiled serializers
+والـ renderers بيسجلوا من جوه.
+
+تحت gunicorn كل worker process له قيمه، فالـ registry file-backed
+(``PROMETHEUS_MULTIPROC_DIR`` — gunicorn.conf.py بيجهزه ويمسح ملفات الـ
+workers اللي ماتت) و ``/metrics`` يجمعهم من أي worker. بدون المتغير ده
+(runserver, run_jobs) الـ registry العادي داخل الـ process.
+
+``prometheus_client`` اختياري: من غيره كل الدوال هنا no-op و ``/metrics`` 404.
+"""
+import hmac
+import os
+import resource
+import time
+from contextlib import ExitStack, contextmanager
+from functools import wraps
+
+from django.conf import settings
+from django.db import connections
+from django.http import Http404, HttpResponse, HttpResponseForbidden
+
+try:
+    import prometheus_client
+    from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, multiprocess
+except ImportError:  # pragma: no cover - optional dependency
+    prometheus_client = None
+
+NAMESPACE = "dawar"
+UNMATCHED = "unmatched"
+
+if prometheus_client is not None:
+    REQUEST_LATENCY = Histogram(
+        "http_request_duration_seconds",
+        "Request latency by route (viewset basename.action).",
+        ["route", "method", "status"],
+        namespace=NAMESPACE,
+    )
+    DB_QUERIES = Histogram(
+        "db_queries_per_request",
+        "Database queries per request.",
+        ["route"],
+        namespace=NAMESPACE,
+        buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100, float("inf")),
+    )
+    DB_TIME = Histogram(
+        "db_query_duration_seconds",
+        "Total database time per request.",
+        ["route"],
+        namespace=NAMESPACE,
+    )
+    SERIALIZATION_TIME = Histogram(
+        "serialization_duration_seconds",
+        "Compiled serializer (stage=serialize) and renderer (stage=render) time.",
+        ["route", "stage"],
+        namespace=NAMESPACE,
+    )
+    CACHE_REQUESTS = Counter(
+        "cache_requests_total",
+        "Response cache lookups by key family and result (hit/stale/miss).",
+        ["family", "result"],
+        namespace=NAMESPACE,
+    )
+    CACHE_ENTRY_SIZE = Histogram(
+        "cache_entry_bytes",
+        "Size of the responses written to the cache.",
+        ["family"],
+        namespace=NAMESPACE,
+        buckets=(1024, 4096, 16384, 65536, 262144, 1048576, 4194304, float("inf")),
+    )
+    NEAR_CACHE_REQUESTS = Counter(
+        "near_cache_requests_total",
+        "Per-worker near-cache lookups by result (hit/miss).",
+        ["result"],
+        namespace=NAMESPACE,
+    )
+    NEAR_CACHE_BYTES = Gauge(
+        "near_cache_bytes", "Near-cache size across live workers.", namespace=NAMESPACE, multiprocess_mode="livesum"
+    )
+    NEAR_CACHE_ENTRIES = Gauge(
+        "near_cache_entries", "Near-cache entries across live workers.", namespace=NAMESPACE, multiprocess_mode="livesum"
+    )
+    WORKER_MEMORY = Gauge(
+        "worker_resident_memory_bytes",
+        "Resident memory of each live worker process.",
+        namespace=NAMESPACE,
+        multiprocess_mode="liveall",
+    )
+
+
+def enabled():
+    return prometheus_client is not None
+
+
+# -----------------------------------------------------------------------------
+# ✅ Routes
+# -----------------------------------------------------------------------------
+def view_route(view):
+    if view is None:
+        return UNMATCHED
+    return f"{view.basename}.{view.action}" if getattr(view, "basename", None) else type(view).__name__
+
+
+def request_route(request):
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return UNMATCHED
+    actions = getattr(match.func, "actions", None)
+    if actions:  # viewset: الـ action من الـ method
+        method = request.method.lower()
+        return f"{match.func.initkwargs.get('basename')}.{actions.get(method, method)}"
+    return match.view_name or match.route
+
+
+# -----------------------------------------------------------------------------
+# ✅ Hooks
+# -----------------------------------------------------------------------------
+@contextmanager
+def timed(stage, view):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        if enabled():
+            SERIALIZATION_TIME.labels(view_route(view), stage).observe(time.perf_counter() - started)
+
+
+def timed_render(render):
+    """Decorator لـ ``Renderer.render``: الـ view من الـ renderer_context."""
+
+    @wraps(render)
+    def wrapper(self, data, accepted_media_type=None, renderer_context=None):
+        with timed("render", (renderer_context or {}).get("view")):
+            return render(self, data, accepted_media_type, renderer_context)
+
+    return wrapper
+
+
+def observe_cache(family, result):
+    if enabled():
+        CACHE_REQUESTS.labels(family, result).inc()
+
+
+def observe_cache_size(family, size):
+    if enabled():
+        CACHE_ENTRY_SIZE.labels(family).observe(size)
+
+
+def observe_near_cache(hit):
+    if enabled():
+        NEAR_CACHE_REQUESTS.labels("hit" if hit else "miss").inc()
+
+
+def set_near_cache_size(entries, size):
+    if enabled():
+        NEAR_CACHE_ENTRIES.set(entries)
+        NEAR_CACHE_BYTES.set(size)
+
+
+def resident_memory():
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):  # مش Linux: أقصى RSS بدل الحالي
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class QueryTimer:
+    """``connection.execute_wrapper``: عدد ووقت الـ queries."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - started
+
+
+# -----------------------------------------------------------------------------
+# ✅ Middleware & view
+# -----------------------------------------------------------------------------
+class MetricsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not enabled():
+            return self.get_response(request)
+
+        queries = QueryTimer()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(queries))
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+
+        route = request_route(request)
+        REQUEST_LATENCY.labels(route, request.method, response.status_code).observe(elapsed)
+        DB_QUERIES.labels(route).observe(queries.count)
+        DB_TIME.labels(route).observe(queries.seconds)
+        WORKER_MEMORY.set(resident_memory())
+        return response
+
+
+def get_registry():
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return prometheus_client.REGISTRY
+
+
+def metrics_view(request):
+    """``Authorization: Bearer <METRICS_TOKEN>``؛ من غير token مفتوح في الـ DEBUG بس."""
+    if not enabled():
+        raise Http404
+    token = getattr(settings, "METRICS_TOKEN", "")
+    if token:
+        if not hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {token}"):
+            return HttpResponseForbidden()
+    elif not settings.DEBUG:
+        raise Http404
+    return HttpResponse(
+        prometheus_client.generate_latest(get_registry()), content_type=prometheus_client.CONTENT_TYPE_LATEST
+    )
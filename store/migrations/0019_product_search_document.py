@@ -0,0 +1,61 @@
+# Generated by Django 5.1.5 on 2026-10-16 23:44
+
+from django.db import migrations, models
+
+from store.search import build_search_document
+
+
+def populate_search_documents(apps, schema_editor):
+    Product = apps.get_model('store', 'Product')
+    products = Product.objects.select_related('store', 'store_category')
+    batch = []
+    for product in products.iterator(chunk_size=500):
+        product.search_document = build_search_document(
+            product.title,
+            product.description,
+            product.store.name,
+            product.store_category.name if product.store_category_id else None,
+        )
+        batch.append(product)
+        if len(batch) >= 500:
+            Product.objects.bulk_update(batch, ['search_document'])
+            batch = []
+    Product.objects.bulk_update(batch, ['search_document'])
+
+
+def create_postgresql_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    schema_editor.execute(
+        "CREATE INDEX store_product_search_tsv ON store_product "
+        "USING GIN (to_tsvector('simple', search_document))"
+    )
+    schema_editor.execute(
+        'CREATE INDEX store_product_search_trgm ON store_product '
+        'USING GIN (search_document gin_trgm_ops)'
+    )
+
+
+def drop_postgresql_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS store_product_search_tsv')
+    schema_editor.execute('DROP INDEX IF EXISTS store_product_search_trgm')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0018_product_has_available_size_product_max_discount_pct_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='search_document',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.RunPython(populate_search_documents, migrations.RunPython.noop),
+        migrations.RunPython(create_postgresql_indexes, drop_postgresql_indexes),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.1.5 on 2026-10-16 23:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0020_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoreMenu',
+            fields=[
+                ('store', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='menu', serialize=False, to='store.store')),
+                ('payload', models.TextField()),
+                ('categories_payload', models.TextField()),
+                ('is_stale', models.BooleanField(default=False)),
+                ('version', models.PositiveIntegerField(default=0)),
+                ('built_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,53 @@
+from django.db import migrations
+
+# على PostgreSQL: store_archivedorder يصبح PARTITION BY RANGE (placed_at).
+# الـ partitions الشهرية (store_archivedorder_pYYYYMM) تُنشأ من archive_orders
+# وقت الحاجة (store/archive.py)؛ partition الـ DEFAULT يستقبل أي شهر غيرها.
+# باقي قواعد البيانات (SQLite) يفضل جدول عادي.
+
+
+def _rebuild(schema_editor, partitioned):
+    table = 'store_archivedorder'
+    old = f'{table}_rebuild'
+    schema_editor.execute(f'ALTER TABLE {table} RENAME TO {old}')
+    if partitioned:
+        schema_editor.execute(
+            f'CREATE TABLE {table} (LIKE {old} INCLUDING DEFAULTS) PARTITION BY RANGE (placed_at)'
+        )
+        schema_editor.execute(f'CREATE TABLE {table}_default PARTITION OF {table} DEFAULT')
+    else:
+        schema_editor.execute(f'CREATE TABLE {table} (LIKE {old} INCLUDING DEFAULTS)')
+    schema_editor.execute(f'INSERT INTO {table} SELECT * FROM {old}')
+    # الـ indexes/constraints القديمة تتمسح مع الجدول قبل ما نعيد إنشاءها بنفس الأسماء
+    schema_editor.execute(f'DROP TABLE {old} CASCADE')
+    # أي unique على جدول partitioned لازم يشمل عمود الـ partition
+    primary_key = 'id, placed_at' if partitioned else 'id'
+    schema_editor.execute(f'ALTER TABLE {table} ADD PRIMARY KEY ({primary_key})')
+    schema_editor.execute(
+        f'ALTER TABLE {table} ADD CONSTRAINT {table}_customer_id_fk '
+        f'FOREIGN KEY (customer_id) REFERENCES store_user (id) DEFERRABLE INITIALLY DEFERRED'
+    )
+    schema_editor.execute(f'CREATE INDEX {table}_customer_id_idx ON {table} (customer_id)')
+
+
+def partition_archive(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    _rebuild(schema_editor, partitioned=True)
+
+
+def unpartition_archive(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    _rebuild(schema_editor, partitioned=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0023_archivedorder'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_archive, unpartition_archive),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.1.5 on 2026-10-17 00:42
+
+from django.db import migrations, models
+
+from store.search import normalize_arabic
+
+
+def populate_search_titles(apps, schema_editor):
+    Product = apps.get_model('store', 'Product')
+    batch = []
+    for product in Product.objects.only('id', 'title').iterator(chunk_size=500):
+        product.search_title = normalize_arabic(product.title)
+        batch.append(product)
+        if len(batch) >= 500:
+            Product.objects.bulk_update(batch, ['search_title'])
+            batch = []
+    Product.objects.bulk_update(batch, ['search_title'])
+
+
+def create_postgresql_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    schema_editor.execute(
+        'CREATE INDEX store_product_search_title_trgm ON store_product '
+        'USING GIN (search_title gin_trgm_ops)'
+    )
+
+
+def drop_postgresql_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS store_product_search_title_trgm')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0025_order_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='search_title',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.RunPython(populate_search_titles, migrations.RunPython.noop),
+        migrations.RunPython(create_postgresql_index, drop_postgresql_index),
+    ]
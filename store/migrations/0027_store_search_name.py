@@ -0,0 +1,50 @@
+# Generated by Django 5.1.5 on 2026-10-17 12:10
+
+from django.db import migrations, models
+
+from store.search import normalize_arabic
+
+
+def populate_search_names(apps, schema_editor):
+    Store = apps.get_model('store', 'Store')
+    batch = []
+    for store in Store.objects.only('id', 'name').iterator(chunk_size=500):
+        store.search_name = normalize_arabic(store.name)
+        batch.append(store)
+        if len(batch) >= 500:
+            Store.objects.bulk_update(batch, ['search_name'])
+            batch = []
+    Store.objects.bulk_update(batch, ['search_name'])
+
+
+def create_postgresql_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    schema_editor.execute(
+        'CREATE INDEX store_store_search_name_trgm ON store_store '
+        'USING GIN (search_name gin_trgm_ops)'
+    )
+
+
+def drop_postgresql_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS store_store_search_name_trgm')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0026_product_search_title'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='store',
+            name='search_name',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.RunPython(populate_search_names, migrations.RunPython.noop),
+        migrations.RunPython(create_postgresql_index, drop_postgresql_index),
+    ]
@@ -4,11 +4,14 @@ from decimal import Decimal
 from cloudinary.models import CloudinaryField
 from django.conf import settings
 from django.contrib.auth.models import AbstractUser
+from django.core.serializers.json import DjangoJSONEncoder
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.db import models
+from django.utils import timezone
 from django.utils.text import slugify
 
-from .managers import UserManager
+from .managers import CartItemQuerySet, OrderQuerySet, ProductQuerySet, ProductSizeQuerySet, UserManager
+from .search import build_search_document, normalize_arabic
 
 # -----------------------------------------------------------------------------
 # ✅ User Model (المستخدم)
@@ -61,6 +64,15 @@ class Store(models.Model):
         blank=True,
         null=True,
     )
+    # الاسم مُطبَّع (store/search.py) — فلتر ?store_name= على المنتجات بدون ILIKE
+    search_name = models.TextField(blank=True, default="", editable=False)
+
+    def save(self, *args, **kwargs):
+        self.search_name = normalize_arabic(self.name)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "name" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "search_name"}
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.name} ({self.category.name})"
@@ -79,6 +91,22 @@ class StoreCategory(models.Model):
         return f"{self.name} - {self.store.name}"
 
 
+class StoreMenu(models.Model):
+    """
+    منيو المتجر مُجهَّز مسبقًا (JSON) — يُبنى من store/menus.py ويُقدَّم كما هو
+    في StoreViewSet.retrieve و storecategories?store_id=.
+    """
+    store = models.OneToOneField(Store, on_delete=models.CASCADE, primary_key=True, related_name="menu")
+    payload = models.TextField()
+    categories_payload = models.TextField()
+    is_stale = models.BooleanField(default=False)
+    version = models.PositiveIntegerField(default=0)
+    built_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Menu of {self.store_id}"
+
+
 # -----------------------------------------------------------------------------
 # ✅ Product & ProductSize Models
 # -----------------------------------------------------------------------------
@@ -106,10 +134,43 @@ class Product(models.Model):
     image = CloudinaryField("image", null=True, blank=True)
     available = models.BooleanField(default=True)
 
+    # ⬅️ ملخص أسعار المقاسات المتاحة — تُحدَّث من ProductSize (signals + bulk)
+    min_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, editable=False, db_index=True)
+    max_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, editable=False, db_index=True)
+    max_discount_pct = models.DecimalField(
+        max_digits=5, decimal_places=2, default=Decimal("0"), editable=False, db_index=True
+    )
+    has_available_size = models.BooleanField(default=False, editable=False)
+    # ⬅️ نص البحث المُطبَّع (انظر store/search.py)
+    search_document = models.TextField(blank=True, default="", editable=False)
+    # العنوان لوحده مُطبَّع — فلتر ?title=
+    search_title = models.TextField(blank=True, default="", editable=False)
+
+    PRICE_SUMMARY_FIELDS = ("min_price", "max_price", "max_discount_pct", "has_available_size")
+
+    objects = ProductQuerySet.as_manager()
+
     class Meta:
         ordering = ["title"]
+        indexes = [models.Index(fields=["title", "id"], name="store_product_title_id_idx")]
 
     def save(self, *args, **kwargs):
+        # Summary columns are owned by refresh_price_summaries(); a stale
+        # in-memory copy must never overwrite them on a regular save.
+        if not self._state.adding and kwargs.get("update_fields") is None:
+            deferred = self.get_deferred_fields()
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.PRICE_SUMMARY_FIELDS
+                and field.attname not in deferred
+            ]
+        self.search_document = self.build_search_document()
+        self.search_title = normalize_arabic(self.title)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and {"title", "description", "store", "store_category"} & set(update_fields):
+            kwargs["update_fields"] = {*update_fields, "search_document", "search_title"}
         if not self.slug:
             base_slug = slugify(self.title)
             slug = base_slug
@@ -120,6 +181,14 @@ class Product(models.Model):
             self.slug = slug
         super().save(*args, **kwargs)
 
+    def build_search_document(self):
+        return build_search_document(
+            self.title,
+            self.description,
+            self.store.name if self.store_id else None,
+            self.store_category.name if self.store_category_id else None,
+        )
+
     def __str__(self):
         return f"{self.title} - {self.store.name}"
 
@@ -136,6 +205,18 @@ class ProductSize(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = ProductSizeQuerySet.as_manager()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # المنتج المحفوظ — لو المقاس اتنقل لمنتج تاني الاتنين ملخصهم يتغير
+        instance._saved_product_id = instance.__dict__.get("product_id")
+        return instance
+
+    def affected_product_ids(self):
+        return {self.product_id, getattr(self, "_saved_product_id", None) or self.product_id}
+
     class Meta:
         unique_together = [["product", "size_name"]]
         ordering = ["product","size_name"]
@@ -162,6 +243,8 @@ class CartItem(models.Model):
     product_size = models.ForeignKey(ProductSize, on_delete=models.CASCADE)
     quantity = models.PositiveSmallIntegerField(validators=[MinValueValidator(1)])
 
+    objects = CartItemQuerySet.as_manager()
+
     class Meta:
         unique_together = [["cart", "product_size"]]
 
@@ -195,6 +278,15 @@ class Order(models.Model):
         (ORDER_STATUS_CANCELED, "Canceled"),
     ]
 
+    # الانتقالات المسموحة: الحالة -> الحالات التالية (store/transitions.py)
+    TRANSITIONS = {
+        ORDER_STATUS_PENDING: (ORDER_STATUS_ACCEPTED, ORDER_STATUS_CANCELED),
+        ORDER_STATUS_ACCEPTED: (ORDER_STATUS_SHIPPED, ORDER_STATUS_CANCELED),
+        ORDER_STATUS_SHIPPED: (ORDER_STATUS_DELIVERED,),
+        ORDER_STATUS_DELIVERED: (),
+        ORDER_STATUS_CANCELED: (),
+    }
+
     customer = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.PROTECT)
     placed_at = models.DateTimeField(auto_now_add=True)
     order_status = models.CharField(max_length=12, choices=ORDER_STATUS_CHOICES, default=ORDER_STATUS_PENDING)
@@ -202,9 +294,30 @@ class Order(models.Model):
     notes = models.TextField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # يزيد مع كل تغيير في الحالة — الـ client يبعته مع PATCH ويرجع 409 لو اتغير
+    version = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = OrderQuerySet.as_manager()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if "order_status" in instance.__dict__:
+            # الحالة المحفوظة — أحداث تغيير الحالة (store/events.py)
+            instance._saved_status = instance.order_status
+        return instance
 
     class Meta:
         ordering = ["-placed_at"]
+        indexes = [models.Index(fields=["-placed_at", "-id"], name="store_order_placed_id_idx")]
+
+    def save(self, *args, **kwargs):
+        # تغيير الحالة بالـ save (الـ admin) يزود الـ version زي transition()
+        if not self._state.adding and self.order_status != getattr(self, "_saved_status", self.order_status):
+            self.version += 1
+            if kwargs.get("update_fields") is not None:
+                kwargs["update_fields"] = {*kwargs["update_fields"], "version"}
+        super().save(*args, **kwargs)
 
     def calculate_total_price(self, save=True):
         total = sum(item.quantity * item.unit_price for item in self.items.all())
@@ -225,18 +338,124 @@ class OrderItem(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._saved_line = instance._current_line()
+        return instance
+
+    def _current_line(self):
+        """(order_id, quantity × unit_price) — الإجمالي None لو الحقول deferred."""
+        values = self.__dict__
+        if values.get("quantity") is None or values.get("unit_price") is None:
+            return values.get("order_id"), None
+        return values.get("order_id"), values["quantity"] * values["unit_price"]
+
+    def _update_order_totals(self, previous, current):
+        # delta لكل طلب بدل إعادة قراءة كل العناصر (Order.objects.add_to_totals)
+        deltas = {}
+        for (order_id, line_total), sign in ((previous, -1), (current, 1)):
+            if order_id is None:
+                continue
+            if line_total is None or deltas.get(order_id, 0) is None:
+                deltas[order_id] = None
+            else:
+                deltas[order_id] = deltas.get(order_id, Decimal("0.00")) + sign * line_total
+        Order.objects.add_to_totals(deltas)
+
+        delta = deltas.get(self.order_id)
+        if delta and OrderItem.order.is_cached(self):
+            self.order.total_price += delta
+
     def save(self, *args, **kwargs):
         if self._state.adding:
             self.unit_price = self.product_size.price_after_discount or self.product_size.price
+            previous = (None, None)
+        else:
+            previous = getattr(self, "_saved_line", (self.order_id, None))
         super().save(*args, **kwargs)
-        if self.order:
-            self.order.calculate_total_price()
+        self._saved_line = self._current_line()
+        self._update_order_totals(previous, self._saved_line)
 
     def delete(self, *args, **kwargs):
-        order = self.order
-        super().delete(*args, **kwargs)
-        if order:
-            order.calculate_total_price()
+        previous = getattr(self, "_saved_line", (self.order_id, None))
+        result = super().delete(*args, **kwargs)
+        self._update_order_totals(previous, (None, None))
+        return result
 
     def __str__(self):
         return f"{self.product_size} (x{self.quantity})"
+
+
+# -----------------------------------------------------------------------------
+# ✅ Cold storage للطلبات المقفولة (store/archive.py — python manage.py archive_orders)
+# -----------------------------------------------------------------------------
+class ArchivedOrder(models.Model):
+    """
+    طلب Delivered/Canceled قديم اتنقل من store_order/store_orderitem.
+    على PostgreSQL الجدول partitioned بالشهر على ``placed_at`` (migration 0024)،
+    والعناصر محفوظة snapshot (JSON) مع الطلب في نفس الصف.
+    """
+
+    # نفس id الطلب الأصلي
+    id = models.BigIntegerField(primary_key=True)
+    customer = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.PROTECT, related_name="archived_orders")
+    placed_at = models.DateTimeField()
+    order_status = models.CharField(max_length=12, choices=Order.ORDER_STATUS_CHOICES)
+    total_price = models.DecimalField(max_digits=10, decimal_places=2)
+    notes = models.TextField(blank=True, null=True)
+    # [{"product_size": id, "product": id, "title": ..., "size": ..., "quantity": n, "unit_price": "9.50"}]
+    items = models.JSONField(default=list, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["-placed_at"]
+
+    def __str__(self):
+        return f"Archived order #{self.pk}"
+
+
+# -----------------------------------------------------------------------------
+# ✅ Background jobs (store/jobs.py — worker: python manage.py run_jobs)
+# -----------------------------------------------------------------------------
+class Job(models.Model):
+    STATUS_QUEUED = "queued"
+    STATUS_RUNNING = "running"
+    STATUS_DONE = "done"
+    STATUS_FAILED = "failed"
+
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, "Queued"),
+        (STATUS_RUNNING, "Running"),
+        (STATUS_DONE, "Done"),
+        (STATUS_FAILED, "Failed"),
+    ]
+
+    name = models.CharField(max_length=100)
+    args = models.JSONField(default=list, blank=True)
+    kwargs = models.JSONField(default=dict, blank=True)
+    # job واحد منتظر لكل مفتاح (مثلًا إعادة بناء منيو نفس المتجر)
+    dedupe_key = models.CharField(max_length=200, null=True, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["status", "run_after"], name="store_job_queue_idx")]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["dedupe_key"],
+                condition=models.Q(status="queued"),
+                name="store_job_queued_dedupe_key",
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
@@ -0,0 +1,135 @@
+"""
+Near-cache: LRU محدود (عدد + bytes) داخل كل worker قدام Redis للاستجابات
+المخزنة في store/cache.py.
+
+الـ coherence بالـ version probe مش pub/sub: كل request بيقرا عدادات الـ
+generation من Redis أصلًا (للـ ETag)، والمدخل المحلي يتقدم بس لو اتبنى على
+نفس العدادات ولسه fresh. يعني أي إبطال يوصل لكل الـ workers فورًا، والـ
+``NEAR_CACHE_TTL`` بيحدد أقصى مدة نسخة محلية تعيش من غير ما نرجع لـ Redis
+(مثلًا لو worker تاني عمل refresh بعد انتهاء الـ soft TTL).
+
+إحصائيات كل worker بتتكتب في الكاش كل ``NEAR_CACHE_STATS_INTERVAL`` ثانية
+(``manage.py cache_stats`` يعرضها).
+"""
+import os
+import socket
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import cache
+
+from . import metrics
+
+STATS_PREFIX = "nearcache:stats"
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+class NearCache:
+    # حجم تقريبي لكل مدخل فوق الـ content (المفتاح، الـ dict، الـ versions)
+    entry_overhead = 512
+
+    def __init__(self, max_entries, max_bytes, ttl):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.entries = OrderedDict()  # key -> (expires, size, value)
+        self.size = 0
+        self.hits = self.misses = self.evictions = 0
+        self.lock = threading.Lock()
+        self.stats_published = 0
+
+    def get(self, key):
+        with self.lock:
+            item = self.entries.get(key)
+            if item is not None and item[0] < time.monotonic():
+                self._remove(key)
+                item = None
+            if item is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.entries.move_to_end(key)
+        metrics.observe_near_cache(item is not None)
+        self.publish_stats()
+        return None if item is None else item[2]
+
+    def set(self, key, value, size):
+        size += self.entry_overhead
+        if size > self.max_bytes:
+            return
+        with self.lock:
+            if key in self.entries:
+                self._remove(key)
+            self.entries[key] = (time.monotonic() + self.ttl, size, value)
+            self.size += size
+            while len(self.entries) > self.max_entries or self.size > self.max_bytes:
+                self._remove(next(iter(self.entries)))
+                self.evictions += 1
+
+    def delete(self, key):
+        with self.lock:
+            if key in self.entries:
+                self._remove(key)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def _remove(self, key):
+        _, size, _ = self.entries.pop(key)
+        self.size -= size
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "bytes": self.size,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": self.hits / lookups if lookups else None,
+        }
+
+    def publish_stats(self):
+        interval = _setting("NEAR_CACHE_STATS_INTERVAL", 30)
+        now = time.monotonic()
+        if now - self.stats_published < interval:
+            return
+        self.stats_published = now
+        stats = self.stats()
+        cache.set(stats_key(), stats, interval * 3)
+        metrics.set_near_cache_size(stats["entries"], stats["bytes"])
+
+
+def stats_key(worker=None):
+    return f"{STATS_PREFIX}:{worker or f'{socket.gethostname()}:{os.getpid()}'}"
+
+
+def worker_stats():
+    """``{worker: stats}`` لكل الـ workers اللي نشروا إحصائياتهم مؤخرًا."""
+    if hasattr(cache, "keys"):  # django_redis
+        keys = cache.keys(f"{STATS_PREFIX}:*")
+    else:
+        keys = [stats_key()]
+    return {key[len(STATS_PREFIX) + 1:]: value for key, value in cache.get_many(keys).items()}
+
+
+@lru_cache(maxsize=None)
+def get_near_cache():
+    """None لو ``NEAR_CACHE_ENABLED = False``."""
+    if not _setting("NEAR_CACHE_ENABLED", True):
+        return None
+    return NearCache(
+        max_entries=_setting("NEAR_CACHE_MAX_ENTRIES", 500),
+        max_bytes=_setting("NEAR_CACHE_MAX_BYTES", 16 * 1024 * 1024),
+        ttl=_setting("NEAR_CACHE_TTL", 30),
+    )
@@ -1,6 +1,215 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+import binascii
+import json
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
 
 
 class DefaultPagination(PageNumberPagination):
     page_size = 10  # عدد العناصر في كل صفحة
+
+
+# -----------------------------------------------------------------------------
+# ✅ Keyset (cursor) pagination — بدون COUNT(*) أو OFFSET
+# -----------------------------------------------------------------------------
+class KeysetPagination(BasePagination):
+    """
+    Seeks with ``WHERE (a, b) > (last_a, last_b)`` on a unique ordering
+    instead of OFFSET. Cursors are opaque; ``?count=1`` adds the total.
+    """
+
+    page_size = 10
+    max_page_size = 100
+    page_size_query_param = "page_size"
+    cursor_query_param = "cursor"
+    count_query_param = "count"
+    invalid_cursor_message = "Invalid cursor"
+    conflicting_ordering_message = "Cursor pagination cannot be combined with a custom ordering or search."
+
+    def __init__(self, ordering=("-id",)):
+        self.ordering = tuple(ordering)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.paginate_querysets([queryset], request, view)
+
+    def paginate_querysets(self, querysets, request, view=None):
+        """
+        Several querysets with the same ordering fields (orders + archived
+        orders): each one is seeked and sliced, and the page is their merge.
+        """
+        # ?ordering= / ترتيب الـ search_rank: الـ seek لازم يمشي على نفس الترتيب
+        for queryset in querysets:
+            if queryset.query.order_by and tuple(queryset.query.order_by) != self.ordering:
+                raise ValidationError({self.cursor_query_param: self.conflicting_ordering_message})
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.fields = {
+            name: querysets[0].model._meta.get_field(name) for name, _ in map(_split, self.ordering)
+        }
+
+        self.count = None
+        if request.query_params.get(self.count_query_param, "").lower() in ("1", "true"):
+            self.count = sum(queryset.count() for queryset in querysets)
+
+        position, reverse = self.decode_cursor(request)
+        ordering = tuple(_flip(field) for field in self.ordering) if reverse else self.ordering
+        if position is not None:
+            querysets = [queryset.filter(self.seek(ordering, position)) for queryset in querysets]
+
+        rows = merge_rows(
+            [list(queryset.order_by(*ordering)[: self.page_size + 1]) for queryset in querysets], ordering
+        )[: self.page_size + 1]
+        has_more = len(rows) > self.page_size
+        rows = rows[: self.page_size]
+        if reverse:
+            rows.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+
+        self.page = rows
+        return rows
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def seek(self, ordering, position):
+        # (a > x) OR (a = x AND b > y) OR ...
+        condition = Q()
+        equal = Q()
+        for field, value in zip(ordering, position):
+            name, descending = _split(field)
+            condition |= equal & Q(**{f"{name}__{'lt' if descending else 'gt'}": value})
+            equal &= Q(**{name: value})
+        return condition
+
+    # ---------- cursors ----------
+    def encode_cursor(self, row, reverse):
+        position = [_value(row, name) for name, _ in map(_split, self.ordering)]
+        payload = json.dumps({"p": position, "r": int(reverse)}, default=_json_default)
+        cursor = base64.urlsafe_b64encode(payload.encode()).decode()
+        return replace_query_param(self.base_url, self.cursor_query_param, cursor)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded.encode()).decode())
+            position = [
+                field.to_python(value) for field, value in zip(self.fields.values(), payload["p"], strict=True)
+            ]
+            return position, bool(payload["r"])
+        except (TypeError, ValueError, KeyError, binascii.Error, UnicodeDecodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_next_link(self):
+        if not (self.has_next and self.page):
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not (self.has_previous and self.page):
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        body = {"next": self.get_next_link(), "previous": self.get_previous_link(), "results": data}
+        if self.count is not None:
+            body = {"count": self.count, **body}
+        return Response(body)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "count": {"type": "integer"},
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "previous": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+
+class CursorOptInPagination(BasePagination):
+    """
+    Keeps the existing contract (page numbers, or no pagination when
+    ``fallback_class`` is None) unless the client sends ``?cursor=``.
+    """
+
+    keyset_ordering = ("-id",)
+    fallback_class = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if KeysetPagination.cursor_query_param in request.query_params:
+            self.delegate = KeysetPagination(self.keyset_ordering)
+        elif self.fallback_class is not None:
+            self.delegate = self.fallback_class()
+        else:
+            self.delegate = None
+            return None
+        return self.delegate.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return self.delegate.get_paginated_response(data)
+
+
+class ProductPagination(CursorOptInPagination):
+    keyset_ordering = ("title", "id")
+    fallback_class = DefaultPagination
+
+
+class OrderPagination(CursorOptInPagination):
+    keyset_ordering = ("-placed_at", "-id")
+
+    def paginate_querysets(self, querysets, request, view=None):
+        """الطلبات + الأرشيف: بدون ``?cursor=`` القائمة كلها (زي ``paginate_queryset``)."""
+        if KeysetPagination.cursor_query_param not in request.query_params:
+            self.delegate = None
+            return None
+        self.delegate = KeysetPagination(self.keyset_ordering)
+        return self.delegate.paginate_querysets(querysets, request, view)
+
+
+class CategoryPagination(CursorOptInPagination):
+    keyset_ordering = ("name", "id")
+
+
+def _split(field):
+    return (field[1:], True) if field.startswith("-") else (field, False)
+
+
+def _flip(field):
+    return field[1:] if field.startswith("-") else f"-{field}"
+
+
+def _value(row, name):
+    return row[name] if isinstance(row, dict) else getattr(row, name)
+
+
+def merge_rows(sources, ordering):
+    """صفوف (dicts أو instances) من أكتر من مصدر مترتبة بـ ``ordering``."""
+    rows = [row for source in sources for row in source]
+    # sort ثابت: من آخر حقل لأوله
+    for name, descending in reversed([_split(field) for field in ordering]):
+        rows.sort(key=lambda row: _value(row, name), reverse=descending)
+    return rows
+
+
+def _json_default(value):
+    # full-precision isoformat: DjangoJSONEncoder drops microseconds, which
+    # would make the seek skip rows placed within the same millisecond.
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return str(value)
@@ -0,0 +1,102 @@
+"""
+Renderers / parsers للـ API.
+
+``FastJSONRenderer`` نفس مخرجات ``JSONRenderer`` (compact + UTF-8) لكن عبر
+orjson، و``MessagePackRenderer`` لتطبيق الموبايل (``Accept: application/msgpack``).
+الأنواع غير المدعومة مباشرة (Decimal, datetime, lazy strings...) تمر على
+encoder الخاص بـ DRF فتبقى القيم كما هي، وصور Cloudinary تتحول لرابطها.
+الكاش (store/cache.py) يدخل الـ media type في المفتاح، فكل format له نسخته.
+"""
+from cloudinary import CloudinaryResource
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser, JSONParser
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+from .metrics import timed_render
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - stdlib json fallback
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional dependency
+    msgpack = None
+
+_encoder = JSONEncoder()
+
+
+def encode_default(obj):
+    if isinstance(obj, CloudinaryResource):
+        return obj.url if obj else None
+    return _encoder.default(obj)
+
+
+# -----------------------------------------------------------------------------
+# ✅ JSON
+# -----------------------------------------------------------------------------
+class FastJSONRenderer(JSONRenderer):
+    if orjson is not None:
+        options = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+    @timed_render
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        # pretty printing (?indent / browsable API) stays on the stdlib path
+        if (
+            orjson is None
+            or self.ensure_ascii
+            or self.get_indent(accepted_media_type or "", renderer_context or {}) is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b""
+        try:
+            ret = orjson.dumps(data, default=encode_default, option=self.options)
+        except TypeError:  # e.g. ints wider than 64 bits
+            return super().render(data, accepted_media_type, renderer_context)
+        # same as JSONRenderer: keep the output valid inside <script> tags
+        return ret.replace("\u2028".encode(), b"\\u2028").replace("\u2029".encode(), b"\\u2029")
+
+
+class FastJSONParser(JSONParser):
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get("encoding", "utf-8")
+        if orjson is None or encoding.lower().replace("_", "-") not in ("utf-8", "utf8"):
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f"JSON parse error - {exc}")
+
+
+# -----------------------------------------------------------------------------
+# ✅ MessagePack
+# -----------------------------------------------------------------------------
+class MessagePackRenderer(BaseRenderer):
+    media_type = "application/msgpack"
+    format = "msgpack"
+    charset = None
+    render_style = "binary"
+
+    @timed_render
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if msgpack is None:
+            raise RuntimeError("MessagePackRenderer requires the 'msgpack' package.")
+        if data is None:
+            return b""
+        return msgpack.packb(data, default=encode_default, use_bin_type=True, datetime=False)
+
+
+class MessagePackParser(BaseParser):
+    media_type = "application/msgpack"
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if msgpack is None:
+            raise ParseError("MessagePack is not supported by this server.")
+        try:
+            return msgpack.unpackb(stream.read(), raw=False)
+        except (ValueError, msgpack.UnpackException) as exc:
+            raise ParseError(f"MessagePack parse error - {exc}")
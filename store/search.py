@@ -0,0 +1,135 @@
+"""
+بحث المنتجات (Full-text) مع تطبيع النص العربي.
+
+كل منتج يحمل ``search_document``: نص مُطبَّع يجمع العنوان والوصف واسم
+المتجر واسم القسم. على PostgreSQL يُبحث فيه عبر فهرس GIN على
+``to_tsvector('simple', search_document)`` وفهرس trigram للأخطاء الإملائية،
+وعلى SQLite (الاختبارات) يُستخدم ``LIKE`` على نفس النص المُطبَّع.
+"""
+import re
+
+from django.db import connection
+from django.db.models import BooleanField, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import StrIndex
+from rest_framework.filters import BaseFilterBackend
+from rest_framework.settings import api_settings
+
+# تشكيل + تطويل
+_TASHKEEL = re.compile("[\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06ed\u0640]")
+_NON_WORD = re.compile(r"[^\w]+")
+_CHAR_MAP = str.maketrans({
+    "أ": "ا",
+    "إ": "ا",
+    "آ": "ا",
+    "ٱ": "ا",
+    "ؤ": "و",
+    "ئ": "ي",
+    "ى": "ي",
+    "ة": "ه",
+    **{chr(0x0660 + digit): str(digit) for digit in range(10)},  # ٠-٩
+})
+
+
+def normalize_arabic(text):
+    """توحيد الألف/الهمزات والتاء المربوطة وحذف التشكيل، ثم lowercase."""
+    if not text:
+        return ""
+    text = _TASHKEEL.sub("", str(text)).translate(_CHAR_MAP).lower()
+    return " ".join(_NON_WORD.sub(" ", text).split())
+
+
+def tokenize(query):
+    return normalize_arabic(query).split()
+
+
+def build_search_document(title, description=None, store_name=None, category_name=None):
+    # العنوان أولًا: ترتيب النتائج على SQLite يعتمد على موضع التطابق
+    parts = (title, store_name, category_name, description)
+    return " ".join(normalize_arabic(part) for part in parts if part)
+
+
+def search_products(queryset, query):
+    """يفلتر المنتجات حسب ``query`` ويضيف ``search_rank`` للترتيب."""
+    tokens = tokenize(query)
+    if not tokens:
+        return queryset
+
+    if connection.vendor == "postgresql":
+        return _search_postgresql(queryset, tokens)
+    return _search_fallback(queryset, tokens)
+
+
+def search_title(queryset, query):
+    """كل كلمات ``query`` في العنوان المُطبَّع (بدون الوصف واسم المتجر والقسم)."""
+    condition = Q()
+    for token in tokenize(query):
+        condition &= Q(search_title__contains=token)
+    return queryset.filter(condition)
+
+
+def search_store_name(queryset, query):
+    """منتجات المتاجر اللي اسمها المُطبَّع فيه كل كلمات ``query``."""
+    from .models import Store
+
+    condition = Q()
+    for token in tokenize(query):
+        condition &= Q(search_name__contains=token)
+    # subquery على فهرس المتاجر بدل JOIN + ILIKE لكل منتج
+    return queryset.filter(store__in=Store.objects.filter(condition).values("pk"))
+
+
+def _search_postgresql(queryset, tokens):
+    document = f'"{queryset.model._meta.db_table}"."search_document"'
+    vector = f"to_tsvector('simple', {document})"
+    # prefix matching so partial words match while the user is typing
+    ts_query = " & ".join(f"{token}:*" for token in tokens)
+    text = " ".join(tokens)
+
+    matched = RawSQL(
+        f"({vector} @@ to_tsquery('simple', %s) OR %s <%% {document})",
+        (ts_query, text),
+        output_field=BooleanField(),
+    )
+    rank = RawSQL(
+        f"(ts_rank_cd({vector}, to_tsquery('simple', %s)) + word_similarity(%s, {document}))",
+        (ts_query, text),
+        output_field=FloatField(),
+    )
+    return queryset.filter(matched).annotate(search_rank=rank).order_by("-search_rank", "title", "pk")
+
+
+def _search_fallback(queryset, tokens):
+    condition = Q()
+    position = Value(0)
+    for token in tokens:
+        condition &= Q(search_document__contains=token)
+        position = position + StrIndex("search_document", Value(token))
+    # earlier matches (title) rank higher
+    rank = Value(0) - position
+    return (
+        queryset.filter(condition)
+        .annotate(search_rank=rank)
+        .order_by("-search_rank", "title", "pk")
+    )
+
+
+class ProductSearchFilter(BaseFilterBackend):
+    """بديل SearchFilter لـ ProductViewSet — نفس باراميتر ``?search=``."""
+
+    search_param = api_settings.SEARCH_PARAM
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, "")
+        return search_products(queryset, query)
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                "name": self.search_param,
+                "required": False,
+                "in": "query",
+                "description": "Full-text product search (title, description, store, category).",
+                "schema": {"type": "string"},
+            },
+        ]
@@ -4,12 +4,18 @@ from djoser.serializers import (
     UserSerializer as BaseUserSerializer,
     UserCreateSerializer as BaseUserCreateSerializer,
 )
-from django.db import transaction
 from django.utils.timezone import localtime
 from rest_framework import serializers
+from rest_framework.exceptions import NotFound
 from rest_framework.reverse import reverse
 
+from .archive import archived_products
+from .carts import get_cart_store
+from .checkout import CheckoutError, place_order
+from .images import ImageVariantsField, image_url, variant_url
+from .managers import CART_ITEM_MAX_QUANTITY
 from .models import (
+    ArchivedOrder,
     Category,
     Cart,
     CartItem,
@@ -65,7 +71,9 @@ class CategorySerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'total_stores', 'stores', 'image']
 
     def get_total_stores(self, category):
-        return category.stores.count()
+        # annotated by CategoryViewSet.get_queryset
+        total = getattr(category, "total_stores", None)
+        return total if total is not None else len(category.stores.all())
 
     def get_stores(self, category):
         request = self.context.get('request')
@@ -74,7 +82,7 @@ class CategorySerializer(serializers.ModelSerializer):
                 'id': store.id,
                 'name': store.name,
                 'store_url': reverse('stores-detail', args=[store.id], request=request),
-                'image': store.image.url if store.image else None
+                'image': image_url(store.image),
             }
             for store in category.stores.all()
         ]
@@ -89,6 +97,7 @@ class StoreCategorySerializer(serializers.ModelSerializer):
 class StoreSerializer(serializers.ModelSerializer):
     category = serializers.SerializerMethodField()
     image = serializers.SerializerMethodField()
+    images = ImageVariantsField()
     store_categories = StoreCategorySerializer(many=True, read_only=True)
     products_count = serializers.SerializerMethodField()
 
@@ -104,6 +113,7 @@ class StoreSerializer(serializers.ModelSerializer):
             "category",
             "products_count",
             "image",
+            "images",
             "store_categories",
         ]
 
@@ -111,21 +121,16 @@ class StoreSerializer(serializers.ModelSerializer):
         return {
             "id": store.category.id,
             "name": store.category.name,
-            "image": store.category.image.url if store.category.image else None,
+            "image": image_url(store.category.image),
         }
 
     def get_products_count(self, store: Store):
-        return store.products.count()
+        # annotated by StoreViewSet.get_queryset
+        count = getattr(store, "products_count", None)
+        return count if count is not None else store.products.count()
 
     def get_image(self, obj):
-        if obj.image:
-            try:
-                return obj.image.url.replace(
-                    "/upload/", "/upload/w_600,h_600,c_fit,q_auto:eco,f_auto/"
-                )
-            except Exception:
-                return None
-        return None
+        return variant_url(obj.image, "card_600")
 
 
 # -----------------------------------------------------------------------------
@@ -133,53 +138,59 @@ class StoreSerializer(serializers.ModelSerializer):
 # -----------------------------------------------------------------------------
 class LightweightProductSerializer(serializers.ModelSerializer):
     image = serializers.SerializerMethodField()
+    images = ImageVariantsField()
     sizes = ProductSizeSerializer(many=True, read_only=True)
 
     class Meta:
         model = Product
-        fields = ["id", "title", "description", "sizes", "image", "available"]
+        fields = ["id", "title", "description", "sizes", "image", "images", "available"]
 
     def get_image(self, obj):
-        if obj.image:
-            try:
-                return obj.image.url.replace(
-                    "/upload/", "/upload/w_600,h_600,c_fit,q_auto:eco,f_auto/"
-                )
-            except Exception:
-                return None
-        return None
+        return variant_url(obj.image, "card_600")
+
+
+class MenuProductSizeSerializer(ProductSizeSerializer):
+    effective_price = serializers.SerializerMethodField()
+
+    class Meta(ProductSizeSerializer.Meta):
+        fields = ProductSizeSerializer.Meta.fields + ["effective_price"]
+
+    def get_effective_price(self, size):
+        return size.price_after_discount or size.price
+
+
+class MenuProductSerializer(LightweightProductSerializer):
+    """منتج داخل منيو المتجر (store/menus.py) مع الأسعار الفعلية"""
+
+    sizes = MenuProductSizeSerializer(many=True, read_only=True)
+
+    class Meta(LightweightProductSerializer.Meta):
+        fields = LightweightProductSerializer.Meta.fields + ["min_price", "max_price", "max_discount_pct"]
 
 
 class SimpleProductSerializer(serializers.ModelSerializer):
     """Returns basic info + min price among sizes"""
 
     image = serializers.SerializerMethodField()
+    images = ImageVariantsField()
     min_price = serializers.SerializerMethodField()
 
     class Meta:
         model = Product
-        fields = ["id", "title", "min_price", "image"]
+        fields = ["id", "title", "min_price", "image", "images"]
 
     def get_image(self, obj):
-        if obj.image:
-            try:
-                return obj.image.url.replace(
-                    "/upload/", "/upload/w_600,h_600,c_fit,q_auto:eco,f_auto/"
-                )
-            except Exception:
-                return None
-        return None
+        return variant_url(obj.image, "card_600")
 
     def get_min_price(self, obj):
-        first_size = obj.sizes.filter(is_available=True).order_by("price").first()
-        if first_size:
-            return first_size.price_after_discount or first_size.price
-        return None
+        # العمود المُجمَّع على Product (أقل سعر فعلي للمقاسات المتاحة)
+        return obj.min_price
 
 
 class ProductSerializer(serializers.ModelSerializer):
     store_category = StoreCategorySerializer()
     image = serializers.SerializerMethodField()
+    images = ImageVariantsField()
     sizes = ProductSizeSerializer(many=True, read_only=True)
 
     class Meta:
@@ -192,18 +203,12 @@ class ProductSerializer(serializers.ModelSerializer):
             "store_category",
             "sizes",
             "image",
+            "images",
             "available",
         ]
 
     def get_image(self, obj):
-        if obj.image:
-            try:
-                return obj.image.url.replace(
-                    "/upload/", "/upload/w_600,h_600,c_fit,q_auto:eco,f_auto/"
-                )
-            except Exception:
-                return None
-        return None
+        return variant_url(obj.image, "card_600")
 
 
 # -----------------------------------------------------------------------------
@@ -236,10 +241,7 @@ class CartItemSerializer(serializers.ModelSerializer):
 
     # ---------- helpers ----------
     def get_product_image(self, obj):
-        img = obj.product_size.product.image
-        if img:
-            return img.url.replace('/upload/', '/upload/w_150,h_150,c_fit,q_auto,f_auto/')
-        return None
+        return variant_url(obj.product_size.product.image, 'thumb_150')
 
     def get_unit_price(self, obj):
         ps = obj.product_size
@@ -276,7 +278,7 @@ class CartSerializer(serializers.ModelSerializer):
 
     # ---------- helpers ----------
     def get_items_count(self, cart):
-        return cart.items.count()
+        return len(cart.items.all())
 
     def get_items_total(self, cart):
         return sum(item.quantity *
@@ -307,14 +309,19 @@ class AddCartItemSerializer(serializers.ModelSerializer):
         product_size: ProductSize = self.validated_data["product_size"]
         quantity = self.validated_data["quantity"]
 
-        cart_item, created = CartItem.objects.get_or_create(
-            cart_id=cart_id,
-            product_size=product_size,
-            defaults={"quantity": quantity},
-        )
-        if not created:
-            cart_item.quantity += quantity
-            cart_item.save()
+        # upsert ذري (INSERT ... ON CONFLICT / HINCRBY) بدل get_or_create + save
+        try:
+            cart_item = get_cart_store().add_quantity(self.context["user"], cart_id, product_size.pk, quantity)
+        except Cart.DoesNotExist:
+            raise NotFound("No cart with the given ID was found.")
+        except ProductSize.DoesNotExist:  # المقاس اتحذف بعد الـ validation
+            raise serializers.ValidationError(
+                {"product_size": [f'Invalid pk "{product_size.pk}" - object does not exist.']}
+            )
+        if cart_item is None:
+            raise serializers.ValidationError(
+                {"quantity": [f"Ensure the total quantity is less than or equal to {CART_ITEM_MAX_QUANTITY}."]}
+            )
 
         self.instance = cart_item
         return cart_item
@@ -326,6 +333,75 @@ class UpdateCartItemSerializer(serializers.ModelSerializer):
         fields = ["quantity"]
 
 
+class CartOperationSerializer(serializers.Serializer):
+    OPERATIONS = ("add", "set", "remove")
+
+    op = serializers.ChoiceField(choices=OPERATIONS)
+    product_size = serializers.IntegerField(min_value=1)
+    quantity = serializers.IntegerField(min_value=1, max_value=CART_ITEM_MAX_QUANTITY, required=False)
+
+    def validate(self, attrs):
+        if attrs["op"] != "remove" and "quantity" not in attrs:
+            raise serializers.ValidationError({"quantity": ["This field is required."]})
+        return attrs
+
+
+class CartBatchSerializer(serializers.Serializer):
+    """add / set / remove لعدة أصناف في request واحد"""
+
+    MAX_OPERATIONS = 100
+
+    operations = CartOperationSerializer(many=True, allow_empty=False, max_length=MAX_OPERATIONS)
+
+    def validate_operations(self, operations):
+        # كل المقاسات في query واحد
+        ids = {operation["product_size"] for operation in operations}
+        available = dict(ProductSize.objects.filter(pk__in=ids).values_list("pk", "is_available"))
+
+        errors = []
+        for operation in operations:
+            size_id = operation["product_size"]
+            if size_id not in available:
+                errors.append({"product_size": [f'Invalid pk "{size_id}" - object does not exist.']})
+            elif operation["op"] != "remove" and not available[size_id]:
+                errors.append({"product_size": [f'Product size "{size_id}" is not available.']})
+            else:
+                errors.append({})
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        return operations
+
+    def get_changes(self):
+        """يدمج العمليات بالترتيب: {product_size_id: (op, quantity)}"""
+        changes = {}
+        for operation in self.validated_data["operations"]:
+            size_id, op = operation["product_size"], operation["op"]
+            quantity = operation.get("quantity", 0)
+            previous = changes.get(size_id)
+            if op == "add" and previous is not None:
+                previous_op, previous_quantity = previous
+                # add بعد remove = set، وبعد add/set يُجمع على نفس العملية
+                changes[size_id] = ("set", quantity) if previous_op == "remove" else (previous_op, previous_quantity + quantity)
+            else:
+                changes[size_id] = (op, quantity)
+        return changes
+
+    def save(self, **kwargs):
+        try:
+            over = get_cart_store().apply_changes(self.context["user"], self.context["cart_id"], self.get_changes())
+        except Cart.DoesNotExist:
+            raise NotFound("No cart with the given ID was found.")
+        if over:
+            raise serializers.ValidationError(
+                {
+                    "operations": [
+                        f"Ensure the total quantity of product size {size_id} is less than or equal to {CART_ITEM_MAX_QUANTITY}."
+                        for size_id in over
+                    ]
+                }
+            )
+
+
 # -----------------------------------------------------------------------------
 # ✅ Order Serializers
 # -----------------------------------------------------------------------------
@@ -350,12 +426,7 @@ class OrderItemSerializer(serializers.ModelSerializer):
 
     # صورة مصغّرة (اختياري)
     def get_product_image(self, obj):
-        img = obj.product_size.product.image
-        if img:
-            return img.url.replace(
-                '/upload/', '/upload/w_150,h_150,c_fit,q_auto,f_auto/'
-            )
-        return None
+        return variant_url(obj.product_size.product.image, 'thumb_150')
 
     def get_total_item_price(self, obj):
         return float(obj.quantity * obj.unit_price)
@@ -381,21 +452,84 @@ class OrderSerializer(serializers.ModelSerializer):
             "notes",
             "store_name",
             "store_image",
+            "version",
         ]
 
     def get_placed_at(self, obj):
         return localtime(obj.placed_at).strftime("%Y-%m-%d %H:%M")
 
    
+    # items.all() يستخدم الـ prefetch (items.first() كان يعمل query لكل طلب)
+    def _first_item(self, order):
+        return next(iter(order.items.all()), None)
+
     def get_store_name(self, order):
-        first_item = order.items.first()
+        first_item = self._first_item(order)
         return first_item.product_size.product.store.name if first_item else None
 
     def get_store_image(self, obj):
         request = self.context.get("request")
-        first_item = obj.items.first()
-        if first_item and first_item.product_size.product.store.image:
-            return request.build_absolute_uri(first_item.product_size.product.store.image.url)
+        first_item = self._first_item(obj)
+        url = image_url(first_item.product_size.product.store.image) if first_item else None
+        return request.build_absolute_uri(url) if url else None
+
+
+class ArchivedOrderSerializer(serializers.ModelSerializer):
+    """
+    نفس شكل ``OrderSerializer`` لطلب في الأرشيف (store/archive.py): الأصناف
+    من الـ snapshot، والصور والمتجر من المنتج الحالي (``context["products"]``
+    من ``archived_products`` للقائمة كلها). رقم الصنف مش محفوظ و ``version``
+    null (الطلب مقفول).
+    """
+    placed_at = serializers.SerializerMethodField()
+    items = serializers.SerializerMethodField()
+    customer = serializers.CharField(source="customer.full_name")
+    total_price = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
+    store_name = serializers.SerializerMethodField()
+    store_image = serializers.SerializerMethodField()
+    version = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ArchivedOrder
+        fields = OrderSerializer.Meta.fields
+
+    def get_placed_at(self, obj):
+        return localtime(obj.placed_at).strftime("%Y-%m-%d %H:%M")
+
+    def _products(self, obj):
+        if "products" not in self.context:
+            self.context["products"] = archived_products([obj])
+        return self.context["products"]
+
+    def _first_product(self, obj):
+        return self._products(obj).get(obj.items[0]["product"]) if obj.items else None
+
+    def get_items(self, obj):
+        products = self._products(obj)
+        items = []
+        for item in obj.items:
+            product = products.get(item["product"])
+            items.append({
+                "id": None,
+                "product_size": item["product_size"],
+                "product_name": item["title"],
+                "product_image": variant_url(product.image, "thumb_150") if product else None,
+                "quantity": item["quantity"],
+                "total_item_price": float(item["quantity"] * Decimal(item["unit_price"])),
+            })
+        return items
+
+    def get_store_name(self, obj):
+        product = self._first_product(obj)
+        return product.store.name if product else None
+
+    def get_store_image(self, obj):
+        request = self.context.get("request")
+        product = self._first_product(obj)
+        url = image_url(product.store.image) if product else None
+        return request.build_absolute_uri(url) if url else None
+
+    def get_version(self, obj):
         return None
 
 
@@ -404,54 +538,29 @@ class CreateOrderSerializer(serializers.Serializer):
     cart_id = serializers.UUIDField()
     notes   = serializers.CharField(required=False, allow_blank=True, max_length=2_000)
 
-    def validate_cart_id(self, cart_id):
-        if not Cart.objects.filter(pk=cart_id).exists():
-            raise serializers.ValidationError('No cart with the given ID was found.')
-        if not CartItem.objects.filter(cart_id=cart_id).exists():
-            raise serializers.ValidationError('The cart is empty.')
-        return cart_id
-
     def save(self, **kwargs):
-        with transaction.atomic():
-            cart_id  = self.validated_data['cart_id']
-            notes    = self.validated_data.get('notes', '')
-            customer = User.objects.get(id=self.context['user_id'])
-
-            # ➊ إنشاء الطلب
-            order = Order.objects.create(customer=customer, notes=notes)
-
-            # ➋ جلب عناصر السلة مع الـ product_size
-            cart_items = (
-                CartItem.objects
-                .filter(cart_id=cart_id)
-                .select_related('product_size')
+        # السلة تُقرأ وتُقفل مرة واحدة داخل place_order (store/checkout.py)
+        customer = self.context.get('user') or User.objects.get(id=self.context['user_id'])
+        try:
+            self.instance = place_order(
+                customer,
+                self.validated_data['cart_id'],
+                notes=self.validated_data.get('notes', ''),
             )
-
-            # ➌ بناء عناصر الطلب
-            order_items = [
-                OrderItem(
-                    order      = order,
-                    product_size = item.product_size,
-                    quantity   = item.quantity,
-                    unit_price = item.product_size.price_after_discount
-                                 or item.product_size.price   # السعر المُجمَّد وقت الطلب
-                )
-                for item in cart_items
-            ]
-            OrderItem.objects.bulk_create(order_items)
-
-            # ➍ حساب إجمالي الطلب ثم حذف السلة
-            order.calculate_total_price(save=True)
-            Cart.objects.filter(pk=cart_id).delete()
-            return order
+        except CheckoutError as exc:
+            raise serializers.ValidationError({'cart_id': [str(exc)]})
+        return self.instance
 
 
 
 
 class UpdateOrderSerializer(serializers.ModelSerializer):
+    # الـ version اللي الـ client شافه — لو الطلب اتغير بعده يرجع 409
+    version = serializers.IntegerField(required=False, min_value=0)
+
     class Meta:
         model = Order
-        fields = ['order_status']
+        fields = ['order_status', 'version']
 
 
 class UserCreateSerializer(BaseUserCreateSerializer):
@@ -1,10 +1,129 @@
 # store/signals.py
 
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
-from .models import Order
+from . import cache as versioned_cache
+from . import events
+from . import images
+from . import menus
+from .jobs import job
+from .models import Category, Order, OrderItem, Product, ProductSize, Store, StoreCategory, User
+
+# ✅ تحديث ملخص أسعار المنتج عند أي تعديل على مقاساته (بما فيها الـ admin inline)
+@receiver(post_save, sender=ProductSize)
+@receiver(post_delete, sender=ProductSize)
+def refresh_product_price_summary(sender, instance, **kwargs):
+    Product.objects.filter(pk__in=instance.affected_product_ids()).refresh_price_summaries()
+
+
+# ✅ اسم المتجر/القسم جزء من نص البحث لكل منتجاته — في background job (store/jobs.py)
+@job("search.refresh_store")
+def refresh_store_products_search(store_id):
+    Product.objects.filter(store_id=store_id).refresh_search_documents()
+
+
+@job("search.refresh_store_category")
+def refresh_store_category_products_search(store_category_id):
+    Product.objects.filter(store_category_id=store_category_id).refresh_search_documents()
+
+
+@receiver(post_save, sender=Store)
+def refresh_store_search_documents(sender, instance, **kwargs):
+    refresh_store_products_search.enqueue(instance.pk, dedupe_key=f"search:store:{instance.pk}")
+
+
+@receiver(post_save, sender=StoreCategory)
+def refresh_store_category_search_documents(sender, instance, **kwargs):
+    refresh_store_category_products_search.enqueue(instance.pk, dedupe_key=f"search:storecategory:{instance.pk}")
+
+
+# ✅ إبطال الكاش (versioned keys) والمنيو المُجهَّز — انظر store/cache.py و store/menus.py
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_product_cache(sender, instance, **kwargs):
+    versioned_cache.bump(
+        versioned_cache.generation_key("product"),
+        versioned_cache.generation_key("product", instance.pk),
+        versioned_cache.generation_key("store"),
+        versioned_cache.generation_key("store", instance.store_id),
+    )
+    menus.mark_stale([instance.store_id])
+
+
+@receiver(post_save, sender=ProductSize)
+@receiver(post_delete, sender=ProductSize)
+def invalidate_product_size_cache(sender, instance, **kwargs):
+    store_ids = versioned_cache.invalidate_products(instance.affected_product_ids())
+    menus.mark_stale(store_ids)
+    instance._saved_product_id = instance.product_id
+
+
+@receiver(post_save, sender=Store)
+@receiver(post_delete, sender=Store)
+def invalidate_store_cache(sender, instance, **kwargs):
+    versioned_cache.invalidate_store(instance.pk)
+    menus.mark_stale([instance.pk])
+
+
+@receiver(post_save, sender=StoreCategory)
+@receiver(post_delete, sender=StoreCategory)
+def invalidate_store_category_cache(sender, instance, **kwargs):
+    versioned_cache.invalidate_store_category(instance)
+    menus.mark_stale([instance.store_id])
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category_cache(sender, instance, **kwargs):
+    store_ids = versioned_cache.invalidate_category(instance)
+    menus.mark_stale(store_ids)
+
 
 @receiver(post_save, sender=Order)
-def update_order_total(sender, instance, created, **kwargs):
-    if created:
-        instance.calculate_total_price(save=True)
+@receiver(post_delete, sender=Order)
+def invalidate_order_cache(sender, instance, **kwargs):
+    versioned_cache.invalidate_orders([instance.customer_id])
+
+
+# اسم العميل (customer.full_name) جوه كل طلب من طلباته
+@receiver(post_save, sender=User)
+def invalidate_customer_orders_cache(sender, instance, created, update_fields=None, **kwargs):
+    # last_login وغيره بـ update_fields ما بيغيروش الطلبات
+    if created or (update_fields is not None and "full_name" not in update_fields):
+        return
+    versioned_cache.invalidate_orders([instance.pk])
+
+
+@receiver(post_save, sender=OrderItem)
+@receiver(post_delete, sender=OrderItem)
+def invalidate_order_item_cache(sender, instance, origin=None, **kwargs):
+    # حذف الطلب نفسه (cascade): invalidate_order_cache بيغطيه مرة واحدة
+    if getattr(origin, "model", type(origin)) is Order:
+        return
+    # إجمالي الطلب بيتعدل بـ update() (بدون signals على Order)
+    if OrderItem.order.is_cached(instance):
+        versioned_cache.invalidate_orders([instance.order.customer_id])
+    else:
+        versioned_cache.invalidate_order_ids([instance.order_id])
+
+
+# ✅ تسخين روابط الصور (store/images.py) بعد رفع/تغيير الصورة
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=Store)
+@receiver(post_save, sender=StoreCategory)
+@receiver(post_save, sender=Category)
+def warm_image_variants(sender, instance, **kwargs):
+    images.warm(instance.image)
+
+
+# ✅ أحداث الطلبات للـ admin (SSE) + عداد الـ Pending — store/events.py
+@receiver(post_save, sender=Order)
+def publish_order_event(sender, instance, created, **kwargs):
+    previous = None if created else getattr(instance, "_saved_status", events.UNKNOWN)
+    events.notify_order_saved(instance, previous, created)
+    instance._saved_status = instance.order_status
+
+
+@receiver(post_delete, sender=Order)
+def publish_order_deleted(sender, instance, **kwargs):
+    events.notify_order_deleted(instance)
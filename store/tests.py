@@ -1,3 +1,1578 @@
-from django.test import TestCase
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from io import BytesIO, StringIO
+from types import SimpleNamespace
+from unittest import mock, skipUnless
+from uuid import UUID
 
-# Create your tests here.
+import cloudinary
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, connections, transaction
+from django.contrib import admin
+from django.contrib.messages.storage.fallback import FallbackStorage
+from django.test import Client, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+from . import archive, events, idempotency, images, jobs, menus, metrics, transitions
+from .cache import ALL, generation_key, get_generations, get_lock, get_stats, release_lock
+from .carts import LocalMemoryCartStore, RedisCartStore
+from .checkout import CartNotFound, EmptyCart, place_order
+from .managers import CART_ITEM_MAX_QUANTITY
+from .nearcache import NearCache, get_near_cache
+from .renderers import FastJSONParser, FastJSONRenderer, MessagePackRenderer
+from .admin import OrderAdminForm
+from .serializers import LightweightProductSerializer, ProductSerializer, StoreSerializer
+from .views import CartItemViewSet
+from .models import (
+    ArchivedOrder,
+    Cart,
+    CartItem,
+    Category,
+    Job,
+    Order,
+    OrderItem,
+    Product,
+    ProductSize,
+    Store,
+    StoreCategory,
+    StoreMenu,
+    User,
+)
+
+
+def make_sizes(count):
+    category = Category.objects.create(name="مطاعم")
+    store = Store.objects.create(name="متجر", address="-", category=category)
+    sizes = []
+    for index in range(count):
+        product = Product.objects.create(title=f"منتج {index}", store=store)
+        sizes.append(ProductSize.objects.create(
+            product=product,
+            size_name="M",
+            size_type="default",
+            price=Decimal("100.00"),
+            price_after_discount=Decimal("80.00") if index % 2 else None,
+        ))
+    return sizes
+
+
+def clear_caches():
+    cache.clear()
+    # عدادات الـ versions بتبدأ من الأول بعد الـ clear، فالنسخ المحلية لازم تتمسح معاها
+    if get_near_cache() is not None:
+        get_near_cache().clear()
+
+
+# -----------------------------------------------------------------------------
+# ✅ Price summaries (ProductQuerySet.refresh_price_summaries)
+# -----------------------------------------------------------------------------
+class PriceSummaryTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.cheap, self.discounted = make_sizes(2)  # 100 / 100 بعد الخصم 80
+        ProductSize.objects.create(product=self.discounted.product, size_name="L", size_type="default", price=Decimal("150.00"))
+
+    def summary(self, size):
+        product = Product.objects.get(pk=size.product_id)
+        return product.min_price, product.max_price, product.max_discount_pct
+
+    def test_summary_columns_drive_the_price_filters(self):
+        self.assertEqual(self.summary(self.cheap), (Decimal("100.00"), Decimal("100.00"), Decimal("0")))
+        self.assertEqual(self.summary(self.discounted), (Decimal("80.00"), Decimal("150.00"), Decimal("20.00")))
+
+        client = APIClient()
+
+        def ids(query):
+            response = client.get(f"/store/products/?{query}", HTTP_ACCEPT="application/json")
+            return sorted(product["id"] for product in response.data["results"])
+
+        self.assertEqual(ids("has_discount=true"), [self.discounted.product_id])
+        self.assertEqual(ids("has_discount=false"), [self.cheap.product_id])
+        self.assertEqual(ids("max_price=90"), [self.discounted.product_id])
+        self.assertEqual(ids("min_price=90"), [self.cheap.product_id])
+
+    def test_moving_a_size_refreshes_both_products(self):
+        size = ProductSize.objects.get(pk=self.discounted.pk)
+        size.product_id = self.cheap.product_id
+        size.size_name = "XL"
+        size.save()
+        self.assertEqual(self.summary(self.cheap), (Decimal("80.00"), Decimal("100.00"), Decimal("20.00")))
+        self.assertEqual(self.summary(self.discounted), (Decimal("150.00"), Decimal("150.00"), Decimal("0")))
+
+        ProductSize.objects.filter(pk=size.pk).update(product=self.discounted.product)
+        self.assertEqual(self.summary(self.cheap), (Decimal("100.00"), Decimal("100.00"), Decimal("0")))
+        self.assertEqual(self.summary(self.discounted)[0], Decimal("80.00"))
+
+
+class ProductFilterTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        category = Category.objects.create(name="مطاعم")
+        store = Store.objects.create(name="مطعم الشام", address="-", category=category)
+        self.product = Product.objects.create(title="شاورمة فراخ", description="مع ثومية", store=store)
+
+    def ids(self, query):
+        response = APIClient().get(f"/store/products/?{query}", HTTP_ACCEPT="application/json")
+        return [product["id"] for product in response.data["results"]]
+
+    def test_title_and_store_name_match_their_own_field(self):
+        self.assertEqual(self.ids("title=شاورمه"), [self.product.pk])  # مُطبَّع
+        self.assertEqual(self.ids("title=الشام"), [])
+        self.assertEqual(self.ids("title=ثومية"), [])
+        self.assertEqual(self.ids("store_name=الشام"), [self.product.pk])
+        self.assertEqual(self.ids("store_name=شاورمة"), [])
+        self.assertEqual(self.ids("search=ثوميه"), [self.product.pk])
+
+    def test_store_name_matches_the_normalized_store_name(self):
+        self.assertEqual(self.ids("store_name=مطعم الشأم"), [self.product.pk])
+        self.assertEqual(self.ids("store_name=الشام مطعم"), [self.product.pk])
+        self.assertEqual(self.ids("store_name=الشام حلب"), [])
+        store = self.product.store
+        store.name = "مطعم حلب"
+        store.save(update_fields=["name"])
+        self.assertEqual(Store.objects.get(pk=store.pk).search_name, "مطعم حلب")
+        self.assertEqual(self.ids("store_name=الشام"), [])
+        self.assertEqual(self.ids("store_name=حلب"), [self.product.pk])
+
+
+class ListQueryCountTests(TestCase):
+    # عدد الـ queries ثابت مهما زاد عدد الصفوف (annotate/prefetch بدل N+1)
+    QUERIES = {"/store/stores/": 2, "/store/products/": 3, "/store/categories/": 2}
+
+    def add_store(self, category):
+        store = Store.objects.create(name=f"متجر {Store.objects.count()}", address="-", category=category)
+        for index in range(2):
+            store_category = StoreCategory.objects.create(name=f"قسم {index}", store=store)
+            product = Product.objects.create(title=f"منتج {index}", store=store, store_category=store_category)
+            for size_name in ("S", "L"):
+                ProductSize.objects.create(product=product, size_name=size_name, size_type="default", price=Decimal("50"))
+
+    def assert_constant_queries(self):
+        client = APIClient()
+        for url, queries in self.QUERIES.items():
+            clear_caches()
+            with self.assertNumQueries(queries, msg=url):
+                self.assertEqual(client.get(url, HTTP_ACCEPT="application/json").status_code, 200)
+
+    def check_list_sizes(self):
+        category = Category.objects.create(name="مطاعم")
+        self.add_store(category)
+        self.assert_constant_queries()
+        for index in range(4):
+            self.add_store(Category.objects.create(name=f"صيدليات {index}"))
+        self.assert_constant_queries()
+
+    def test_compiled_lists(self):
+        self.check_list_sizes()
+
+    @override_settings(STORE_COMPILED_SERIALIZERS=False)
+    def test_classic_lists(self):
+        self.check_list_sizes()
+
+
+class CompiledSerializerTests(TestCase):
+    def test_compiled_output_is_byte_identical(self):
+        # الأمر بيرفع CommandError لو أي list (products/categories/orders) اختلف
+        out = StringIO()
+        call_command("bench_serializers", "--stores", "2", "--products", "3", "--orders", "4", "--rounds", "1", stdout=out)
+        self.assertIn("byte-identical", out.getvalue())
+        self.assertEqual(out.getvalue().count("rows="), 3)
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        category = Category.objects.create(name="مطاعم")
+        store = Store.objects.create(name="متجر", address="-", category=category)
+        # عناوين مكررة: الـ seek لازم يكمل بالـ id
+        for title in ["ب", "أ", "ب", "ج", "أ"]:
+            Product.objects.create(title=title, store=store)
+        self.expected = list(Product.objects.order_by("title", "id").values_list("id", flat=True))
+        self.client = APIClient()
+
+    def get(self, url):
+        response = self.client.get(url, HTTP_ACCEPT="application/json")
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.data
+
+    def test_next_and_previous_cursors_walk_every_row_once(self):
+        pages = [self.get("/store/products/?cursor=&page_size=2")]
+        while pages[-1]["next"]:
+            pages.append(self.get(pages[-1]["next"]))
+        forward = [product["id"] for page in pages for product in page["results"]]
+        self.assertEqual(forward, self.expected)
+        self.assertIsNone(pages[0]["previous"])
+
+        backward = []
+        page = pages[-1]
+        while page["previous"]:
+            page = self.get(page["previous"])
+            backward = [product["id"] for product in page["results"]] + backward
+        self.assertEqual(backward, self.expected[: len(self.expected) - len(pages[-1]["results"])])
+
+    def test_cursor_with_custom_ordering_is_rejected(self):
+        for query in ("ordering=-id", "search=ب"):
+            response = self.client.get(f"/store/products/?cursor=&{query}", HTTP_ACCEPT="application/json")
+            self.assertEqual(response.status_code, 400)
+        # نفس ترتيب الـ cursor مسموح
+        self.assertEqual(len(self.get("/store/products/?cursor=&ordering=title,id")["results"]), 5)
+
+
+# -----------------------------------------------------------------------------
+# ✅ Checkout (store/checkout.py)
+# -----------------------------------------------------------------------------
+class PlaceOrderTests(TestCase):
+    # lock lines, insert order, insert items, delete items, delete cart
+    # + SAVEPOINT / RELEASE (the atomic block runs inside the test transaction)
+    CHECKOUT_QUERIES = 7
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(phone="01000000000", password="x", full_name="عميل")
+        cls.sizes = make_sizes(20)
+
+    def fill_cart(self, lines):
+        cart = Cart.objects.create(user=self.user)
+        CartItem.objects.bulk_create(
+            CartItem(cart=cart, product_size=size, quantity=2) for size in self.sizes[:lines]
+        )
+        return cart
+
+    def test_query_count_does_not_depend_on_cart_size(self):
+        for lines in (1, 20):
+            cart = self.fill_cart(lines)
+            with self.assertNumQueries(self.CHECKOUT_QUERIES):
+                order = place_order(self.user, cart.pk)
+            self.assertEqual(len(order.items.all()), lines)
+
+    def test_order_total_and_cart_cleanup(self):
+        cart = self.fill_cart(4)
+        order = place_order(self.user, cart.pk, notes="بدون بصل")
+
+        order.refresh_from_db()
+        # 2 × (100 + 80 + 100 + 80)
+        self.assertEqual(order.total_price, Decimal("720.00"))
+        self.assertEqual(sorted(order.items.values_list("unit_price", flat=True)), [Decimal("80.00")] * 2 + [Decimal("100.00")] * 2)
+        self.assertFalse(Cart.objects.filter(pk=cart.pk).exists())
+
+    def test_empty_cart(self):
+        cart = Cart.objects.create(user=self.user)
+        with self.assertRaises(EmptyCart):
+            place_order(self.user, cart.pk)
+        self.assertFalse(Order.objects.exists())
+
+    def test_api(self):
+        cart = self.fill_cart(3)
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        response = client.post("/store/orders/", {"cart_id": str(cart.pk)}, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data["items"]), 3)
+        self.assertEqual(response.data["store_name"], "متجر")
+
+        response = client.post("/store/orders/", {"cart_id": str(cart.pk)}, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data["cart_id"], ["No cart with the given ID was found."])
+
+
+# -----------------------------------------------------------------------------
+# ✅ Cart item upsert (CartItemQuerySet.add_quantity)
+# -----------------------------------------------------------------------------
+class AddQuantityTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(phone="01000000001", password="x", full_name="عميل")
+        cls.size = make_sizes(1)[0]
+
+    def setUp(self):
+        self.cart = Cart.objects.create(user=self.user)
+
+    def test_insert_then_increment_in_one_query(self):
+        with self.assertNumQueries(1):
+            item = CartItem.objects.add_quantity(self.cart.pk, self.size.pk, 3)
+        with self.assertNumQueries(1):
+            again = CartItem.objects.add_quantity(self.cart.pk, self.size.pk, 4)
+
+        self.assertEqual(again.pk, item.pk)
+        self.assertEqual(again.quantity, 7)
+        self.assertEqual(CartItem.objects.get().quantity, 7)
+
+    def test_quantity_ceiling(self):
+        CartItem.objects.add_quantity(self.cart.pk, self.size.pk, CART_ITEM_MAX_QUANTITY - 1)
+        self.assertIsNone(CartItem.objects.add_quantity(self.cart.pk, self.size.pk, 2))
+        self.assertEqual(CartItem.objects.get().quantity, CART_ITEM_MAX_QUANTITY - 1)
+
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.post(
+            f"/store/cart/{self.cart.pk}/items/", {"product_size": self.size.pk, "quantity": 2}, format="json"
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("quantity", response.data)
+
+
+@skipUnless(connection.vendor == "postgresql", "needs concurrent writers (PostgreSQL)")
+class AddQuantityConcurrencyTests(TransactionTestCase):
+    WORKERS = 8
+    ADDS = 25
+
+    def test_parallel_adds_do_not_lose_increments(self):
+        user = User.objects.create_user(phone="01000000002", password="x", full_name="عميل")
+        size = make_sizes(1)[0]
+        cart = Cart.objects.create(user=user)
+
+        def add(_):
+            try:
+                return CartItem.objects.add_quantity(cart.pk, size.pk, 1)
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(max_workers=self.WORKERS) as pool:
+            list(pool.map(add, range(self.WORKERS * self.ADDS)))
+
+        self.assertEqual(CartItem.objects.get(cart=cart).quantity, self.WORKERS * self.ADDS)
+
+
+class CartBatchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(phone="01000000003", password="x", full_name="عميل")
+        cls.sizes = make_sizes(3)
+
+    def setUp(self):
+        self.cart = Cart.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def batch(self, *operations):
+        return self.client.post(
+            f"/store/cart/{self.cart.pk}/items/batch/", {"operations": list(operations)}, format="json"
+        )
+
+    def quantities(self):
+        return dict(CartItem.objects.filter(cart=self.cart).values_list("product_size_id", "quantity"))
+
+    def test_add_set_remove(self):
+        first, second, third = self.sizes
+        CartItem.objects.add_quantity(self.cart.pk, first.pk, 2)
+        CartItem.objects.add_quantity(self.cart.pk, third.pk, 1)
+
+        response = self.batch(
+            {"op": "add", "product_size": first.pk, "quantity": 3},
+            {"op": "set", "product_size": second.pk, "quantity": 4},
+            {"op": "remove", "product_size": third.pk},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.quantities(), {first.pk: 5, second.pk: 4})
+
+    def test_operations_on_the_same_size_are_merged_in_order(self):
+        size = self.sizes[0]
+        CartItem.objects.add_quantity(self.cart.pk, size.pk, 2)
+
+        response = self.batch(
+            {"op": "add", "product_size": size.pk, "quantity": 1},
+            {"op": "add", "product_size": size.pk, "quantity": 1},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.quantities(), {size.pk: 4})
+
+        self.batch({"op": "remove", "product_size": size.pk}, {"op": "add", "product_size": size.pk, "quantity": 6})
+        self.assertEqual(self.quantities(), {size.pk: 6})
+
+    def test_ceiling_rejects_the_whole_batch(self):
+        first, second, _ = self.sizes
+        CartItem.objects.add_quantity(self.cart.pk, first.pk, CART_ITEM_MAX_QUANTITY - 1)
+
+        response = self.batch(
+            {"op": "set", "product_size": second.pk, "quantity": 2},
+            {"op": "add", "product_size": first.pk, "quantity": 2},
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("operations", response.data)
+        self.assertEqual(self.quantities(), {first.pk: CART_ITEM_MAX_QUANTITY - 1})
+
+    def test_unknown_size_is_rejected(self):
+        response = self.batch({"op": "add", "product_size": 0, "quantity": 1})
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(CartItem.objects.exists())
+
+
+@skipUnless(connection.vendor == "postgresql", "needs concurrent writers (PostgreSQL)")
+class CartBatchConcurrencyTests(TransactionTestCase):
+    ROUNDS = 100
+
+    def test_batch_add_racing_single_add_does_not_lose_increments(self):
+        user = User.objects.create_user(phone="01000000004", password="x", full_name="عميل")
+        sizes = make_sizes(3)
+        cart = Cart.objects.create(user=user)
+        changes = {size.pk: ("add", 1) for size in sizes}
+
+        def batch(_):
+            try:
+                return CartItem.objects.apply_changes(cart.pk, changes)
+            finally:
+                connections.close_all()
+
+        def add(_):
+            try:
+                return CartItem.objects.add_quantity(cart.pk, sizes[0].pk, 1)
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            batches = [pool.submit(batch, index) for index in range(self.ROUNDS)]
+            adds = [pool.submit(add, index) for index in range(self.ROUNDS)]
+            self.assertEqual([future.result() for future in batches], [[]] * self.ROUNDS)
+            [future.result() for future in adds]
+
+        quantities = dict(CartItem.objects.filter(cart=cart).values_list("product_size_id", "quantity"))
+        self.assertEqual(quantities, {sizes[0].pk: 2 * self.ROUNDS, sizes[1].pk: self.ROUNDS, sizes[2].pk: self.ROUNDS})
+
+
+@skipUnless(connection.vendor == "postgresql", "needs concurrent writers (PostgreSQL)")
+class CheckoutConcurrencyTests(TransactionTestCase):
+    CARTS = 64
+    LINES = 30
+
+    def test_carts_with_the_same_sizes_in_opposite_order_do_not_deadlock(self):
+        sizes = make_sizes(self.LINES)
+        carts = []
+        for index in range(self.CARTS):
+            user = User.objects.create(phone=f"0100000{index:04d}", full_name="عميل")
+            cart = Cart.objects.create(user=user)
+            # نص السلال بتضيف المقاسات بالعكس (ids الأصناف بنفس الترتيب)
+            ordered = sizes if index % 2 else sizes[::-1]
+            CartItem.objects.bulk_create(CartItem(cart=cart, product_size=size, quantity=1) for size in ordered)
+            carts.append((user, cart.pk))
+
+        def checkout(args):
+            try:
+                return place_order(*args)
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            orders = list(pool.map(checkout, carts))
+
+        self.assertEqual(len(orders), self.CARTS)
+        self.assertEqual(OrderItem.objects.count(), self.CARTS * self.LINES)
+
+
+# -----------------------------------------------------------------------------
+# ✅ Idempotency-Key (store/idempotency.py)
+# -----------------------------------------------------------------------------
+class IdempotencyTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = User.objects.create_user(phone="01000000020", password="x", full_name="Alice")
+        cls.bob = User.objects.create_user(phone="01000000021", password="x", full_name="Bob")
+        cls.size = make_sizes(1)[0]
+
+    def setUp(self):
+        clear_caches()
+        self.carts = {user.pk: Cart.objects.create(user=user) for user in (self.alice, self.bob)}
+
+    def url(self, user):
+        return f"/store/cart/{self.carts[user.pk].pk}/items/"
+
+    def add(self, user, key, quantity=2):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client.post(
+            self.url(user),
+            {"product_size": self.size.pk, "quantity": quantity},
+            format="json",
+            HTTP_IDEMPOTENCY_KEY=key,
+            HTTP_ACCEPT="application/json",
+        )
+
+    def quantity(self, user):
+        return CartItem.objects.get(cart=self.carts[user.pk]).quantity
+
+    def test_retry_replays_the_stored_response(self):
+        first = self.add(self.alice, "k1")
+        with self.assertNumQueries(0):
+            retry = self.add(self.alice, "k1")
+        self.assertEqual((retry.status_code, retry.content), (first.status_code, first.content))
+        self.assertEqual(retry[idempotency.REPLAYED_HEADER], "true")
+        self.assertEqual(self.quantity(self.alice), 2)
+
+    def test_different_payload_with_the_same_key_is_rejected(self):
+        self.add(self.alice, "k1")
+        self.assertEqual(self.add(self.alice, "k1", quantity=5).status_code, 422)
+        self.assertEqual(self.quantity(self.alice), 2)
+
+    def test_keys_are_scoped_per_user(self):
+        self.add(self.alice, "k1")
+        response = self.add(self.bob, "k1")
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse(response.has_header(idempotency.REPLAYED_HEADER))
+        self.assertEqual(self.quantity(self.bob), 2)
+
+    def test_duplicate_waits_for_the_in_flight_request(self):
+        view = CartItemViewSet(basename="cart-items")
+        request = SimpleNamespace(
+            user=self.alice, method="POST", path=self.url(self.alice), data={"product_size": self.size.pk, "quantity": 2}
+        )
+        cache_key = view.get_idempotency_cache_key(request, "k1")
+        fingerprint = view.get_idempotency_fingerprint(request)
+        cache.set(cache_key, {"state": idempotency.RUNNING, "fingerprint": fingerprint})
+
+        # الـ request الأول بيخلص بعد شوية
+        done = {
+            "state": idempotency.DONE,
+            "fingerprint": fingerprint,
+            "status": 201,
+            "content": b'{"id":1}',
+            "content_type": "application/json",
+        }
+        finish = threading.Timer(0.2, cache.set, (cache_key, done))
+        finish.start()
+        try:
+            response = self.add(self.alice, "k1")
+        finally:
+            finish.join()
+        self.assertEqual((response.status_code, response.content), (201, b'{"id":1}'))
+        self.assertFalse(CartItem.objects.exists())  # الـ handler ما اتنفذش تاني
+
+
+# -----------------------------------------------------------------------------
+# ✅ Cart store (store/carts.py)
+# -----------------------------------------------------------------------------
+class KeyValueCartStoreTests:
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(phone="01000000003", password="x", full_name="عميل")
+        cls.sizes = make_sizes(3)
+
+    def make_store(self):
+        raise NotImplementedError
+
+    def setUp(self):
+        self.store = self.make_store()
+        patcher = mock.patch("store.carts._load_store", return_value=self.store)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def new_cart(self, *quantities):
+        cart_id = self.client.post("/store/cart/").data["id"]
+        for size, quantity in zip(self.sizes, quantities):
+            self.client.post(
+                f"/store/cart/{cart_id}/items/", {"product_size": size.pk, "quantity": quantity}, format="json"
+            )
+        return cart_id
+
+    def test_cart_lives_outside_the_database_until_checkout(self):
+        cart_id = self.client.post("/store/cart/").data["id"]
+        items_url = f"/store/cart/{cart_id}/items/"
+        self.client.post(items_url, {"product_size": self.sizes[0].pk, "quantity": 2}, format="json")
+        self.client.post(
+            f"{items_url}batch/",
+            {"operations": [{"op": "add", "product_size": self.sizes[1].pk, "quantity": 1}]},
+            format="json",
+        )
+        response = self.client.patch(f"{items_url}{self.sizes[0].pk}/", {"quantity": 3}, format="json")
+        self.assertEqual(response.data, {"quantity": 3})
+
+        response = self.client.get(f"/store/cart/{cart_id}/")
+        # 3 × 100 + 1 × 80
+        self.assertEqual(response.data["total_price"], Decimal("380.00"))
+        self.assertFalse(Cart.objects.exists())
+        self.assertFalse(CartItem.objects.exists())
+
+        # the cart is dropped on commit
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post("/store/orders/", {"cart_id": cart_id}, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Order.objects.get().total_price, Decimal("380.00"))
+        self.assertEqual(self.client.get(f"/store/cart/{cart_id}/").status_code, 404)
+
+    def test_other_users_cart_is_not_found(self):
+        cart_id = self.client.post("/store/cart/").data["id"]
+        other = User.objects.create_user(phone="01000000004", password="x", full_name="آخر")
+        self.client.force_authenticate(other)
+
+        response = self.client.post(
+            f"/store/cart/{cart_id}/items/", {"product_size": self.sizes[0].pk, "quantity": 1}, format="json"
+        )
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.client.get(f"/store/cart/{cart_id}/").status_code, 404)
+
+    def test_set_and_remove_only_touch_existing_items(self):
+        cart_id = self.new_cart(2)
+        items_url = f"/store/cart/{cart_id}/items/"
+
+        missing = f"{items_url}{self.sizes[1].pk}/"
+        self.assertEqual(self.client.patch(missing, {"quantity": 3}, format="json").status_code, 404)
+        self.assertEqual(self.client.delete(missing).status_code, 404)
+        self.assertEqual(self.client.delete(f"{items_url}{self.sizes[0].pk}/").status_code, 204)
+        self.assertEqual(self.client.delete(f"{items_url}{self.sizes[0].pk}/").status_code, 404)
+        self.assertEqual(self.store.load(self.user), (cart_id, {}))
+
+    def test_deleted_size_is_not_found(self):
+        cart_id = self.new_cart(2)
+        self.sizes[0].delete()
+
+        response = self.client.patch(
+            f"/store/cart/{cart_id}/items/{self.sizes[0].pk}/", {"quantity": 3}, format="json"
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_a_cart_is_checked_out_once(self):
+        cart_id = self.new_cart(2, 1)
+
+        # checkout تاني سحب السلة ولسه ما خلصش
+        self.assertEqual(self.store.claim(self.user, cart_id), {self.sizes[0].pk: 2, self.sizes[1].pk: 1})
+        with self.assertRaises(CartNotFound):
+            place_order(self.user, cart_id)
+        self.assertFalse(Order.objects.exists())
+
+        # وفشل: السلة ترجع وتتطلب عادي
+        self.store.release(self.user, cart_id)
+        with self.captureOnCommitCallbacks(execute=True):
+            order = place_order(self.user, cart_id)
+        self.assertEqual(order.total_price, Decimal("280.00"))
+        self.assertIsNone(self.store.load(self.user))
+
+    def test_failed_checkout_restores_the_cart(self):
+        cart_id = self.new_cart(2, 1)
+
+        with mock.patch.object(OrderItem.objects, "bulk_create", side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                place_order(self.user, cart_id)
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(self.store.load(self.user), (cart_id, {self.sizes[0].pk: 2, self.sizes[1].pk: 1}))
+
+    def test_empty_cart_is_not_claimed(self):
+        cart_id = self.new_cart()
+        with self.assertRaises(EmptyCart):
+            place_order(self.user, cart_id)
+        self.assertEqual(self.store.load(self.user), (cart_id, {}))
+
+
+class LocalMemoryCartStoreTests(KeyValueCartStoreTests, TestCase):
+    def make_store(self):
+        return LocalMemoryCartStore()
+
+
+@skipUnless(fakeredis is not None, "needs fakeredis")
+class RedisCartStoreTests(KeyValueCartStoreTests, TestCase):
+    def make_store(self):
+        # الـ Lua scripts بتتنفذ في fakeredis (lupa)
+        return RedisCartStore(fakeredis.FakeRedis())
+
+    def test_release_keeps_a_cart_created_during_checkout(self):
+        cart_id = self.new_cart(1)
+        self.store.claim(self.user, cart_id)
+        self.assertGreater(self.store.client.ttl(self.store.claim_key(self.user, cart_id)), 0)
+
+        # سلة جديدة اتعملت أثناء الـ checkout: تفضل هي والمسحوبة تتشال
+        new_id = self.client.post("/store/cart/").data["id"]
+        self.store.release(self.user, cart_id)
+        self.assertEqual(self.store.load(self.user), (new_id, {}))
+        self.assertFalse(self.store.client.exists(self.store.claim_key(self.user, cart_id)))
+
+
+# -----------------------------------------------------------------------------
+# ✅ Order totals (OrderQuerySet.add_to_totals / defer_totals)
+# -----------------------------------------------------------------------------
+class OrderTotalTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(phone="01000000005", password="x", full_name="عميل")
+        cls.sizes = make_sizes(4)
+
+    def setUp(self):
+        self.order = Order.objects.create(customer=self.user)
+
+    def total(self):
+        return Order.objects.get(pk=self.order.pk).total_price
+
+    def test_item_changes_apply_deltas(self):
+        item = OrderItem.objects.create(order=self.order, product_size=self.sizes[0], quantity=2)
+        OrderItem.objects.create(order=self.order, product_size=self.sizes[1], quantity=1)
+        self.assertEqual(self.total(), Decimal("280.00"))
+
+        item = OrderItem.objects.get(pk=item.pk)
+        item.quantity = 3
+        # UPDATE the item + UPDATE the order total, no re-read of the other items
+        with self.assertNumQueries(2):
+            item.save()
+        self.assertEqual(self.total(), Decimal("380.00"))
+
+        item.delete()
+        self.assertEqual(self.total(), Decimal("80.00"))
+
+    def test_deferred_totals_are_computed_once(self):
+        with Order.objects.defer_totals():
+            with self.assertNumQueries(len(self.sizes)):
+                for size in self.sizes:
+                    OrderItem.objects.create(order=self.order, product_size=size, quantity=1)
+        self.assertEqual(self.total(), Decimal("360.00"))
+        self.assertFalse(Order.objects.with_total_drift().exists())
+
+    def test_drift_is_repaired(self):
+        OrderItem.objects.create(order=self.order, product_size=self.sizes[0], quantity=1)
+        Order.objects.filter(pk=self.order.pk).update(total_price=Decimal("1.00"))
+        self.assertTrue(Order.objects.with_total_drift().exists())
+
+        call_command("check_order_totals", "--fix", stdout=StringIO())
+        self.assertEqual(self.total(), Decimal("100.00"))
+
+
+# -----------------------------------------------------------------------------
+# ✅ Conditional GET (store/conditional.py)
+# -----------------------------------------------------------------------------
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(phone="01000000011", password="x", full_name="عميل")
+        cls.sizes = make_sizes(2)
+
+    def setUp(self):
+        clear_caches()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get(self, url, **headers):
+        return self.client.get(url, HTTP_ACCEPT="application/json", **headers)
+
+    def assert_not_modified(self, url):
+        """يرجع الـ ETag بعد التأكد من الـ 304 بالـ validators الاتنين."""
+        response = self.get(url)
+        self.assertEqual(response.status_code, 200)
+        etag = response["ETag"]
+        self.assertTrue(etag.startswith('W/"'))
+
+        not_modified = self.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual((not_modified.status_code, not_modified.content), (304, b""))
+        self.assertEqual(not_modified["ETag"], etag)
+        if response.has_header("Last-Modified"):
+            not_modified = self.get(url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"])
+            self.assertEqual(not_modified.status_code, 304)
+        return etag
+
+    def assert_changed(self, url, etag):
+        response = self.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_catalog_list(self):
+        url = "/store/categories/"
+        self.assertTrue(self.get(url).has_header("Last-Modified"))
+        etag = self.assert_not_modified(url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Category.objects.create(name="صيدليات")
+        self.assert_changed(url, etag)
+
+    def test_orders_list(self):
+        order = Order.objects.create(customer=self.user)
+        url = "/store/orders/"
+        etag = self.assert_not_modified(url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(f"/store/orders/{order.pk}/", {"order_status": "Canceled"}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assert_changed(url, etag)
+
+    def test_cart_items(self):
+        cart_id = self.client.post("/store/cart/").data["id"]
+        url = f"/store/cart/{cart_id}/items/"
+        self.client.post(url, {"product_size": self.sizes[0].pk, "quantity": 1}, format="json")
+        etag = self.assert_not_modified(url)
+
+        [item] = self.get(url).data
+        response = self.client.patch(f"{url}{item['id']}/", {"quantity": 2}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assert_changed(url, etag)
+
+        # السعر جزء من الـ body: تعديل المنتج يغير الـ ETag
+        etag = self.assert_not_modified(url)
+        self.sizes[0].price = Decimal("90.00")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.sizes[0].save()
+        self.assert_changed(url, etag)
+
+
+# -----------------------------------------------------------------------------
+# ✅ Image variants (store/images.py)
+# -----------------------------------------------------------------------------
+IMAGE = "image/upload/v1700000000/dawar/burger.jpg"
+
+
+def image_variant(transformation=None):
+    path = f"{transformation}/v1700000000" if transformation else "v1700000000"
+    return f"https://res.cloudinary.com/dawar/image/upload/{path}/dawar/burger.jpg"
+
+
+class ImageVariantsTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        config = cloudinary.config()
+        for name, value in (("cloud_name", "dawar"), ("secure", True)):
+            patcher = mock.patch.object(config, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        images._variants.cache_clear()
+        self.image = Product._meta.get_field("image").to_python(IMAGE)
+
+    def test_each_preset_is_an_upload_transformation(self):
+        self.assertEqual(
+            images.variants(self.image),
+            {
+                "thumb_150": image_variant("w_150,h_150,c_fit,q_auto,f_auto"),
+                "card_600": image_variant("w_600,h_600,c_fit,q_auto:eco,f_auto"),
+                "admin_100": image_variant("w_100,q_auto,f_auto"),
+                "original": image_variant(),
+            },
+        )
+        self.assertEqual(images.variant_url(self.image, "thumb_150"), image_variant(images.PRESETS["thumb_150"]))
+        self.assertEqual(images.image_url(self.image), image_variant())
+
+    def test_urls_are_built_once_per_image(self):
+        for _ in range(3):
+            images.variant_url(self.image, "card_600")
+        images.image_url(Product._meta.get_field("image").to_python(IMAGE))
+        info = images.cache_info()
+        self.assertEqual((info.misses, info.hits), (1, 3))
+
+    def test_missing_image(self):
+        for image in (None, "", Product._meta.get_field("image").to_python("")):
+            self.assertIsNone(images.variants(image))
+            self.assertIsNone(images.variant_url(image, "card_600"))
+            self.assertIsNone(images.image_url(image))
+        self.assertEqual(images.cache_info().currsize, 0)
+
+    def test_serializers_expose_the_api_presets(self):
+        size = make_sizes(1)[0]
+        product, store = size.product, size.product.store
+        Store.objects.filter(pk=store.pk).update(image=IMAGE)
+        Product.objects.filter(pk=product.pk).update(image=IMAGE)
+        expected = {"thumb_150": image_variant(images.PRESETS["thumb_150"]), "card_600": image_variant(images.PRESETS["card_600"])}
+
+        client = APIClient()
+        detail = client.get(f"/store/products/{product.pk}/", HTTP_ACCEPT="application/json").data
+        [row] = client.get("/store/products/", HTTP_ACCEPT="application/json").data["results"]
+        [store_row] = client.get("/store/stores/", HTTP_ACCEPT="application/json").data
+        for data in (detail, row, store_row):
+            self.assertEqual(data["images"], expected)
+            self.assertEqual(data["image"], expected["card_600"])
+
+        Product.objects.filter(pk=product.pk).update(image=None)
+        product = Product.objects.get(pk=product.pk)
+        self.assertIsNone(ProductSerializer(product).data["images"])
+        self.assertIsNone(StoreSerializer(Store.objects.get(pk=store.pk)).data["category"]["image"])
+
+
+# -----------------------------------------------------------------------------
+# ✅ Store menus (store/menus.py)
+# -----------------------------------------------------------------------------
+def without(row, *keys):
+    return {key: value for key, value in row.items() if key not in keys}
+
+
+class StoreMenuTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.size = make_sizes(1)[0]  # "منتج 0" بدون قسم
+        self.store = self.size.product.store
+        self.section = StoreCategory.objects.create(name="وجبات", store=self.store)
+        product = Product.objects.create(title="شاورمة", store=self.store, store_category=self.section)
+        ProductSize.objects.create(
+            product=product, size_name="L", size_type="default", price=Decimal("50.00"), price_after_discount=Decimal("45.00")
+        )
+        self.client = APIClient()
+
+    def get(self, url):
+        return self.client.get(url, HTTP_ACCEPT="application/json")
+
+    def menu_price(self):
+        menu = StoreMenu.objects.get(pk=self.store.pk)
+        [product] = json.loads(menu.payload)["uncategorized_products"]
+        return menu.is_stale, Decimal(str(product["sizes"][0]["price"]))
+
+    def test_payload_extends_the_nested_serializer_output(self):
+        menu = self.get(f"/store/stores/{self.store.pk}/").json()
+
+        # الـ retrieve القديم: StoreSerializer + منتجات كل قسم بـ LightweightProductSerializer
+        old = json.loads(JSONRenderer().render(StoreSerializer(self.store).data))
+        old_products = json.loads(JSONRenderer().render(
+            LightweightProductSerializer(Product.objects.filter(store_category=self.section), many=True).data
+        ))
+        self.assertEqual(without(menu, "store_categories", "uncategorized_products"), without(old, "store_categories"))
+        [section] = menu["store_categories"]
+        self.assertEqual([without(section, "products")], old["store_categories"])
+        self.assertEqual(
+            [
+                {**without(product, "min_price", "max_price", "max_discount_pct"), "sizes": [without(size, "effective_price") for size in product["sizes"]]}
+                for product in section["products"]
+            ],
+            old_products,
+        )
+        self.assertEqual(Decimal(str(section["products"][0]["sizes"][0]["effective_price"])), Decimal("45"))
+        self.assertEqual([product["title"] for product in menu["uncategorized_products"]], ["منتج 0"])
+
+        self.assertEqual(self.get(f"/store/storecategories/?store_id={self.store.pk}").json(), menu["store_categories"])
+        self.assertEqual(self.get("/store/storecategories/?store_id=0").json(), [])
+        self.assertEqual(self.get("/store/stores/0/").status_code, 404)
+
+    def test_size_edit_rebuilds_the_stale_menu(self):
+        menus.get_menu(self.store.pk)
+        self.size.price = Decimal("120.00")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.size.save()
+
+        self.assertEqual(self.menu_price(), (True, Decimal("100")))
+        self.assertEqual(list(Job.objects.values_list("name", "args")), [("menus.rebuild_stale", [self.store.pk])])
+        for job in jobs.claim(10):
+            self.assertTrue(jobs.execute(job))
+
+        self.assertEqual(self.menu_price(), (False, Decimal("120")))
+        [product] = self.get(f"/store/stores/{self.store.pk}/").json()["uncategorized_products"]
+        self.assertEqual(Decimal(str(product["sizes"][0]["price"])), Decimal("120"))
+
+    def test_older_rebuild_does_not_overwrite_a_newer_menu(self):
+        menus.get_menu(self.store.pk)
+        menus.mark_stale([self.store.pk])
+        render_menu = menus.render_menu
+
+        def render_during_edit(store_id):
+            rendered = render_menu(store_id)
+            # تعديل وصل أثناء البناء
+            ProductSize.objects.filter(pk=self.size.pk).update(price=Decimal("120.00"))
+            menus.mark_stale([store_id])
+            return rendered
+
+        with mock.patch.object(menus, "render_menu", side_effect=render_during_edit):
+            menus.rebuild_menu(self.store.pk)
+        self.assertEqual(self.menu_price(), (True, Decimal("100")))
+
+        menus.rebuild_stale_menus([self.store.pk])
+        self.assertEqual(self.menu_price(), (False, Decimal("120")))
+
+
+# -----------------------------------------------------------------------------
+# ✅ Order events (store/events.py)
+# -----------------------------------------------------------------------------
+@override_settings(ORDER_EVENTS_BROKER="store.events.LocalBroker")
+class OrderEventsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(phone="01000000006", password="x", full_name="عميل")
+
+    def setUp(self):
+        cache.delete(events.PENDING_KEY)
+
+    def test_pending_count_is_maintained_incrementally(self):
+        self.assertEqual(events.pending_orders_count(), 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            order = Order.objects.create(customer=self.user)
+
+        # لا COUNT جديد بعد الحدث
+        with self.assertNumQueries(0):
+            self.assertEqual(events.pending_orders_count(), 1)
+
+        order = Order.objects.get(pk=order.pk)
+        order.order_status = Order.ORDER_STATUS_ACCEPTED
+        with mock.patch.object(events, "publish", wraps=events.publish) as publish:
+            with self.captureOnCommitCallbacks(execute=True):
+                order.save()
+            self.assertEqual(publish.call_count, 1)
+            self.assertEqual(events.pending_orders_count(), 0)
+
+            # حفظ بدون تغيير الحالة لا ينشر شيء
+            with self.captureOnCommitCallbacks(execute=True):
+                order.save()
+            self.assertEqual(publish.call_count, 1)
+
+
+class ArchiveTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(phone="01000000007", password="x", full_name="عميل", is_staff=True)
+        cls.sizes = make_sizes(2)
+
+    def setUp(self):
+        clear_caches()
+
+    def place(self, status, days_ago, customer=None):
+        order = Order.objects.create(customer=customer or self.user)
+        OrderItem.objects.create(order=order, product_size=self.sizes[0], quantity=2)
+        Order.objects.filter(pk=order.pk).update(
+            order_status=status, placed_at=timezone.now() - timedelta(days=days_ago)
+        )
+        return order
+
+    def test_closed_orders_move_to_the_archive(self):
+        old = self.place(Order.ORDER_STATUS_DELIVERED, 400)
+        open_order = self.place(Order.ORDER_STATUS_PENDING, 400)
+        recent = self.place(Order.ORDER_STATUS_CANCELED, 1)
+
+        self.assertEqual(archive.archive_orders(archive.archive_cutoff(6), batch_size=1), 1)
+        self.assertEqual(set(Order.objects.values_list("pk", flat=True)), {open_order.pk, recent.pk})
+        self.assertFalse(OrderItem.objects.filter(order_id=old.pk).exists())
+
+        archived = ArchivedOrder.objects.get()
+        self.assertEqual((archived.pk, archived.total_price), (old.pk, Decimal("200.00")))
+        self.assertEqual(archived.items[0]["quantity"], 2)
+        self.assertEqual(Decimal(archived.items[0]["unit_price"]), Decimal("100.00"))
+
+    def test_staff_list_defaults_to_recent_orders(self):
+        old = self.place(Order.ORDER_STATUS_PENDING, 400)
+        recent = self.place(Order.ORDER_STATUS_PENDING, 1)
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        response = client.get("/store/orders/")
+        self.assertEqual([order["id"] for order in response.data], [recent.pk])
+
+        placed_after = (timezone.now() - timedelta(days=500)).date()
+        response = client.get("/store/orders/", {"placed_after": placed_after})
+        self.assertEqual([order["id"] for order in response.data], [recent.pk, old.pk])
+        self.assertEqual(client.get(f"/store/orders/{old.pk}/").status_code, 200)
+
+    def test_date_range_includes_archived_orders(self):
+        old = self.place(Order.ORDER_STATUS_DELIVERED, 400)
+        recent = self.place(Order.ORDER_STATUS_PENDING, 1)
+        archive.archive_orders(archive.archive_cutoff(6))
+        client = APIClient()
+        client.force_authenticate(self.user)
+        placed_after = (timezone.now() - timedelta(days=500)).date()
+
+        for compiled in (True, False):
+            with self.subTest(compiled=compiled), override_settings(STORE_COMPILED_SERIALIZERS=compiled):
+                clear_caches()
+                response = client.get("/store/orders/")
+                self.assertEqual([order["id"] for order in response.data], [recent.pk])
+
+                response = client.get("/store/orders/", {"placed_after": placed_after})
+                self.assertEqual([order["id"] for order in response.data], [recent.pk, old.pk])
+                archived = response.data[1]
+                self.assertEqual(list(archived), list(response.data[0]))
+                self.assertEqual((archived["order_status"], archived["total_price"]), ("Delivered", Decimal("200.00")))
+                self.assertEqual(archived["items"][0]["quantity"], 2)
+                self.assertEqual(archived["items"][0]["total_item_price"], 200.0)
+                self.assertEqual(archived["store_name"], self.sizes[0].product.store.name)
+
+                # خارج المدى
+                response = client.get("/store/orders/", {"placed_after": (timezone.now() - timedelta(days=30)).date()})
+                self.assertEqual([order["id"] for order in response.data], [recent.pk])
+
+                # الـ cursor بيعدي من الطلبات للأرشيف
+                response = client.get("/store/orders/", {"placed_after": placed_after, "cursor": "", "page_size": 1})
+                self.assertEqual([order["id"] for order in response.data["results"]], [recent.pk])
+                response = client.get(response.data["next"])
+                self.assertEqual([order["id"] for order in response.data["results"]], [old.pk])
+                self.assertIsNone(response.data["next"])
+
+        response = client.get(f"/store/orders/{old.pk}/")
+        self.assertEqual((response.status_code, response.data["id"]), (200, old.pk))
+
+    def test_customer_history_includes_archived_orders(self):
+        customer = User.objects.create_user(phone="01000000008", password="x", full_name="زبون")
+        old = self.place(Order.ORDER_STATUS_DELIVERED, 400, customer)
+        recent = self.place(Order.ORDER_STATUS_PENDING, 1, customer)
+        other = self.place(Order.ORDER_STATUS_DELIVERED, 400)
+        archive.archive_orders(archive.archive_cutoff(6))
+        client = APIClient()
+        client.force_authenticate(customer)
+
+        response = client.get("/store/orders/")
+        self.assertEqual([order["id"] for order in response.data], [recent.pk, old.pk])
+        self.assertEqual(response.data[1]["customer"], "زبون")
+        self.assertEqual(client.get(f"/store/orders/{old.pk}/").status_code, 200)
+        self.assertEqual(client.get(f"/store/orders/{other.pk}/").status_code, 404)
+
+
+class OrderTransitionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = User.objects.create_user(phone="01000000008", password="x", full_name="عميل")
+        cls.staff = User.objects.create_user(phone="01000000009", password="x", full_name="موظف", is_staff=True)
+
+    def setUp(self):
+        self.order = Order.objects.create(customer=self.customer)
+        self.url = f"/store/orders/{self.order.pk}/"
+        self.client = APIClient()
+
+    def test_transitions_are_versioned(self):
+        self.client.force_authenticate(self.staff)
+        response = self.client.patch(self.url, {"order_status": "Accepted", "version": 0}, format="json")
+        self.assertEqual(response.data, {"id": self.order.pk, "order_status": "Accepted", "version": 1})
+
+        # نسخة قديمة
+        response = self.client.patch(self.url, {"order_status": "Shipped", "version": 0}, format="json")
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual((response.data["order_status"], response.data["version"]), ("Accepted", 1))
+
+        # انتقال غير مسموح من الحالة الحالية
+        response = self.client.patch(self.url, {"order_status": "Delivered"}, format="json")
+        self.assertEqual(response.status_code, 409)
+        response = self.client.patch(self.url, {"order_status": "Pending"}, format="json")
+        self.assertEqual(response.status_code, 400)
+
+    def test_customer_can_only_cancel_pending_orders(self):
+        self.client.force_authenticate(self.customer)
+        response = self.client.patch(self.url, {"order_status": "Accepted"}, format="json")
+        self.assertEqual(response.status_code, 400)
+
+        Order.objects.filter(pk=self.order.pk).transition(Order.ORDER_STATUS_ACCEPTED, [Order.ORDER_STATUS_PENDING])
+        self.assertEqual(self.client.delete(self.url).status_code, 403)
+
+        other = Order.objects.create(customer=self.customer)
+        self.assertEqual(self.client.delete(f"/store/orders/{other.pk}/").status_code, 204)
+        self.assertFalse(Order.objects.filter(pk=other.pk).exists())
+
+    @override_settings(ORDER_EVENTS_BROKER="store.events.LocalBroker")
+    def test_delete_does_not_cancel_first(self):
+        OrderItem.objects.create(order=self.order, product_size=make_sizes(1)[0], quantity=1)
+        self.client.force_authenticate(self.customer)
+        with (
+            mock.patch.object(events, "publish") as publish,
+            mock.patch("store.cache._bump_now") as bump_now,
+            self.captureOnCommitCallbacks(execute=True),
+        ):
+            self.assertEqual(self.client.delete(self.url).status_code, 204)
+        publish.assert_not_called()
+        bump_now.assert_called_once_with([generation_key("orders"), generation_key("orders", self.customer.pk)])
+        self.assertFalse(OrderItem.objects.filter(order_id=self.order.pk).exists())
+        self.assertEqual(self.client.delete(self.url).status_code, 404)
+
+    def admin_change(self, status):
+        admin_client = Client()
+        admin_client.force_login(User.objects.create_superuser(phone="01000000010", password="x", full_name="مدير"))
+        return admin_client.post(
+            f"/admin/store/order/{self.order.pk}/change/",
+            {
+                "customer": self.customer.pk,
+                "order_status": status,
+                "total_price": "0.00",
+                "notes": "",
+                "items-TOTAL_FORMS": 0,
+                "items-INITIAL_FORMS": 0,
+                "items-MIN_NUM_FORMS": 0,
+                "items-MAX_NUM_FORMS": 1000,
+            },
+        )
+
+    def test_admin_status_changes_follow_the_transitions(self):
+        Order.objects.filter(pk=self.order.pk).update(order_status=Order.ORDER_STATUS_DELIVERED)
+
+        response = self.admin_change(Order.ORDER_STATUS_PENDING)
+        self.assertEqual(response.status_code, 200)  # الفورم راجع بالخطأ
+        self.assertIn("order_status", response.context["adminform"].form.errors)
+        self.assertEqual(Order.objects.get(pk=self.order.pk).order_status, Order.ORDER_STATUS_DELIVERED)
+
+    def test_admin_status_change_is_versioned(self):
+        self.assertEqual(self.admin_change(Order.ORDER_STATUS_ACCEPTED).status_code, 302)
+        self.order.refresh_from_db()
+        self.assertEqual((self.order.order_status, self.order.version), (Order.ORDER_STATUS_ACCEPTED, 1))
+
+    def test_admin_does_not_overwrite_a_concurrent_status_change(self):
+        form = OrderAdminForm(
+            {"customer": self.customer.pk, "order_status": Order.ORDER_STATUS_ACCEPTED, "total_price": "0.00"},
+            instance=Order.objects.get(pk=self.order.pk),
+        )
+        self.assertTrue(form.is_valid())
+        # العميل لغى الطلب بعد ما الصفحة اتفتحت
+        transitions.transition_order(Order.objects.all(), self.order.pk, Order.ORDER_STATUS_CANCELED)
+
+        request = RequestFactory().post("/")
+        request.session = {}
+        request._messages = FallbackStorage(request)
+        admin.site._registry[Order].save_model(request, form.save(commit=False), form, change=True)
+        self.order.refresh_from_db()
+        self.assertEqual((self.order.order_status, self.order.version), (Order.ORDER_STATUS_CANCELED, 1))
+        self.assertEqual(len(request._messages), 1)
+
+
+class OrderCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = User.objects.create_user(phone="01000000010", password="x", full_name="Alice")
+        cls.bob = User.objects.create_user(phone="01000000011", password="x", full_name="Bob")
+        cls.staff = User.objects.create_user(phone="01000000012", password="x", full_name="Staff", is_staff=True)
+
+    def setUp(self):
+        clear_caches()
+        self.order = Order.objects.create(customer=self.alice)
+
+    def get(self, user, url="/store/orders/"):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client.get(url, HTTP_ACCEPT="application/json")
+
+    def test_responses_are_scoped_to_user_and_role(self):
+        self.assertEqual([order["id"] for order in self.get(self.alice).data], [self.order.pk])
+        self.assertEqual(self.get(self.bob).data, [])
+        self.assertEqual([order["id"] for order in self.get(self.staff).data], [self.order.pk])
+        self.assertEqual(self.get(self.bob, f"/store/orders/{self.order.pk}/").status_code, 404)
+
+    def test_order_changes_invalidate_the_cache(self):
+        self.get(self.alice)
+        # من الكاش
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get(self.alice).status_code, 200)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            transitions.transition_order(Order.objects.all(), self.order.pk, Order.ORDER_STATUS_ACCEPTED)
+        self.assertEqual(self.get(self.alice).data[0]["order_status"], Order.ORDER_STATUS_ACCEPTED)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Order.objects.create(customer=self.alice)
+        self.assertEqual(len(self.get(self.alice).data), 2)
+
+    def test_customer_name_change_invalidates_the_cache(self):
+        self.get(self.alice)
+        self.get(self.staff)
+
+        # last_login بس: الكاش زي ما هو
+        with self.captureOnCommitCallbacks(execute=True):
+            self.alice.last_login = timezone.now()
+            self.alice.save(update_fields=["last_login"])
+        with self.assertNumQueries(0):
+            self.get(self.alice)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.alice.full_name = "Alice B."
+            self.alice.save()
+        self.assertEqual(self.get(self.alice).data[0]["customer"], "Alice B.")
+        self.assertEqual(self.get(self.staff).data[0]["customer"], "Alice B.")
+
+
+# commits حقيقية: الـ bump بيتسجل بـ transaction.on_commit
+class CacheInvalidationTests(TransactionTestCase):
+    def setUp(self):
+        clear_caches()
+        self.size = make_sizes(1)[0]
+        self.product = self.size.product
+        self.store = self.product.store
+        self.category = self.store.category
+        self.store_category = StoreCategory.objects.create(name="بيتزا", store=self.store)
+        self.client = APIClient()
+
+    def generation(self, namespace, pk=ALL):
+        return get_generations([generation_key(namespace, pk)])[0]
+
+    def get(self, url):
+        return self.client.get(url, HTTP_ACCEPT="application/json")
+
+    def edits(self):
+        # (وصف التعديل، الدالة، العداد اللي لازم يزيد)
+        return [
+            ("product", lambda: self.product.save(), ("product", self.product.pk)),
+            ("product size", lambda: self.size.save(), ("product", self.product.pk)),
+            ("store", lambda: self.store.save(), ("store", self.store.pk)),
+            ("store category", lambda: self.store_category.save(), ("storecategory", self.store_category.pk)),
+            ("category", lambda: self.category.save(), ("category", ALL)),
+        ]
+
+    def test_edits_bump_generations_after_commit(self):
+        for name, edit, key in self.edits():
+            with self.subTest(name):
+                before = self.generation(*key)
+                with transaction.atomic():
+                    edit()
+                    self.assertEqual(self.generation(*key), before)
+                self.assertGreater(self.generation(*key), before)
+
+    def test_rolled_back_edits_do_not_bump(self):
+        for name, edit, key in self.edits():
+            with self.subTest(name):
+                before = self.generation(*key)
+                with self.assertRaises(RuntimeError), transaction.atomic():
+                    edit()
+                    raise RuntimeError
+                self.assertEqual(self.generation(*key), before)
+
+    def test_next_get_after_an_edit_is_fresh(self):
+        urls = ["/store/products/", "/store/stores/", "/store/categories/"]
+        for url in urls:
+            self.get(url)
+            with self.assertNumQueries(0):  # من الكاش
+                self.get(url)
+
+        self.product.title = "بيتزا مارجريتا"
+        self.product.save()
+        self.store.name = "متجر الشيف"
+        self.store.save()
+        self.category.name = "مطاعم ومقاهي"
+        self.category.save()
+
+        self.assertEqual(self.get("/store/products/").json()["results"][0]["title"], "بيتزا مارجريتا")
+        self.assertEqual(self.get("/store/stores/").json()[0]["name"], "متجر الشيف")
+        self.assertEqual(self.get("/store/categories/").json()[0]["name"], "مطاعم ومقاهي")
+
+    def test_rolled_back_edit_keeps_the_cached_payload(self):
+        cached = self.get("/store/products/").content
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            Product.objects.filter(pk=self.product.pk).update(title="مؤقت")
+            self.product.save()
+            raise RuntimeError
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get("/store/products/").content, cached)
+
+
+# soft TTL = 0: كل مدخل stale فورًا، والـ refresh داخل نفس الـ request
+@override_settings(CACHE_REFRESH_IN_BACKGROUND=False, CATALOG_CACHE_TIMEOUT=0)
+class StaleWhileRevalidateTests(TestCase):
+    url = "/store/categories/"
+
+    def setUp(self):
+        clear_caches()
+        Category.objects.create(name="مطاعم")
+        self.client = APIClient()
+
+    def get(self):
+        return self.client.get(self.url, HTTP_ACCEPT="application/json")
+
+    def test_stale_entry_is_served_then_refreshed_once(self):
+        fresh = self.get().content
+        Category.objects.filter(name="مطاعم").update(name="مطاعم ومقاهي")  # بدون signals
+
+        # النسخة القديمة، والـ refresh حصل بعدها
+        self.assertEqual(self.get().content, fresh)
+        self.assertIn("مطاعم ومقاهي", self.get().content.decode())
+        self.assertEqual(get_stats(["categories"])["categories"], {"hit": 0, "stale": 2, "miss": 1})
+
+    def test_invalidated_entry_is_not_served_stale(self):
+        self.get()
+        with self.captureOnCommitCallbacks(execute=True):
+            Category.objects.create(name="صيدليات")
+        self.assertIn("صيدليات", self.get().content.decode())
+
+
+@skipUnless(fakeredis is not None, "needs fakeredis")
+class RedisLockTests(TestCase):
+    def setUp(self):
+        # django_redis فوق fakeredis: نفس الـ redis.lock.Lock بتاع الإنتاج
+        options = {"CONNECTION_POOL_KWARGS": {"connection_class": fakeredis.FakeConnection}}
+        self.enterContext(self.settings(CACHES={
+            "default": {"BACKEND": "django_redis.cache.RedisCache", "LOCATION": "redis://localhost:6379/0", "OPTIONS": options}
+        }))
+        cache.clear()
+
+    def test_lock_taken_by_the_request_is_released_by_the_refresh_thread(self):
+        lock = get_lock("lock:test", 30)
+        self.assertTrue(lock.acquire(blocking=False))
+
+        # refresh_in_background بيفك الـ lock من thread تاني
+        release = threading.Thread(target=release_lock, args=(lock,))
+        release.start()
+        release.join()
+        self.assertTrue(get_lock("lock:test", 30).acquire(blocking=False))
+
+
+class NearCacheTests(TestCase):
+    def test_lru_eviction_by_entries_and_bytes(self):
+        near = NearCache(max_entries=2, max_bytes=3000, ttl=60)
+        near.set("a", 1, 100)
+        near.set("b", 2, 100)
+        near.get("a")
+        near.set("c", 3, 100)  # b الأقدم استخدامًا
+        self.assertIsNone(near.get("b"))
+        near.set("d", 4, 2000)  # فوق الـ bytes (مع الـ overhead): a و c يطلعوا
+        self.assertEqual([near.get(key) for key in "acd"], [None, None, 4])
+        near.set("huge", 5, 5000)  # أكبر من الحد كله: ما يتخزنش
+        self.assertIsNone(near.get("huge"))
+        self.assertEqual(near.stats()["evictions"], 3)
+
+    def test_expired_entry_is_a_miss(self):
+        near = NearCache(max_entries=10, max_bytes=10_000, ttl=0)
+        near.set("a", 1, 10)
+        self.assertIsNone(near.get("a"))
+        self.assertEqual(near.stats()["entries"], 0)
+
+    @override_settings(CATALOG_CACHE_TIMEOUT=60)
+    def test_fresh_hit_skips_redis_and_invalidation_reaches_it(self):
+        clear_caches()
+        Category.objects.create(name="مطاعم")
+        client = APIClient()
+        client.get("/store/categories/")
+        with mock.patch.object(cache, "get", wraps=cache.get) as cache_get:
+            client.get("/store/categories/")
+        # عدادات الـ generations بس، من غير مدخل الـ response نفسه
+        self.assertFalse([call for call in cache_get.call_args_list if str(call.args[0]).startswith("resp:")])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Category.objects.create(name="صيدليات")
+        self.assertIn("صيدليات", client.get("/store/categories/").content.decode())
+
+
+class WarmCacheTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.size = make_sizes(1)[0]
+
+    def warm(self, *args):
+        out = StringIO()
+        call_command("warm_cache", "--host", "testserver", "--scheme", "http", "--workers", "1", *args, stdout=out)
+        return out.getvalue()
+
+    def test_warmed_responses_are_cache_hits(self):
+        self.assertIn("categories: 1 URLs", self.warm("--dry-run"))
+        self.assertEqual(get_stats(["categories"])["categories"]["miss"], 0)
+
+        self.assertIn("products: warmed 4/4", self.warm("--only", "categories", "products"))
+        client = APIClient()
+        client.get("/store/categories/", HTTP_ACCEPT="application/json")
+        client.get(f"/store/products/?store={self.size.product.store_id}", HTTP_ACCEPT="application/json")
+        stats = get_stats(["categories", "products"])
+        self.assertEqual((stats["categories"]["hit"], stats["categories"]["miss"]), (1, 0))
+        self.assertEqual((stats["products"]["hit"], stats["products"]["miss"]), (1, 0))
+
+
+# -----------------------------------------------------------------------------
+# ✅ Background jobs (store/jobs.py)
+# -----------------------------------------------------------------------------
+calls = []
+
+
+@jobs.job("tests.record", max_attempts=2)
+def record_job(value, fail=False):
+    calls.append(value)
+    if fail:
+        raise RuntimeError("boom")
+
+
+class JobTests(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_enqueued_after_commit_with_dedupe(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            record_job.enqueue(1, dedupe_key="record")
+            record_job.enqueue(1, dedupe_key="record")
+            self.assertFalse(Job.objects.exists())
+        self.assertEqual(Job.objects.filter(status=Job.STATUS_QUEUED).count(), 1)
+
+        for job in jobs.claim(10):
+            self.assertTrue(jobs.execute(job))
+        self.assertEqual(calls, [1])
+        self.assertEqual(Job.objects.get().status, Job.STATUS_DONE)
+
+    @override_settings(JOBS_RETRY_BASE=0)
+    def test_retries_then_fails(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            record_job.enqueue(2, fail=True)
+
+        with self.assertLogs("store.jobs", "ERROR"):
+            for _ in range(3):
+                for job in jobs.claim(10):
+                    jobs.execute(job)
+        job = Job.objects.get()
+        self.assertEqual((job.status, job.attempts), (Job.STATUS_FAILED, 2))
+        self.assertIn("boom", job.last_error)
+        self.assertEqual(calls, [2, 2])
+
+    @override_settings(JOBS_SYNC=True)
+    def test_sync_mode_runs_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            record_job.enqueue(3)
+            self.assertEqual(calls, [])
+        self.assertEqual(calls, [3])
+        self.assertFalse(Job.objects.exists())
+
+
+# -----------------------------------------------------------------------------
+# ✅ Renderers / parsers (store/renderers.py)
+# -----------------------------------------------------------------------------
+class RendererTests(TestCase):
+    data = {
+        "id": 1,
+        "price": Decimal("9.50"),
+        "placed_at": datetime(2026, 10, 17, 12, 30, 5, 123456, tzinfo=dt_timezone.utc),
+        "day": date(2026, 10, 17),
+        "opens_at": time(9, 30),
+        "token": UUID("12345678-1234-5678-1234-567812345678"),
+        "title": "مطعم الشيف — بيتزا",
+        "separator": "\u2028",
+        "items": [{"quantity": 2, "total": Decimal("19.00")}],
+        "empty": None,
+    }
+
+    def test_fast_json_matches_drf(self):
+        self.assertEqual(FastJSONRenderer().render(self.data), JSONRenderer().render(self.data))
+
+    def test_fallbacks_match_drf(self):
+        wide = {**self.data, "big": 2**70}  # أكبر من 64 bit: orjson بيرفض
+        self.assertEqual(FastJSONRenderer().render(wide), JSONRenderer().render(wide))
+        with mock.patch("store.renderers.orjson", None):
+            self.assertEqual(FastJSONRenderer().render(self.data), JSONRenderer().render(self.data))
+
+        context = {"indent": 2}
+        self.assertEqual(
+            FastJSONRenderer().render(self.data, "application/json", context),
+            JSONRenderer().render(self.data, "application/json", context),
+        )
+
+    def test_fast_json_parser(self):
+        body = JSONRenderer().render({"title": "مطعم", "quantity": 2})
+        self.assertEqual(FastJSONParser().parse(BytesIO(body)), {"title": "مطعم", "quantity": 2})
+        with self.assertRaises(ParseError):
+            FastJSONParser().parse(BytesIO(b"{"))
+
+    @skipUnless(msgpack is not None, "needs msgpack")
+    def test_msgpack_is_negotiated_for_requests_and_responses(self):
+        clear_caches()
+        Category.objects.create(name="صيدليات")
+        client = APIClient()
+        json_body = client.get("/store/categories/", HTTP_ACCEPT="application/json").json()
+        response = client.get("/store/categories/", HTTP_ACCEPT="application/msgpack")
+        self.assertEqual(response["Content-Type"], "application/msgpack")
+        self.assertIsInstance(response.accepted_renderer, MessagePackRenderer)
+        self.assertEqual(msgpack.unpackb(response.content), json_body)
+
+        user = User.objects.create_user(phone="01000000030", password="x", full_name="عميل")
+        size = make_sizes(1)[0]
+        cart = Cart.objects.create(user=user)
+        client.force_authenticate(user)
+        response = client.post(
+            f"/store/cart/{cart.pk}/items/",
+            msgpack.packb({"product_size": size.pk, "quantity": 2}),
+            content_type="application/msgpack",
+            HTTP_ACCEPT="application/msgpack",
+        )
+        self.assertEqual(response.status_code, 201)  # 415 لو مفيش parser للـ media type
+        self.assertEqual(msgpack.unpackb(response.content)["quantity"], 2)
+
+
+# -----------------------------------------------------------------------------
+# ✅ Metrics (store/metrics.py)
+# -----------------------------------------------------------------------------
+@skipUnless(metrics.enabled(), "needs prometheus_client")
+@override_settings(METRICS_TOKEN="secret")
+class MetricsTests(TestCase):
+    def test_requests_are_exported_by_route(self):
+        clear_caches()
+        Category.objects.create(name="مطاعم")
+        self.client.get("/store/categories/", HTTP_ACCEPT="application/json")
+
+        self.assertEqual(self.client.get("/metrics").status_code, 403)
+        response = self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer secret")
+        body = response.content.decode()
+        self.assertIn('dawar_http_request_duration_seconds_count{method="GET",route="categories.list",status="200"}', body)
+        self.assertIn('dawar_db_queries_per_request_count{route="categories.list"}', body)
+        self.assertIn('dawar_serialization_duration_seconds_count{route="categories.list",stage="serialize"}', body)
+        self.assertIn('dawar_cache_requests_total{family="categories",result="miss"}', body)
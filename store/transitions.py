@@ -0,0 +1,65 @@
+"""
+حالة الطلب كـ state machine (``Order.TRANSITIONS``) بدون locks:
+
+    UPDATE store_order SET order_status = ?, version = version + 1
+    WHERE id = ? AND order_status IN (<الحالات اللي تسمح بالانتقال>) [AND version = ?]
+
+اللي الـ UPDATE بتاعه لمس الصف هو اللي كسب؛ الخاسر يقرأ الحالة الحالية مرة
+واحدة عشان رسالة الـ 409. الـ UPDATE لا يمر على الـ signals، فحدث تغيير
+الحالة وعداد الـ Pending (store/events.py) وكاش الطلبات يتحدثوا من هنا.
+"""
+from django.db import transaction
+
+from . import events
+from .cache import invalidate_orders
+from .models import Order
+
+# العميل يقدر يلغي طلبه وهو Pending بس
+CUSTOMER_TRANSITIONS = {Order.ORDER_STATUS_PENDING: (Order.ORDER_STATUS_CANCELED,)}
+
+
+class TransitionError(Exception):
+    pass
+
+
+class InvalidTransition(TransitionError):
+    def __init__(self, status):
+        super().__init__(f"Orders cannot be moved to {status}.")
+
+
+class TransitionConflict(TransitionError):
+    def __init__(self, status, current):
+        self.current = current  # {"order_status": ..., "version": ...}
+        super().__init__(
+            f"Order is {current['order_status']} (version {current['version']}), it cannot be moved to {status}."
+        )
+
+
+def sources_for(status, transitions=Order.TRANSITIONS):
+    return tuple(source for source, targets in transitions.items() if status in targets)
+
+
+def transition_order(orders, order_id, status, version=None, transitions=Order.TRANSITIONS):
+    """
+    ``orders``: الـ queryset المسموح للمستخدم (مثلًا طلباته فقط). يرجع الـ
+    version الجديد، أو يرفع ``Order.DoesNotExist`` / ``InvalidTransition`` /
+    ``TransitionConflict``.
+    """
+    sources = sources_for(status, transitions)
+    if not sources:
+        raise InvalidTransition(status)
+
+    order = orders.filter(pk=order_id)
+    with transaction.atomic():
+        if not order.transition(status, sources, version):
+            current = order.values("order_status", "version").first()
+            if current is None:
+                raise Order.DoesNotExist
+            raise TransitionConflict(status, current)
+        # الصف محجوز بالـ UPDATE لحد الـ commit، فالقراءة دي هي الـ version بتاعنا
+        version, customer_id = order.values_list("version", "customer_id").get()
+        # الحالة السابقة معروفة لو مصدر واحد بس يسمح بالانتقال
+        previous = sources[0] if len(sources) == 1 else events.UNKNOWN
+        events.notify_order_saved(Order(pk=order_id, order_status=status), previous, created=False)
+        invalidate_orders([customer_id])
+    return version
@@ -1,11 +1,14 @@
-from django.shortcuts import get_object_or_404,render
-from django.db.models import Prefetch
-from django.utils.decorators import method_decorator
-from django.views.decorators.cache import cache_page
+import json
+
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from django.shortcuts import render
+from django.db import transaction
+from django.db.models import Count, Prefetch
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import status
+from rest_framework.decorators import action
 from rest_framework.filters import SearchFilter, OrderingFilter
-from rest_framework.mixins import CreateModelMixin, RetrieveModelMixin, DestroyModelMixin
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.viewsets import GenericViewSet, ModelViewSet
@@ -16,10 +19,11 @@ from django.contrib import messages
 
 
 
-from .filters import CategoryFilter, ProductFilter
+from .archive import archived_products, has_date_range, recent_orders_start, restrict_to_recent
+from .filters import ArchivedOrderFilter, CategoryFilter, OrderFilter, ProductFilter
 from .models import (
+    ArchivedOrder,
     Cart,
-    CartItem,
     Category,
     Order,
     OrderItem,
@@ -27,10 +31,30 @@ from .models import (
     Store,
     StoreCategory,
 )
-from .pagination import DefaultPagination
+from .carts import get_cart_store, parse_cart_id
+from .cache import ALL, VersionedCacheMixin, generation_key, get_generations
+from .compiled_serializers import (
+    CompiledCategorySerializer,
+    CompiledListMixin,
+    CompiledOrderSerializer,
+    CompiledProductSerializer,
+)
+from .conditional import ConditionalGetMixin, make_etag
+from .idempotency import IdempotencyMixin
+from .menus import get_menu
+from .pagination import CategoryPagination, OrderPagination, ProductPagination, merge_rows
+from .search import ProductSearchFilter
 from .permissions import IsAdminOrReadOnly, IsOrderOwnerOrAdmin
+from .transitions import (
+    CUSTOMER_TRANSITIONS,
+    InvalidTransition,
+    TransitionConflict,
+    transition_order,
+)
 from .serializers import (
     AddCartItemSerializer,
+    ArchivedOrderSerializer,
+    CartBatchSerializer,
     CartItemSerializer,
     CartSerializer,
     CategorySerializer,
@@ -43,27 +67,39 @@ from .serializers import (
     UpdateOrderSerializer,
 )
 
+def cart_items_etag(request, rows):
+    """ETag من (id, الكمية, المقاس, المنتج) + عدادات كاش المنتجات (السعر/الاسم/الصورة)."""
+    product_keys = sorted({generation_key("product", row[3]) for row in rows})
+    versions = get_generations(product_keys) if product_keys else []
+    return make_etag(request.get_full_path(), request.accepted_media_type, rows, product_keys, versions)
+
+
+def menu_response(request, payload):
+    if request.accepted_renderer.format == "json":
+        return HttpResponse(payload, content_type=request.accepted_renderer.media_type)
+    return Response(json.loads(payload))
+
+
 # -----------------------------------------------------------------------------
 # ✅ ProductViewSet
 # -----------------------------------------------------------------------------
 
-@method_decorator(cache_page(60), name="retrieve")  # 1 دقيقة
-@method_decorator(cache_page(60 * 5), name="list")  # 5 دقائق
-class ProductViewSet(ModelViewSet):
+class ProductViewSet(VersionedCacheMixin, CompiledListMixin, ModelViewSet):
     serializer_class = ProductSerializer
+    compiled_serializer_class = CompiledProductSerializer
+    cache_namespace = "product"
     permission_classes = [IsAdminOrReadOnly]
 
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    filter_backends = [DjangoFilterBackend, ProductSearchFilter, OrderingFilter]
     filterset_class = ProductFilter
-    pagination_class = DefaultPagination
+    pagination_class = ProductPagination
 
-    search_fields = ["title", "description", "store__name"]
-    ordering_fields = ["id", "title"]
+    ordering_fields = ["id", "title", "min_price", "max_price", "max_discount_pct"]
 
     def get_queryset(self):
         return (
-            Product.objects.select_related("store", "store_category")
-            .only("id", "title", "available", "store_id", "store_category_id", "image")
+            Product.objects.select_related("store_category")
+            .only("id", "title", "description", "available", "store_id", "image", "store_category__id", "store_category__name")
             .prefetch_related("sizes")
         )
 
@@ -87,10 +123,9 @@ class ProductViewSet(ModelViewSet):
 # ✅ StoreViewSet
 # -----------------------------------------------------------------------------
 
-@method_decorator(cache_page(60), name="retrieve")
-@method_decorator(cache_page(60 * 5), name="list")
-class StoreViewSet(ModelViewSet):
+class StoreViewSet(VersionedCacheMixin, ModelViewSet):
     serializer_class = StoreSerializer
+    cache_namespace = "store"
     permission_classes = [IsAdminOrReadOnly]
 
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
@@ -99,20 +134,16 @@ class StoreViewSet(ModelViewSet):
     ordering_fields = ["name", "created_at"]
 
     def get_queryset(self):
+        # التفاصيل تُقدَّم من المنيو المُجهَّز؛ القائمة تحتاج الأقسام فقط
         return (
             Store.objects.select_related("category")
             .only("id", "name", "description", "opens_at", "close_at", "max_discount", "image", "category_id")
+            .annotate(products_count=Count("products"))
             .prefetch_related(
-                Prefetch(
-                    "store_categories",
-                    queryset=StoreCategory.objects.only("id", "name", "store_id").prefetch_related(
-                        Prefetch(
-                            "products",
-                            queryset=Product.objects.only("id", "title", "available", "image", "store_category_id").prefetch_related("sizes"),
-                        )
-                    ),
-                )
+                Prefetch("store_categories", queryset=StoreCategory.objects.only("id", "name", "store_id").order_by("id"))
             )
+            # Store مالوش Meta.ordering، وبعد الـ GROUP BY الـ PostgreSQL بيرجع أي ترتيب
+            .order_by("id")
         )
 
     def get_serializer_context(self):
@@ -123,17 +154,27 @@ class StoreViewSet(ModelViewSet):
         return super().list(request, *args, **kwargs)
 
     def retrieve(self, request, *args, **kwargs):
-        return super().retrieve(request, *args, **kwargs)
+        if request.accepted_renderer.format == "json":
+            return self.menu_detail(request, *args, **kwargs)
+        # msgpack وغيره يعيد ترميز المنيو، فنخزن الناتج في الكاش
+        return self.cached_response(self.menu_detail, request, *args, **kwargs)
+
+    def menu_detail(self, request, *args, **kwargs):
+        # ✅ المنيو المُجهَّز (store/menus.py) بدل سلسلة الـ Prefetch
+        try:
+            menu = get_menu(int(kwargs["pk"]))
+        except (ValueError, Store.DoesNotExist):
+            raise Http404
+        return menu_response(request, menu.payload)
 
 
 # -----------------------------------------------------------------------------
 # ✅ StoreCategoryViewSet
 # -----------------------------------------------------------------------------
 
-@method_decorator(cache_page(60), name="retrieve")
-@method_decorator(cache_page(60 * 5), name="list")
-class StoreCategoryViewSet(ModelViewSet):
+class StoreCategoryViewSet(VersionedCacheMixin, ModelViewSet):
     serializer_class = StoreCategorySerializer
+    cache_namespace = "storecategory"
     permission_classes = [IsAdminOrReadOnly]
 
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
@@ -146,40 +187,72 @@ class StoreCategoryViewSet(ModelViewSet):
         base_qs = StoreCategory.objects
         if store_id:
             base_qs = base_qs.filter(store_id=store_id)
-        return base_qs.prefetch_related(
-            Prefetch(
-                "products",
-                queryset=Product.objects.only("id", "title", "available", "image", "store_category_id").prefetch_related("sizes"),
-            )
-        )
+        # StoreCategorySerializer = id + name فقط، لا داعي لعمل prefetch للمنتجات
+        return base_qs.only("id", "name", "store_id")
+
+    def get_cache_generations(self, request, *args, **kwargs):
+        # ?store_id= يعتمد على متجر واحد فقط
+        store_id = request.query_params.get("store_id")
+        if store_id and self.action == "list":
+            return [generation_key("store", store_id)]
+        return [generation_key("storecategory")]
 
     # ❌ أزلنا الكاش اليدوي
     def list(self, request, *args, **kwargs):
+        # ?store_id= فقط → أقسام المنيو المُجهَّز كما هي
+        if set(request.query_params) == {"store_id"}:
+            if request.accepted_renderer.format == "json":
+                return self.menu_categories(request)
+            return self.cached_response(self.menu_categories, request, *args, **kwargs)
         return super().list(request, *args, **kwargs)
 
+    def menu_categories(self, request, *args, **kwargs):
+        try:
+            menu = get_menu(int(request.query_params["store_id"]))
+        except (ValueError, Store.DoesNotExist):
+            return Response([])
+        return menu_response(request, menu.categories_payload)
+
 
 # -----------------------------------------------------------------------------
-# ✅ Cart & CartItem viewsets (لم تتغير)
+# ✅ Cart & CartItem viewsets (عبر الـ cart store — store/carts.py)
 # -----------------------------------------------------------------------------
 
-class CartViewSet(CreateModelMixin, RetrieveModelMixin, DestroyModelMixin, GenericViewSet):
+class CartViewSet(ConditionalGetMixin, GenericViewSet):
     serializer_class = CartSerializer
     permission_classes = [IsAuthenticated]
 
-    def get_queryset(self):
-        return Cart.objects.filter(user=self.request.user).prefetch_related("items__product_size__product")
+    def get_validators(self, request, *args, **kwargs):
+        cart_id = parse_cart_id(kwargs["pk"])
+        rows = cart_id and get_cart_store().etag_rows(request.user, cart_id)
+        return (cart_items_etag(request, rows) if rows is not None else None), None
 
     def create(self, request, *args, **kwargs):
-        cart, created = Cart.objects.get_or_create(user=request.user)
+        cart, created = get_cart_store().get_or_create(request.user)
         serializer = CartSerializer(cart, context={"request": request})
         return Response(serializer.data, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
 
+    def retrieve(self, request, *args, **kwargs):
+        cart_id = parse_cart_id(kwargs["pk"])
+        cart = cart_id and get_cart_store().get(request.user, cart_id)
+        if not cart:
+            raise Http404
+        return Response(CartSerializer(cart, context={"request": request}).data)
+
+    def destroy(self, request, *args, **kwargs):
+        cart_id = parse_cart_id(kwargs["pk"])
+        if not (cart_id and get_cart_store().delete(request.user, cart_id)):
+            raise Http404
+        return Response(status=status.HTTP_204_NO_CONTENT)
 
-class CartItemViewSet(ModelViewSet):
+
+class CartItemViewSet(IdempotencyMixin, ConditionalGetMixin, GenericViewSet):
     http_method_names = ["get", "post", "patch", "delete"]
     permission_classes = [IsAuthenticated]
 
     def get_serializer_class(self):
+        if self.action == "batch":
+            return CartBatchSerializer
         if self.request.method == "POST":
             return AddCartItemSerializer
         if self.request.method == "PATCH":
@@ -187,24 +260,129 @@ class CartItemViewSet(ModelViewSet):
         return CartItemSerializer
 
     def get_serializer_context(self):
-        return {"cart_id": self.kwargs["cart_pk"]}
+        return {"cart_id": self.get_cart_id(), "user": self.request.user}
+
+    def get_cart_id(self):
+        cart_id = parse_cart_id(self.kwargs["cart_pk"])
+        if cart_id is None:
+            raise Http404
+        return cart_id
+
+    def get_item_id(self):
+        try:
+            return int(self.kwargs["pk"])
+        except ValueError:
+            raise Http404
+
+    def get_cart(self):
+        cart = get_cart_store().get(self.request.user, self.get_cart_id())
+        if cart is None:
+            raise Http404
+        return cart
+
+    def get_validators(self, request, *args, **kwargs):
+        rows = get_cart_store().etag_rows(request.user, self.get_cart_id())
+        if rows is None:
+            return None, None
+        if "pk" in kwargs:
+            rows = [row for row in rows if str(row[0]) == kwargs["pk"]]
+        return cart_items_etag(request, rows), None
 
-    def get_queryset(self):
-        return CartItem.objects.filter(cart__user=self.request.user).select_related("product_size__product", "cart")
+    def list(self, request, *args, **kwargs):
+        items = self.get_cart().items.all()
+        return Response(CartItemSerializer(items, many=True, context=self.get_serializer_context()).data)
+
+    def retrieve(self, request, *args, **kwargs):
+        try:
+            item = get_cart_store().get_item(request.user, self.get_cart_id(), self.get_item_id())
+        except Cart.DoesNotExist:
+            raise Http404
+        if item is None:
+            raise Http404
+        return Response(self.get_serializer(item).data)
+
+    def create(self, request, *args, **kwargs):
+        return self.idempotent_response(self.add_item, request, *args, **kwargs)
+
+    def add_item(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    def partial_update(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            item = get_cart_store().set_quantity(
+                request.user, self.get_cart_id(), self.get_item_id(), serializer.validated_data["quantity"]
+            )
+        except Cart.DoesNotExist:
+            raise Http404
+        if item is None:
+            raise Http404
+        return Response(self.get_serializer(item).data)
+
+    def destroy(self, request, *args, **kwargs):
+        try:
+            removed = get_cart_store().remove_item(request.user, self.get_cart_id(), self.get_item_id())
+        except Cart.DoesNotExist:
+            raise Http404
+        if not removed:
+            raise Http404
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    @action(detail=False, methods=["post"])
+    def batch(self, request, *args, **kwargs):
+        return self.idempotent_response(self.apply_batch, request, *args, **kwargs)
+
+    def apply_batch(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return Response(CartSerializer(self.get_cart(), context={"request": request}).data)
 
 
 # -----------------------------------------------------------------------------
 # ✅ OrderViewSet (باقي كما هو)
 # -----------------------------------------------------------------------------
 
-@method_decorator(cache_page(60 * 3), name="list")
-@method_decorator(cache_page(60), name="retrieve")
-class OrderViewSet(ModelViewSet):
+class OrderViewSet(IdempotencyMixin, VersionedCacheMixin, CompiledListMixin, ModelViewSet):
+    """
+    الكاش (store/cache.py) لكل مستخدم ودوره: العميل يعتمد على عداد طلباته
+    فقط، والـ staff على عداد كل الطلبات. أي تغيير في طلبات العميل (إنشاء،
+    حالة، حذف، تعديل من الـ admin) يزود الاتنين — انظر invalidate_orders.
+    """
     http_method_names = ["get", "post", "patch", "delete"]
+    compiled_serializer_class = CompiledOrderSerializer
     permission_classes = [IsOrderOwnerOrAdmin]
+    pagination_class = OrderPagination
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = OrderFilter
+    cache_namespace = "orders"
+
+    def get_cache_timeout(self):
+        return getattr(settings, "ORDERS_CACHE_TIMEOUT", 60 * 60 * 24)
+
+    def get_cache_generations(self, request, *args, **kwargs):
+        scope = ALL if request.user.is_staff else request.user.pk
+        # أسماء/صور المنتجات والمتاجر جوه الطلب
+        return [generation_key(self.cache_namespace, scope), generation_key("product"), generation_key("store")]
+
+    def get_request_fingerprint(self, request):
+        # المستخدم ودوره جزء من مفتاح الكاش والـ ETag
+        role = "staff" if request.user.is_staff else "customer"
+        fingerprint = f"{request.user.pk}:{role}:{super().get_request_fingerprint(request)}"
+        if request.user.is_staff and self.action == "list":
+            # نافذة الطلبات الحديثة بتتحرك كل يوم
+            fingerprint += f":{recent_orders_start():%Y-%m-%d}"
+        return fingerprint
 
     def create(self, request, *args, **kwargs):
-        serializer = CreateOrderSerializer(data=request.data, context={"user_id": request.user.id})
+        return self.idempotent_response(self.create_order, request, *args, **kwargs)
+
+    def create_order(self, request, *args, **kwargs):
+        serializer = CreateOrderSerializer(data=request.data, context={"user": request.user, "user_id": request.user.id})
         serializer.is_valid(raise_exception=True)
         order = serializer.save()
         out_serializer = OrderSerializer(order, context={"request": request})
@@ -218,39 +396,144 @@ class OrderViewSet(ModelViewSet):
         return OrderSerializer
 
     def get_queryset(self):
-        qs = Order.objects.select_related("customer").only("id", "customer_id", "order_status", "placed_at", "total_price").prefetch_related("items__product_size__product__store", "items__product_size__product")
-        return qs if self.request.user.is_staff else qs.filter(customer=self.request.user)
+        qs = (
+            Order.objects.select_related("customer")
+            .only("id", "customer_id", "order_status", "placed_at", "total_price", "notes", "version", "customer__full_name")
+            .prefetch_related(
+                Prefetch("items", queryset=OrderItem.objects.select_related("product_size__product__store").order_by("id"))
+            )
+        )
+        if not self.request.user.is_staff:
+            return qs.filter(customer=self.request.user)
+        if self.action == "list":
+            # بدون placed_after/placed_before: الطلبات الحديثة فقط بدل كل التاريخ
+            qs = restrict_to_recent(qs, self.request.query_params)
+        return qs
+
+    def get_archived_queryset(self):
+        """
+        المصدر التاني (store/archive.py): كل تاريخ العميل، وللـ staff الطلب
+        الواحد أو قائمة بمدى تاريخ صريح — غير كده None.
+        """
+        qs = ArchivedOrder.objects.select_related("customer")
+        if not self.request.user.is_staff:
+            return qs.filter(customer=self.request.user)
+        if self.action == "list" and not has_date_range(self.request.query_params):
+            return None
+        return qs
 
     def list(self, request, *args, **kwargs):
-        return super().list(request, *args, **kwargs)
+        if self.get_archived_queryset() is None:
+            return super().list(request, *args, **kwargs)
+        return self.cached_response(self.list_with_archive, request, *args, **kwargs)
+
+    def list_with_archive(self, request, *args, **kwargs):
+        orders = self.filter_queryset(self.get_queryset())
+        compiled = None
+        if getattr(settings, "STORE_COMPILED_SERIALIZERS", True):
+            compiled = self.compiled_serializer_class(context=self.get_serializer_context())
+            orders = compiled.prepare(orders)
+        archived = ArchivedOrderFilter(request.query_params, queryset=self.get_archived_queryset(), request=request).qs
+
+        page = self.paginator.paginate_querysets([orders, archived], request, view=self)
+        if page is None:
+            ordering = self.paginator.keyset_ordering
+            page = merge_rows([orders.order_by(*ordering), archived.order_by(*ordering)], ordering)
+
+        hot = [row for row in page if not isinstance(row, ArchivedOrder)]
+        cold = [row for row in page if isinstance(row, ArchivedOrder)]
+        context = self.get_serializer_context()
+        if compiled is not None:
+            data = compiled.serialize(hot)
+        else:
+            data = OrderSerializer(hot, many=True, context=context).data
+        data += ArchivedOrderSerializer(cold, many=True, context={**context, "products": archived_products(cold)}).data
+
+        # نفس ترتيب الصفحة (ids الأرشيف هي ids الطلبات الأصلية)
+        by_id = {row["id"]: row for row in data}
+        data = [by_id[row["id"] if isinstance(row, dict) else row.pk] for row in page]
+        if self.paginator.delegate is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
 
     def retrieve(self, request, *args, **kwargs):
-        return super().retrieve(request, *args, **kwargs)
+        return self.cached_response(self.retrieve_order, request, *args, **kwargs)
+
+    def retrieve_order(self, request, *args, **kwargs):
+        order = self.get_queryset().filter(pk=self.get_order_id()).first()
+        serializer_class = self.get_serializer_class()
+        if order is None:
+            order = self.get_archived_queryset().filter(pk=self.get_order_id()).first()
+            serializer_class = ArchivedOrderSerializer
+        if order is None:
+            raise Http404
+        self.check_object_permissions(request, order)
+        return Response(serializer_class(order, context=self.get_serializer_context()).data)
+
+    def get_order_id(self):
+        try:
+            return int(self.kwargs["pk"])
+        except ValueError:
+            raise Http404
+
+    def partial_update(self, request, *args, **kwargs):
+        serializer = UpdateOrderSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        new_status, version = serializer.validated_data["order_status"], serializer.validated_data.get("version")
+        if request.user.is_staff:
+            orders, transitions = Order.objects.all(), Order.TRANSITIONS
+        else:
+            orders, transitions = Order.objects.filter(customer=request.user), CUSTOMER_TRANSITIONS
+
+        try:
+            version = transition_order(orders, self.get_order_id(), new_status, version, transitions)
+        except Order.DoesNotExist:
+            raise Http404
+        except InvalidTransition as error:
+            return Response({"order_status": [str(error)]}, status=status.HTTP_400_BAD_REQUEST)
+        except TransitionConflict as error:
+            return Response({"detail": str(error), **error.current}, status=status.HTTP_409_CONFLICT)
+        return Response({"id": self.get_order_id(), "order_status": new_status, "version": version})
 
     def destroy(self, request, *args, **kwargs):
-        order = get_object_or_404(Order, id=kwargs["pk"], customer=request.user)
-        if order.order_status != Order.ORDER_STATUS_PENDING:
+        # DELETE مشروط بالحالة (لا إلغاء قبله: لا حدث Canceled ولا version لطلب محذوف)
+        orders = Order.objects.filter(customer=request.user)
+        order_id = self.get_order_id()
+        pending = orders.filter(pk=order_id, order_status=Order.ORDER_STATUS_PENDING)
+        with transaction.atomic():
+            # الـ Collector بيقرا الصفوف ثم يحذف بالـ pk: القفل يثبت الحالة لحد الحذف
+            if pending.select_for_update().exists():
+                pending.delete()
+                return Response(status=status.HTTP_204_NO_CONTENT)
+        if orders.filter(pk=order_id).exists():
             return Response({"error": "You can only delete orders that are pending."}, status=status.HTTP_403_FORBIDDEN)
-        return super().destroy(request, *args, **kwargs)
+        raise Http404
 
 
 # -----------------------------------------------------------------------------
 # ✅ CategoryViewSet (كما هو)
 # -----------------------------------------------------------------------------
 
-@method_decorator(cache_page(60), name="retrieve")
-@method_decorator(cache_page(60 * 5), name="list")
-class CategoryViewSet(ModelViewSet):
+class CategoryViewSet(VersionedCacheMixin, CompiledListMixin, ModelViewSet):
     serializer_class = CategorySerializer
+    compiled_serializer_class = CompiledCategorySerializer
+    cache_namespace = "category"
     permission_classes = [IsAdminOrReadOnly]
 
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
     filterset_class = CategoryFilter
+    pagination_class = CategoryPagination
     search_fields = ["name"]
     ordering_fields = ["name", "created_at"]
 
+    def get_cache_generations(self, request, *args, **kwargs):
+        # كل تصنيف يعرض متاجره، فأي تعديل على متجر يمس القائمة والتفاصيل
+        return [generation_key("category")]
+
     def get_queryset(self):
-        return Category.objects.prefetch_related("stores__category")
+        return Category.objects.annotate(total_stores=Count("stores")).prefetch_related(
+            Prefetch("stores", queryset=Store.objects.only("id", "name", "image", "category_id").order_by("id"))
+        )
 
 
 